@@ -1,5 +1,40 @@
 from django.contrib import admin
-from .models import DataFile, DataRecord
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.contrib.auth import get_permission_codename
+from django.db.models import Q
+from django.template.defaultfilters import filesizeformat
+from django.urls import reverse
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
+from .models import DataFile, DataRecord, IngestJob, IngestStageTiming, SkippedRow, YearlyRollup
+from .pagination import EstimatedCountPaginator, estimate_record_count
+from .services.cube import dimension_values
+from .services.dimensions import DIMENSION_FIELDS, dimension_ids
+from .services.deletion import delete_data_file, delete_data_files, deletion_summary, running_jobs
+from .services.search import matching_ids, search_index_supported
+
+KEYSET_VAR = 'after'
+
+
+def _peak_memory(obj):
+    """Peak traced memory of a stage ('-' when memory was not traced)."""
+    return '-' if obj.peak_memory is None else filesizeformat(obj.peak_memory)
+
+
+class StageTimingInline(admin.TabularInline):
+    """Read-only time and memory of each ingest stage of the file."""
+    model = IngestStageTiming
+    fields = ('stage', 'wall_time', 'cpu_time', 'get_peak_memory', 'calls')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def get_peak_memory(self, obj):
+        return _peak_memory(obj)
+    get_peak_memory.short_description = 'Peak memory'
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(DataFile)
@@ -14,27 +49,30 @@ class DataFileAdmin(admin.ModelAdmin):
         'status',
         'error_type',
         'rows_processed',
+        'rows_skipped',
         'file_size'
     )
     list_filter = ('status', 'error_type', 'uploaded_at')
-    search_fields = ('filename', 'user__email', 'user__username')
-    readonly_fields = ('uploaded_at', 'file_size', 'skipped_rows_log')
+    search_fields = ('filename', 'user__email', 'user__username', '=content_hash')
+    readonly_fields = ('uploaded_at', 'file_size', 'content_hash', 'date_format', 'rows_skipped', 'get_skipped_summary')
     date_hierarchy = 'uploaded_at'
+    inlines = (StageTimingInline,)
+    query_budgets = {'changelist': 9, 'change': 10}
 
     fieldsets = (
         ('Файл', {
-            'fields': ('user', 'filename', 'file_size')
+            'fields': ('user', 'filename', 'file_size', 'content_hash')
         }),
         ('Статус', {
             'fields': ('status', 'error_type', 'error_message')
         }),
         ('Статистика', {
-            'fields': ('rows_processed',)
+            'fields': ('rows_processed', 'date_format')
         }),
-        ('Лог пропущених рядків', {
-            'fields': ('skipped_rows_log',),
-            'classes': ('collapse',),
-            'description': 'Рядки з невалідним форматом дат (Start/End) або де Start > End — записані сюди та не потрапили в обробку.'
+        ('Пропущені рядки', {
+            'fields': ('rows_skipped', 'get_skipped_summary'),
+            'description': 'Рядки з невалідним форматом дат (Start/End) або де Start > End не потрапили в обробку; '
+                           'посилання відкривають їх списком по причині.'
         }),
         ('Дата', {
             'fields': ('uploaded_at',),
@@ -48,14 +86,131 @@ class DataFileAdmin(admin.ModelAdmin):
     get_user_email.short_description = 'User email'
     get_user_email.admin_order_field = 'user__email'
 
+    def get_skipped_summary(self, obj):
+        """Skipped rows per reason, each linked to the filtered skipped rows list."""
+        if not obj.skipped_counts:
+            return '-'
+        url = reverse('admin:data_processing_skippedrow_changelist')
+        reasons = dict(SkippedRow._REASON_CHOICES)
+        return format_html_join(
+            mark_safe('<br>'), '<a href="{}?file__id__exact={}&amp;reason={}">{}</a>: {}',
+            ((url, obj.pk, reason, reasons.get(reason, reason), count) for reason, count in obj.skipped_counts.items()),
+        )
+    get_skipped_summary.short_description = 'За причинами'
+
     def get_queryset(self, request):
         """Optimization of requests."""
         return super().get_queryset(request).select_related('user')
 
+    def get_deleted_objects(self, objs, request):
+        """
+        Summarized deletion confirmation: one line per file with its records
+        count instead of collecting and rendering every related record.
+        """
+        summary = deletion_summary(objs)
+        deleted_objects = [f'{data_file} — записів: {count}' for data_file, count in summary]
+        record_opts = DataRecord._meta
+        model_count = {
+            DataFile._meta.verbose_name_plural: len(summary),
+            record_opts.verbose_name_plural: sum(count for _, count in summary),
+        }
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(DataFile._meta.verbose_name)
+        if not request.user.has_perm(f'{record_opts.app_label}.{get_permission_codename("delete", record_opts)}'):
+            perms_needed.add(record_opts.verbose_name)
+        protected = [
+            f'{job.data_file.filename}: файл зараз обробляється ({job})'
+            for job in running_jobs(data_file for data_file, _ in summary)
+        ]
+        return deleted_objects, model_count, perms_needed, protected
+
+    def delete_model(self, request, obj):
+        """Delete records in raw chunks by file_id (see services.deletion)."""
+        delete_data_file(obj)
+
+    def delete_queryset(self, request, queryset):
+        """Bulk 'delete selected' action through the same chunked path."""
+        delete_data_files(queryset)
+
+
+class CubeDimensionFilter(admin.SimpleListFilter):
+    """Filter choices from the aggregation cube instead of SELECT DISTINCT over all records."""
+    dimension = None
+
+    def lookups(self, request, model_admin):
+        return [(str(value), value) for value in dimension_values(self.dimension) if value not in ('', None)]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        if self.dimension not in DIMENSION_FIELDS:
+            return queryset.filter(**{self.dimension: self.value()})
+        # Dictionary-encoded dimension: filter on its integer id
+        ids = dimension_ids(self.dimension, [self.value()], create=False)
+        return queryset.filter(**{f'{self.dimension}_id': ids.get(self.value())}) if ids else queryset.none()
+
+
+class YearFilter(CubeDimensionFilter):
+    title = 'year'
+    parameter_name = dimension = 'year'
+
+
+class PlatformFilter(CubeDimensionFilter):
+    title = 'platform'
+    parameter_name = dimension = 'platform'
+
+
+class FormatFilter(CubeDimensionFilter):
+    title = 'format'
+    parameter_name = dimension = 'format_type'
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist with keyset navigation: `?after=<id>` lists the records below
+    that id in the default (-id) order, so deep pages cost an index seek
+    instead of an OFFSET over every earlier row.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        try:
+            self.keyset_after = int(request.GET.get(KEYSET_VAR, ''))
+        except ValueError:
+            self.keyset_after = None
+        self.keyset_enabled = ORDER_VAR not in request.GET
+        super().__init__(request, *args, **kwargs)
+        # Page, sort and filter links start over from the newest records
+        self.params.pop(KEYSET_VAR, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(KEYSET_VAR, None)
+        return lookup_params
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.keyset_enabled and self.keyset_after is not None:
+            queryset = queryset.filter(pk__lt=self.keyset_after)
+        return queryset
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.next_keyset_url = None
+        if self.keyset_enabled and not self.show_all:
+            results = list(self.result_list)
+            if len(results) == self.list_per_page:
+                self.next_keyset_url = self.get_query_string({KEYSET_VAR: results[-1].pk}, remove=[PAGE_VAR])
+
 
 @admin.register(DataRecord)
 class DataRecordAdmin(admin.ModelAdmin):
-    """Admin panel for data records."""
+    """
+    Admin panel for data records, usable at millions of rows: estimated
+    counts, keyset navigation, filters from the cube and full-text search.
+    Read-only: the rollup, cube and prorated days only follow whole files
+    (upload, replace, deletion of a DataFile), not edits of single records.
+    """
     list_display = (
         'id',
         'get_file_name',
@@ -67,15 +222,19 @@ class DataRecordAdmin(admin.ModelAdmin):
         'impressions',
         'year'
     )
-    list_filter = ('year', 'platform', 'format_type', 'file__uploaded_at')
+    list_filter = (YearFilter, PlatformFilter, FormatFilter, 'file__uploaded_at')
     search_fields = (
-        'advertiser',
-        'brand',
-        'platform',
+        'advertiser__name',
+        'brand__name',
+        'platform__name',
         'file__filename'
     )
+    search_help_text = 'Слова шукаються як початки слів у рекламодавці, бренді, платформі, форматі, а також у назві файлу.'
     readonly_fields = ('created_at',)
-    date_hierarchy = 'start_date'
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    query_budgets = {'changelist': 10, 'change': 12}
 
     fieldsets = (
         ('Файл', {
@@ -107,4 +266,119 @@ class DataRecordAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         """Оптимізація запитів."""
-        return super().get_queryset(request).select_related('file')
+        return super().get_queryset(request).select_related('file', 'advertiser', 'brand', 'platform')
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, estimate=estimate_record_count)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the FTS5 index (SQLite) plus file names, without scanning the records table."""
+        ids = matching_ids(search_term) if search_index_supported() else None
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        files = DataFile.objects.filter(filename__icontains=search_term.strip()).values('pk')
+        return queryset.filter(Q(pk__in=ids) | Q(file__in=files)), False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SkippedRow)
+class SkippedRowAdmin(admin.ModelAdmin):
+    """Read-only list of skipped rows, opened per file and reason from the file page."""
+    list_display = ('row_num', 'reason', 'detail', 'get_file_name')
+    list_filter = ('reason',)
+    list_select_related = ('file',)
+    show_full_result_count = False
+    readonly_fields = ('file', 'row_num', 'reason', 'detail', 'raw_values')
+    query_budgets = {'changelist': 6, 'change': 8}
+
+    def get_file_name(self, obj):
+        """Get file name."""
+        return obj.file.filename
+    get_file_name.short_description = 'Файл'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(IngestStageTiming)
+class IngestStageTimingAdmin(admin.ModelAdmin):
+    """Ingest stages of all files, slowest first; sortable by wall time, CPU time and memory."""
+    list_display = ('get_file_name', 'stage', 'wall_time', 'cpu_time', 'get_peak_memory', 'calls')
+    list_filter = ('stage',)
+    list_select_related = ('file',)
+    search_fields = ('file__filename',)
+    ordering = ('-wall_time',)
+    query_budgets = {'changelist': 7}
+
+    def get_file_name(self, obj):
+        """Get file name."""
+        return obj.file.filename
+    get_file_name.short_description = 'Файл'
+    get_file_name.admin_order_field = 'file__filename'
+
+    def get_peak_memory(self, obj):
+        return _peak_memory(obj)
+    get_peak_memory.short_description = 'Peak memory'
+    get_peak_memory.admin_order_field = 'peak_memory'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(IngestJob)
+class IngestJobAdmin(admin.ModelAdmin):
+    """Admin panel for background ingest jobs."""
+    list_display = (
+        'id',
+        'get_file_name',
+        'status',
+        'attempts',
+        'max_attempts',
+        'available_at',
+        'locked_by',
+        'finished_at'
+    )
+    list_filter = ('status',)
+    search_fields = ('data_file__filename', 'locked_by')
+    readonly_fields = ('data_file', 'locked_at', 'locked_by', 'last_error', 'created_at', 'finished_at')
+    query_budgets = {'changelist': 7, 'change': 7}
+
+    def get_file_name(self, obj):
+        """Get file name."""
+        return obj.data_file.filename
+    get_file_name.short_description = 'Файл'
+    get_file_name.admin_order_field = 'data_file__filename'
+
+    def get_queryset(self, request):
+        """Optimization of requests."""
+        return super().get_queryset(request).select_related('data_file')
+
+
+@admin.register(YearlyRollup)
+class YearlyRollupAdmin(admin.ModelAdmin):
+    """Read-only view of the yearly totals; rebuilt with `manage.py rebuild_yearly_rollup`."""
+    list_display = ('year', 'records_count', 'total_impressions', 'updated_at')
+    query_budgets = {'changelist': 7}
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,7 +1,20 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+def _enable_sqlite_wal(sender, connection, **kwargs):
+    # Progress polling and the dashboard read while an ingest worker holds a long write
+    # transaction; in WAL mode SQLite readers are not blocked by the writer.
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=WAL")
 
 
 class DataProcessingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.data_processing'
     verbose_name = 'Data processing'
+
+    def ready(self):
+        connection_created.connect(_enable_sqlite_wal, dispatch_uid="data_processing_sqlite_wal")
+        from . import signals  # noqa: F401
@@ -0,0 +1,5 @@
+"""
+Бенчмарки обробки даних: детермінований генератор файлів кампаній
+(generator) і набір вимірювань розбору, завантаження та статистики з
+JSON-базою для порівняння між версіями (suite, команда run_benchmarks).
+"""
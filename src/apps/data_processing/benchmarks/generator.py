@@ -0,0 +1,196 @@
+"""
+Детермінований генератор файлів кампаній (CSV/XLSX) у форматі шаблону
+завантаження. Той самий CampaignFileSpec (кількість рядків, seed, частки)
+завжди дає байт-у-байт той самий файл, тож вимірювання між версіями
+порівнюються на однакових даних. Частки задають рядки з датами в іншому
+форматі, Excel-серійними числами, нерозбірною датою Start та Start > End.
+"""
+import csv
+import io
+import random
+import zipfile
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+import openpyxl
+
+from openpyxl.xml.functions import tostring
+
+HEADER = ["Advertis", "Brand", "Start", "End", "Format", "Platforr", "Impr"]
+FILE_FORMATS = ("csv", "xlsx")
+
+MAIN_DATE_FORMAT = "%d.%m.%y"
+# Formats of "mixed" dates: year-first or with a month name, so they cannot
+# be read month-first by the parser's fallback and land on the same day.
+MIXED_DATE_FORMATS = ("%Y-%m-%d", "%Y.%m.%d", "%d %b %Y")
+BAD_DATE = "not a date"
+XLSX_MAX_ROWS = 1_048_575  # sheet limit minus the header row
+
+_FIRST_START = date(2019, 1, 1)
+_START_DAYS = 365 * 5
+_MAX_DURATION = 60
+_EXCEL_EPOCH = date(1899, 12, 30)
+# Timestamp written into xlsx files (document properties, zip entries) instead of "now"
+_XLSX_TIMESTAMP = datetime(2024, 1, 1)
+_CORE_PROPERTIES = "docProps/core.xml"
+_FORMATS = ("banner", "video", "native", "audio", "rich media")
+_PLATFORMS = ("DV360", "Meta", "TikTok", "YouTube", "Google Ads", "Programmatic")
+
+
+@dataclass(frozen=True)
+class CampaignFileSpec:
+    """
+    Size, seed and row mix of a generated file; ratios are per-row
+    probabilities. Keep the main format above the parser's detection share
+    (services.dates.DETECTION_MIN_SHARE): below it CSV dates like 04.01.21
+    are read month-first, as they would be in a real file, and more rows
+    come out as Start > End than `counts` says.
+    """
+    rows: int
+    seed: int = 0
+    mixed_date_ratio: float = 0.05
+    excel_serial_ratio: float = 0.05
+    bad_date_ratio: float = 0.01
+    start_gt_end_ratio: float = 0.01
+    advertisers: int = 500
+    brands: int = 5000
+
+    def __post_init__(self):
+        if self.rows < 0:
+            raise ValueError("rows must not be negative")
+        if self.mixed_date_ratio + self.excel_serial_ratio > 1:
+            raise ValueError("mixed_date_ratio + excel_serial_ratio must not exceed 1")
+        if self.bad_date_ratio + self.start_gt_end_ratio > 1:
+            raise ValueError("bad_date_ratio + start_gt_end_ratio must not exceed 1")
+
+
+@dataclass
+class GeneratedFile:
+    """Content of a generated file and how many rows of each kind it holds."""
+    content: bytes
+    file_format: str
+    rows: int
+    counts: dict = field(default_factory=dict)
+
+    @property
+    def valid_rows(self):
+        return self.rows - self.counts.get("bad_date", 0) - self.counts.get("start_gt_end", 0)
+
+
+def _excel_serial(day):
+    return (day - _EXCEL_EPOCH).days
+
+
+def _date_cells(rng, spec, start, end, xlsx, formatted, counts):
+    """Start and End of one row: an Excel serial, a date in a mixed format or in the main one."""
+    shape = rng.random()
+    if shape < spec.excel_serial_ratio:
+        counts["excel_serial"] += 1
+        values = [_excel_serial(start), _excel_serial(end)]
+        return values if xlsx else [str(v) for v in values]
+    if shape < spec.excel_serial_ratio + spec.mixed_date_ratio:
+        counts["mixed_date"] += 1
+        fmt = rng.choice(MIXED_DATE_FORMATS)
+    elif xlsx:
+        return [datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())]
+    else:
+        fmt = MAIN_DATE_FORMAT
+    values = []
+    for day in (start, end):
+        # a few thousand distinct days: format each once
+        text = formatted.get((day, fmt))
+        if text is None:
+            text = formatted[(day, fmt)] = day.strftime(fmt)
+        values.append(text)
+    return values
+
+
+def iter_campaign_rows(spec, file_format="csv", counts=None):
+    """
+    Yield the data rows of `spec` as lists in HEADER order. CSV rows hold
+    strings; xlsx rows hold datetimes for dates in the main format, ints for
+    Excel serials and numbers for impressions, as a spreadsheet would.
+    `counts`, if given, is filled with the number of rows of each kind.
+    """
+    rng = random.Random(spec.seed)
+    counts = {} if counts is None else counts
+    for key in ("mixed_date", "excel_serial", "bad_date", "start_gt_end"):
+        counts.setdefault(key, 0)
+    xlsx = file_format == "xlsx"
+    formatted = {}
+    for _ in range(spec.rows):
+        start = _FIRST_START + timedelta(days=rng.randrange(_START_DAYS))
+        end = start + timedelta(days=rng.randrange(_MAX_DURATION))
+        kind = rng.random()
+        if kind < spec.bad_date_ratio:
+            counts["bad_date"] += 1
+        elif kind < spec.bad_date_ratio + spec.start_gt_end_ratio:
+            counts["start_gt_end"] += 1
+            start, end = end + timedelta(days=1), start
+        values = _date_cells(rng, spec, start, end, xlsx, formatted, counts)
+        if kind < spec.bad_date_ratio:
+            values[0] = BAD_DATE
+        impressions = rng.randrange(1, 1_000_000)
+        yield [
+            f"Advertiser {rng.randrange(spec.advertisers)}",
+            f"Brand {rng.randrange(spec.brands)}",
+            values[0],
+            values[1],
+            rng.choice(_FORMATS),
+            rng.choice(_PLATFORMS),
+            impressions if xlsx else str(impressions),
+        ]
+
+
+def write_campaign_csv(spec, fileobj):
+    """Write the CSV file of `spec` to a binary file object. Returns the row counts by kind."""
+    counts = {}
+    text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="", write_through=True)
+    try:
+        writer = csv.writer(text, lineterminator="\n")
+        writer.writerow(HEADER)
+        writer.writerows(iter_campaign_rows(spec, "csv", counts))
+    finally:
+        text.detach()
+    return counts
+
+
+def write_campaign_xlsx(spec, fileobj):
+    """Write the xlsx file of `spec` (streaming, write-only workbook). Returns the row counts by kind."""
+    if spec.rows > XLSX_MAX_ROWS:
+        raise ValueError(f"An xlsx sheet holds at most {XLSX_MAX_ROWS} data rows, got {spec.rows}")
+    counts = {}
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for row in iter_campaign_rows(spec, "xlsx", counts):
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    workbook.properties.created = workbook.properties.modified = _XLSX_TIMESTAMP
+    _copy_zip_with_fixed_times(buffer, fileobj, {_CORE_PROPERTIES: tostring(workbook.properties.to_tree())})
+    return counts
+
+
+def _copy_zip_with_fixed_times(source, fileobj, replace):
+    """
+    openpyxl stamps the document properties and zip entries with the current
+    time; copy the archive with fixed ones so equal specs give equal bytes.
+    """
+    date_time = _XLSX_TIMESTAMP.timetuple()[:6]
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            entry = zipfile.ZipInfo(info.filename, date_time)
+            entry.compress_type = zipfile.ZIP_DEFLATED
+            dst.writestr(entry, replace.get(info.filename) or src.read(info))
+
+
+def generate_campaign_file(spec, file_format="csv"):
+    """Generate the file of `spec` in memory as a GeneratedFile."""
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unknown file format: {file_format!r}")
+    buffer = io.BytesIO()
+    writer = write_campaign_xlsx if file_format == "xlsx" else write_campaign_csv
+    counts = writer(spec, buffer)
+    return GeneratedFile(content=buffer.getvalue(), file_format=file_format, rows=spec.rows, counts=counts)
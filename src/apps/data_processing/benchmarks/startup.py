@@ -0,0 +1,77 @@
+"""
+Час старту процесу: скільки триває `manage.py check` і які модулі
+імпортуються при старті Django (python -X importtime у окремому процесі).
+Важкі залежності парсера (pandas, numpy, openpyxl) не мають потрапляти в
+цей список — їх імпортує лише сам розбір файлу.
+"""
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl")
+# What `manage.py check` does, in one interpreter started with -X importtime
+STARTUP_CODE = "import django; django.setup(); from django.core.management import call_command; call_command('check')"
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def _run(args, **kwargs):
+    # DJANGO_SETTINGS_MODULE is inherited: manage.py and pytest-django both put it in os.environ
+    return subprocess.run(
+        [sys.executable, *args], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True, **kwargs
+    )
+
+
+def time_check(repeat=5):
+    """Median and best wall time of `manage.py check` in a fresh interpreter."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _run(["manage.py", "check"])
+        times.append(time.perf_counter() - started)
+    return {"seconds": statistics.median(times), "min_seconds": min(times)}
+
+
+def parse_importtime(output):
+    """[(module, self seconds, cumulative seconds, depth)] from python -X importtime stderr."""
+    imports = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return imports
+
+
+def import_profile(limit=15):
+    """
+    Modules imported by Django startup plus the system checks: total import
+    time, the slowest top-level imports and which HEAVY_MODULES got loaded.
+    """
+    imports = parse_importtime(_run(["-X", "importtime", "-c", STARTUP_CODE]).stderr)
+    top_level = sorted((i for i in imports if i[3] == 0), key=lambda i: i[2], reverse=True)
+    loaded = {module for module, *_ in imports}
+    return {
+        "modules": len(imports),
+        "total_seconds": sum(i[1] for i in imports),
+        "slowest": [{"module": module, "seconds": cumulative} for module, _, cumulative, _ in top_level[:limit]],
+        "heavy_modules": [name for name in HEAVY_MODULES if name in loaded],
+    }
+
+
+def run_startup(repeat=5):
+    """Startup results as stored under "startup" in the benchmark JSON."""
+    return {"check": time_check(repeat), "imports": import_profile()}
+
+
+def compare_startup(baseline, current):
+    """Relative change of the median `manage.py check` time (positive = slower), or None without a baseline."""
+    before = (baseline.get("startup") or {}).get("check")
+    after = (current.get("startup") or {}).get("check")
+    if not before or not after:
+        return None
+    return {"baseline": before["seconds"], "current": after["seconds"], "change": after["seconds"] / before["seconds"] - 1}
@@ -0,0 +1,184 @@
+"""
+Вимірювання розбору (validate_and_parse), завантаження в БД
+(process_file_upload) та агрегованої статистики (get_aggregated_stats,
+холодний і теплий кеш) на згенерованих файлах різного розміру. Результат —
+словник, який команда run_benchmarks пише в JSON: медіанний час, рядків за
+секунду й пік пам'яті для кожного розміру та показник масштабування (нахил
+log(час) від log(рядків): 1 — лінійно). Два такі файли порівнює
+compare_results.
+"""
+import math
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from dataclasses import asdict
+from datetime import datetime, timezone
+from functools import partial
+
+import django
+import pandas as pd
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from .generator import XLSX_MAX_ROWS, CampaignFileSpec, generate_campaign_file
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def _measure(run, repeat, before=None, trace_memory=True):
+    """
+    Median and best wall time of `repeat` calls of run(), then peak traced
+    memory of one more call (tracemalloc slows the code, so it is never timed).
+    before() prepares each call and is not timed either.
+    """
+    times = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    peak_memory = None
+    if trace_memory:
+        if before is not None:
+            before()
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            run()
+            peak_memory = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+    return {"seconds": statistics.median(times), "min_seconds": min(times), "peak_memory": peak_memory}
+
+
+def _point(rows, measurement):
+    seconds = measurement["seconds"]
+    return {"rows": rows, **measurement, "rows_per_second": rows / seconds if seconds else None}
+
+
+def scaling_exponent(points):
+    """Least-squares slope of log(seconds) against log(rows); None with fewer than two sizes."""
+    pairs = [(math.log(p["rows"]), math.log(p["seconds"])) for p in points if p["rows"] > 0 and p["seconds"] > 0]
+    if len({x for x, _ in pairs}) < 2:
+        return None
+    mean_x = sum(x for x, _ in pairs) / len(pairs)
+    mean_y = sum(y for _, y in pairs) / len(pairs)
+    num = sum((x - mean_x) * (y - mean_y) for x, y in pairs)
+    den = sum((x - mean_x) ** 2 for x, _ in pairs)
+    return round(num / den, 3)
+
+
+def environment():
+    """Versions and machine the results were measured on."""
+    return {
+        "python": sys.version.split()[0],
+        "django": django.get_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def _upload(user, filename, content):
+    from ..services.upload import process_file_upload
+
+    success, message, is_error = process_file_upload(user, SimpleUploadedFile(filename, content))
+    if not success or is_error:
+        raise RuntimeError(f"Benchmark upload of {filename} failed: {message}")
+
+
+def _delete_files():
+    from ..models import DataFile
+    from ..services.deletion import delete_data_files
+
+    delete_data_files(DataFile.objects.all())
+
+
+def run_suite(user, sizes=DEFAULT_SIZES, file_formats=("csv",), repeat=3, trace_memory=True, spec_options=None,
+              report=None):
+    """
+    Run every benchmark for each size and file format and return the results
+    dict. Uploads go to the current database and are deleted afterwards, so
+    call it on an empty, disposable database (run_benchmarks sets one up).
+    report(name, point), if given, is called after each measurement.
+    """
+    from ..models import DataRecord
+    from ..services.aggregation import STATS_MODES, get_aggregated_stats
+    from ..services.cache import bump_data_version
+    from ..services.parsing import validate_and_parse
+
+    spec_options = spec_options or {}
+    results = {}
+
+    def record(name, point):
+        results.setdefault(name, []).append(point)
+        if report is not None:
+            report(name, point)
+
+    for rows in sizes:
+        spec = CampaignFileSpec(rows=rows, **spec_options)
+        for file_format in file_formats:
+            if file_format == "xlsx" and rows > XLSX_MAX_ROWS:
+                continue
+            content = generate_campaign_file(spec, file_format).content
+            filename = f"benchmark-{rows}.{file_format}"
+            record(f"validate_and_parse[{file_format}]", _point(rows, _measure(
+                lambda: validate_and_parse(content, filename), repeat, trace_memory=trace_memory,
+            )))
+            record(f"process_file_upload[{file_format}]", _point(rows, _measure(
+                lambda: _upload(user, filename, content), repeat, before=_delete_files, trace_memory=trace_memory,
+            )))
+        # The records of the last upload are still there to aggregate.
+        records = DataRecord.objects.count()
+        for mode in STATS_MODES:
+            get_stats = partial(get_aggregated_stats, mode)
+            record(f"get_aggregated_stats[{mode},cold]", _point(records, _measure(
+                get_stats, repeat, before=bump_data_version, trace_memory=trace_memory,
+            )))
+            record(f"get_aggregated_stats[{mode},warm]", _point(records, _measure(
+                get_stats, repeat, before=get_stats, trace_memory=trace_memory,
+            )))
+        _delete_files()
+
+    spec_fields = asdict(CampaignFileSpec(rows=0, **spec_options))
+    del spec_fields["rows"]
+    return {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "spec": spec_fields,
+        "repeat": repeat,
+        "results": results,
+        "scaling": {name: scaling_exponent(points) for name, points in results.items()},
+    }
+
+
+def compare_results(baseline, current):
+    """
+    Rows/sec of every benchmark and size measured in both runs, with the
+    relative change (negative = slower than the baseline).
+    """
+    comparison = []
+    for name, points in current["results"].items():
+        before = {p["rows"]: p for p in baseline.get("results", {}).get(name, [])}
+        for point in points:
+            old = before.get(point["rows"])
+            if old is None or not old.get("rows_per_second") or not point.get("rows_per_second"):
+                continue
+            comparison.append({
+                "benchmark": name,
+                "rows": point["rows"],
+                "baseline": old["rows_per_second"],
+                "current": point["rows_per_second"],
+                "change": point["rows_per_second"] / old["rows_per_second"] - 1,
+            })
+    return comparison
@@ -7,3 +7,19 @@ class DataFileUploadForm(forms.Form):
         help_text="Колонки: Advertis, Brand, Start, End, Format, Platform, Impr. Start та End не повинні бути порожніми.",
         widget=forms.FileInput(attrs={"accept": ".xls,.xlsx,.csv"}),
     )
+    replace = forms.BooleanField(
+        label="Замінити попереднє завантаження",
+        help_text="Обробити файл заново і видалити попередні завантаження з тим самим вмістом або назвою.",
+        required=False,
+    )
+    delta = forms.BooleanField(
+        label="Оновити лише змінені рядки",
+        help_text="Порівняти з попередньою версією файлу з тією ж назвою і застосувати тільки додані, змінені та видалені рядки.",
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("replace") and cleaned_data.get("delta"):
+            raise forms.ValidationError("Оберіть або заміну, або оновлення змінених рядків.")
+        return cleaned_data
@@ -0,0 +1,22 @@
+"""
+Точки входу для процесів пулу process_ingest_jobs. Модуль не імпортує
+моделі на рівні модуля: spawn-процес розпаковує ці функції ще до django.setup().
+"""
+
+
+def init_worker():
+    """Pool processes are spawned, so Django has to be set up in each of them."""
+    import django
+
+    django.setup()
+
+
+def run_job_in_worker(job_id):
+    from django.db import connections
+
+    from ...services.jobs import run_job
+
+    try:
+        return run_job(job_id)
+    finally:
+        connections.close_all()
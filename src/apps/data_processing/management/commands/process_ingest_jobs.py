@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from ...services.aggregation import warm_stats_cache
+from ...services.jobs import claim_next_job, fail_job, heartbeat, recover_stale_jobs, run_job
+from ._worker import init_worker, run_job_in_worker
+
+
+class Command(BaseCommand):
+    help = "Process queued file uploads (IngestJob) with a local pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.DATA_PROCESSING_WORKER_CONCURRENCY,
+            help="Number of worker processes; 0 runs jobs one by one in this process.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.DATA_PROCESSING_WORKER_POLL_INTERVAL,
+            help="Seconds between queue polls when there is nothing to do.",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is drained.")
+
+    def handle(self, *args, **options):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Worker {worker_id} started (concurrency: {options['concurrency']}).")
+        if options["concurrency"] <= 0:
+            self._run_inline(worker_id, options["poll_interval"], options["once"])
+        else:
+            self._run_pool(worker_id, options["concurrency"], options["poll_interval"], options["once"])
+
+    def _run_inline(self, worker_id, poll_interval, once):
+        processed = 0
+        while True:
+            self._housekeeping([])
+            job = self._claim(worker_id)
+            if job is None:
+                processed = self._warm_cache(processed)
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            self._run_job_inline(job.id, poll_interval)
+            processed += 1
+            self.stdout.write(f"Job {job.id} ({job.data_file.filename}) processed.")
+
+    def _run_job_inline(self, job_id, heartbeat_interval):
+        """run_job in this process while a thread sends the job's heartbeat, as the pool loop does."""
+        stop = threading.Event()
+
+        def send_heartbeats():
+            try:
+                while not stop.wait(heartbeat_interval):
+                    try:
+                        heartbeat([job_id])
+                    except OperationalError as e:
+                        self.stderr.write(f"Heartbeat skipped: {e}")
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=send_heartbeats, name=f"heartbeat-{job_id}", daemon=True)
+        thread.start()
+        try:
+            return run_job(job_id)
+        finally:
+            stop.set()
+            thread.join()
+
+    def _run_pool(self, worker_id, concurrency, poll_interval, once):
+        context = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(max_workers=concurrency, mp_context=context, initializer=init_worker)
+        running = {}
+        processed = 0
+        try:
+            while True:
+                self._housekeeping(list(running.values()))
+                while len(running) < concurrency:
+                    job = self._claim(worker_id)
+                    if job is None:
+                        break
+                    running[pool.submit(run_job_in_worker, job.id)] = job.id
+                if not running:
+                    processed = self._warm_cache(processed)
+                    if once:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                processed += len(done)
+                if self._collect(done, running):
+                    self.stderr.write("Worker pool broke, restarting it.")
+                    for job_id in running.values():
+                        fail_job(job_id, "Worker process terminated abruptly.")
+                    running.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=concurrency, mp_context=context, initializer=init_worker)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _housekeeping(self, running_job_ids):
+        """Heartbeat and stale-job recovery; skipped for this poll if SQLite is locked by a long ingest."""
+        try:
+            heartbeat(running_job_ids)
+            recover_stale_jobs()
+        except OperationalError as e:
+            self.stderr.write(f"Housekeeping skipped: {e}")
+
+    def _warm_cache(self, processed):
+        """Warm the stats cache once the queue is drained after a batch of jobs; returns the new counter."""
+        if processed:
+            try:
+                warm_stats_cache()
+            except OperationalError as e:
+                self.stderr.write(f"Stats cache not warmed: {e}")
+                return processed
+            self.stdout.write(f"Stats cache warmed after {processed} job(s).")
+        return 0
+
+    def _claim(self, worker_id):
+        try:
+            return claim_next_job(worker_id)
+        except OperationalError as e:
+            self.stderr.write(f"Could not claim a job: {e}")
+            return None
+
+    def _collect(self, done, running):
+        """Report finished futures; returns True if the pool is broken."""
+        broken = False
+        for future in done:
+            job_id = running.pop(future)
+            try:
+                future.result()
+                self.stdout.write(f"Job {job_id} processed.")
+            except BrokenProcessPool:
+                broken = True
+                fail_job(job_id, "Worker process terminated abruptly.")
+            except Exception as e:
+                fail_job(job_id, repr(e))
+        return broken
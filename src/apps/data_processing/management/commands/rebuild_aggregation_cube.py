@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...services.cube import rebuild_cube
+
+
+class Command(BaseCommand):
+    help = "Rebuild the aggregation cube (CubeCell) from DataRecord."
+
+    def handle(self, *args, **options):
+        cells = rebuild_cube()
+        self.stdout.write(self.style.SUCCESS(f"Aggregation cube rebuilt: {cells} cells."))
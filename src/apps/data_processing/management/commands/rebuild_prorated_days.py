@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...services.proration import rebuild_prorated_days
+
+
+class Command(BaseCommand):
+    help = "Rebuild the prorated impressions per day (ProratedDay) from DataRecord."
+
+    def handle(self, *args, **options):
+        days = rebuild_prorated_days()
+        self.stdout.write(self.style.SUCCESS(f"Prorated days rebuilt: {days} days."))
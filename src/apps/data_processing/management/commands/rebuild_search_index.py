@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ...services.search import install_search_index, search_index_supported
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search index of DataRecord (SQLite FTS5) and its triggers, and refill it."
+
+    def handle(self, *args, **options):
+        if not search_index_supported():
+            self.stdout.write("The full-text search index is only used with SQLite.")
+            return
+        install_search_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
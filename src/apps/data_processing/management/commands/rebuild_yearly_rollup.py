@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...services.rollup import rebuild_yearly_rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the YearlyRollup / FileYearTotal tables from DataRecord."
+
+    def handle(self, *args, **options):
+        years = rebuild_yearly_rollup()
+        self.stdout.write(self.style.SUCCESS(f"Yearly rollup rebuilt: {years} years."))
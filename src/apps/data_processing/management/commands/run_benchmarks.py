@@ -0,0 +1,199 @@
+import json
+import logging
+import tempfile
+
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from ...benchmarks.generator import FILE_FORMATS, CampaignFileSpec
+from ...benchmarks.startup import compare_startup, run_startup
+from ...benchmarks.suite import DEFAULT_SIZES, compare_results, run_suite
+
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def _size(value):
+    """Row count like 5000, 10k or 5M."""
+    value = value.strip().lower()
+    multiplier = _SUFFIXES.get(value[-1:], 1)
+    number = value[:-1] if multiplier > 1 else value
+    try:
+        rows = int(float(number) * multiplier)
+    except ValueError:
+        raise CommandError(f"Invalid size: {value!r}")
+    if rows <= 0:
+        raise CommandError(f"Size must be positive: {value!r}")
+    return rows
+
+
+def _human_bytes(value):
+    if value is None:
+        return "-"
+    for unit in ("B", "KiB", "MiB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark parsing, upload and aggregated stats on generated campaign files in a throwaway "
+        "database, and process startup (`manage.py check`, imports); write rows/sec, peak memory and "
+        "scaling per size as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default=",".join(str(s) for s in DEFAULT_SIZES),
+            help="Comma-separated row counts, e.g. 1k,10k,100k,1M,5M.",
+        )
+        parser.add_argument(
+            "--formats", default="csv", help=f"Comma-separated file formats: {', '.join(FILE_FORMATS)}."
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark; the median is kept.")
+        parser.add_argument("--no-memory", action="store_true", help="Skip the extra tracemalloc run per benchmark.")
+        parser.add_argument(
+            "--startup-repeat",
+            type=int,
+            default=5,
+            help="Runs of `manage.py check` for the startup benchmark; 0 skips it.",
+        )
+        defaults = CampaignFileSpec(rows=0)
+        parser.add_argument("--seed", type=int, default=defaults.seed, help="Seed of the file generator.")
+        for name in ("mixed_date_ratio", "excel_serial_ratio", "bad_date_ratio", "start_gt_end_ratio"):
+            parser.add_argument(
+                "--" + name.replace("_", "-"), type=float, default=getattr(defaults, name),
+                help=f"Share of generated rows (default {getattr(defaults, name)}).",
+            )
+        parser.add_argument("--output", help="Write the results JSON to this file.")
+        parser.add_argument(
+            "--compare", help="Results JSON of an earlier run to compare rows/sec and startup time with."
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="With --compare: fail if any rows/sec fell, or check time grew, by more than this fraction (e.g. 0.2).",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [_size(s) for s in options["sizes"].split(",") if s.strip()]
+        formats = [f.strip() for f in options["formats"].split(",") if f.strip()]
+        unknown = set(formats) - set(FILE_FORMATS)
+        if unknown:
+            raise CommandError(f"Unknown formats: {', '.join(sorted(unknown))}")
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        baseline = None
+        if options["compare"]:
+            baseline = json.loads(Path(options["compare"]).read_text())
+        spec_options = {
+            name: options[name]
+            for name in ("seed", "mixed_date_ratio", "excel_serial_ratio", "bad_date_ratio", "start_gt_end_ratio")
+        }
+
+        with tempfile.TemporaryDirectory(prefix="benchmarks-") as tmp:
+            results = self._run_isolated(Path(tmp), sizes, formats, options, spec_options)
+        if options["startup_repeat"] > 0:
+            results["startup"] = run_startup(options["startup_repeat"])
+            self._report_startup(results["startup"])
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Results written to {options['output']}.")
+        for name, exponent in results["scaling"].items():
+            if exponent is not None:
+                self.stdout.write(f"{name}: time ~ rows^{exponent}")
+        if baseline is not None:
+            self._compare(baseline, results, options["max_regression"])
+        self.stdout.write(self.style.SUCCESS("Benchmarks finished."))
+
+    def _run_isolated(self, tmp, sizes, formats, options, spec_options):
+        """run_suite in a fresh migrated SQLite file with local caches, media and no metrics files."""
+        caches = {
+            alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"benchmarks-{alias}"}
+            for alias in ("default", "progress", "stats")
+        }
+        test_settings = connection.settings_dict.setdefault("TEST", {})
+        old_test_name = test_settings.get("NAME")
+        test_settings["NAME"] = str(tmp / "benchmarks.sqlite3")
+        quiet = options["verbosity"] < 2
+        try:
+            with override_settings(
+                CACHES=caches,
+                MEDIA_ROOT=str(tmp / "media"),
+                DATA_PROCESSING_METRICS_DIR="",
+                DATA_PROCESSING_TRACE_MEMORY=False,
+            ):
+                old_config = setup_databases(verbosity=0, interactive=False)
+                if quiet:
+                    # one skipped-rows summary per parsed file would drown the report
+                    logging.disable(logging.WARNING)
+                try:
+                    user = get_user_model().objects.create_user(username="benchmark")
+                    return run_suite(
+                        user,
+                        sizes=sizes,
+                        file_formats=formats,
+                        repeat=options["repeat"],
+                        trace_memory=not options["no_memory"],
+                        spec_options=spec_options,
+                        report=self._report,
+                    )
+                finally:
+                    if quiet:
+                        logging.disable(logging.NOTSET)
+                    teardown_databases(old_config, verbosity=0)
+        finally:
+            test_settings["NAME"] = old_test_name
+
+    def _report(self, name, point):
+        rate = point["rows_per_second"]
+        self.stdout.write(
+            f"{name:<40} {point['rows']:>9} rows  {point['seconds']:>9.4f} s  "
+            f"{(rate or 0):>12,.0f} rows/s  peak {_human_bytes(point['peak_memory'])}"
+        )
+
+    def _report_startup(self, startup):
+        imports = startup["imports"]
+        self.stdout.write(
+            f"manage.py check: {startup['check']['seconds']:.3f} s; "
+            f"{imports['modules']} modules imported in {imports['total_seconds']:.3f} s"
+        )
+        for item in imports["slowest"][:5]:
+            self.stdout.write(f"  {item['seconds']:>7.3f} s  {item['module']}")
+        if imports["heavy_modules"]:
+            self.stdout.write(self.style.WARNING(
+                f"Imported at startup: {', '.join(imports['heavy_modules'])} (should load only when a file is parsed)."
+            ))
+
+    def _compare(self, baseline, results, max_regression):
+        regressions = []
+        startup = compare_startup(baseline, results)
+        if startup is not None:
+            self.stdout.write(
+                f"manage.py check: {startup['baseline']:.3f} s -> {startup['current']:.3f} s  {startup['change']:+.1%}"
+            )
+            if max_regression is not None and startup["change"] > max_regression:
+                regressions.append(startup)
+        comparison = compare_results(baseline, results)
+        if not comparison:
+            self.stdout.write("Nothing to compare: no benchmark and size in common with the baseline.")
+        else:
+            self.stdout.write("Change in rows/sec against the baseline:")
+        for row in comparison:
+            self.stdout.write(
+                f"{row['benchmark']:<40} {row['rows']:>9} rows  "
+                f"{row['baseline']:>12,.0f} -> {row['current']:>12,.0f}  {row['change']:+.1%}"
+            )
+            if max_regression is not None and row["change"] < -max_regression:
+                regressions.append(row)
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} benchmark(s) slower than the baseline by more than {max_regression:.0%}."
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...services.aggregation import warm_stats_cache
+
+
+class Command(BaseCommand):
+    help = "Compute aggregated stats for the current data version and store them in the stats cache."
+
+    def handle(self, *args, **options):
+        warm_stats_cache()
+        self.stdout.write(self.style.SUCCESS("Stats cache warmed."))
@@ -0,0 +1,302 @@
+"""
+Метрики у текстовому форматі Prometheus (GET /metrics). Лічильники й
+гістограми живуть у пам'яті процесу (оновлення — словник під замком), а
+кожен процес (веб-воркери, воркери черги) не частіше ніж раз на
+DATA_PROCESSING_METRICS_FLUSH_INTERVAL скидає свій знімок у власний файл
+у DATA_PROCESSING_METRICS_DIR; /metrics підсумовує файли всіх процесів.
+Каталог спільний для контейнерів (web, worker), тому файл названо за
+хостом, pid і часом старту; файли процесів цього хоста, що вже
+завершились, /metrics додає в архівний файл і видаляє: кількість файлів
+не росте, а лічильники не зменшуються.
+"""
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: scrapes are not serialized
+    fcntl = None
+
+from django.conf import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+INGEST_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# prefix of this process's metrics file
+_HOST = socket.gethostname()
+# values of exited processes, folded in by /metrics
+ARCHIVE_NAME = "archive.json"
+LOCK_NAME = "archive.lock"
+
+
+class Registry:
+    """Metrics of this process and their values, flushed to a per-process file."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop the values (and the file name) of this process, e.g. in a forked child."""
+        self.values = {}
+        self.dirty = False
+        self.flushed_at = 0.0
+        self.path = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def update(self, name, key, change):
+        """Apply change(old_value) to one labelled value; old_value is None the first time."""
+        with self.lock:
+            values = self.values.setdefault(name, {})
+            values[key] = change(values.get(key))
+            self.dirty = True
+
+    def _snapshot(self):
+        return {name: [[list(key), value] for key, value in values.items()] for name, values in self.values.items()}
+
+    def flush(self, force=False):
+        """Write this process's values to its file if they changed (at most once per flush interval)."""
+        directory = settings.DATA_PROCESSING_METRICS_DIR
+        if not directory:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if not self.dirty or (not force and now - self.flushed_at < settings.DATA_PROCESSING_METRICS_FLUSH_INTERVAL):
+                return
+            data = json.dumps(self._snapshot())
+            self.dirty = False
+            self.flushed_at = now
+            if self.path is None:
+                # host, pid and start time: the directory is shared between containers, and a later
+                # process reusing the pid must not overwrite these counters
+                self.path = Path(directory) / f"{_HOST}-{os.getpid()}-{time.time_ns()}.json"
+            path = self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(data)
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """{name: {label values: value}} summed over the files of all processes (this one included)."""
+        directory = settings.DATA_PROCESSING_METRICS_DIR
+        if not directory:
+            with self.lock:
+                return self._merge([self._snapshot()])
+        self.flush(force=True)
+        directory = Path(directory)
+        self._archive_exited(directory)
+        return self._merge(_read_snapshot(path) for path in directory.glob("*.json"))
+
+    def _merge(self, snapshots):
+        totals = {}
+        for snapshot in snapshots:
+            for name, values in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                merged = totals.setdefault(name, {})
+                for key, value in values:
+                    key = tuple(key)
+                    if len(key) != len(metric.labels):
+                        continue  # written before the metric's labels changed
+                    merged[key] = metric.merge(merged.get(key), value)
+        return totals
+
+    def _exited_files(self, directory):
+        """
+        Files of processes of this host that are gone: pid not running, or an older
+        file of a reused pid. Other hosts' pids cannot be checked, their files stay.
+        """
+        latest = {}
+        exited = []
+        for path in sorted(directory.glob("*-*-*.json"), key=_started_at):
+            parts = path.stem.rsplit("-", 2)
+            if parts[0] != _HOST or not parts[1].isdigit():
+                continue
+            pid = parts[1]
+            if pid in latest:
+                exited.append(latest[pid])
+            latest[pid] = path
+        exited.extend(path for pid, path in latest.items() if path != self.path and not _is_running(int(pid)))
+        return exited
+
+    def _archive_exited(self, directory):
+        """Add the values of exited processes to the archive file and delete their files."""
+        if not self._exited_files(directory):
+            return
+        with open(directory / LOCK_NAME, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # listed again under the lock: a concurrent scrape may have archived them already
+            exited = self._exited_files(directory)
+            archive = directory / ARCHIVE_NAME
+            totals = self._merge([_read_snapshot(archive)] + [_read_snapshot(path) for path in exited])
+            snapshot = {name: [[list(key), value] for key, value in values.items()] for name, values in totals.items()}
+            tmp_path = archive.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(snapshot))
+            os.replace(tmp_path, archive)
+            for path in exited:
+                path.unlink(missing_ok=True)
+
+
+def _read_snapshot(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _started_at(path):
+    started_at = path.stem.rsplit("-", 1)[-1]
+    return int(started_at) if started_at.isdigit() else 0
+
+
+def _is_running(pid):
+    if os.name != "posix":
+        return True  # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{%s}" % ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        REGISTRY.update(self.name, self._key(labels), lambda old: (old or 0) + amount)
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def samples(self, values):
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{self._label_text(key)} {_number(value)}"
+
+
+class Histogram(_Metric):
+    """Value: observations per bucket (the last one is +Inf) followed by their sum."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+
+        def change(old):
+            counts = old or [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+            return counts
+
+        REGISTRY.update(self.name, self._key(labels), change)
+
+    def merge(self, total, value):
+        return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+    def samples(self, values):
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                yield f"{self.name}_bucket{self._label_text(key, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{self._label_text(key)} {_number(counts[-1])}"
+            yield f"{self.name}_count{self._label_text(key)} {cumulative}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """All metrics of all processes in the Prometheus text format."""
+    totals = REGISTRY.collect()
+    lines = []
+    for name, metric in REGISTRY.metrics.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric.samples(totals.get(name, {})))
+    return "\n".join(lines) + "\n"
+
+
+def flush_metrics(force=False):
+    REGISTRY.flush(force)
+
+
+def _flush_at_exit():
+    try:
+        REGISTRY.flush(force=True)
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=REGISTRY.reset)
+
+
+uploads_total = Counter(
+    "data_processing_uploads_total", "Processed uploads by final status and error type.", ["status", "error_type"],
+)
+rows_ingested_total = Counter("data_processing_rows_ingested_total", "Records inserted from uploaded files.")
+rows_skipped_total = Counter("data_processing_rows_skipped_total", "Rows skipped while parsing, by reason.", ["reason"])
+parse_seconds = Histogram(
+    "data_processing_parse_seconds", "Time to read, validate and parse one file.", buckets=INGEST_BUCKETS,
+)
+insert_seconds = Histogram(
+    "data_processing_insert_seconds", "Time to insert the records of one file.", buckets=INGEST_BUCKETS,
+)
+stats_cache_requests_total = Counter(
+    "data_processing_stats_cache_requests_total",
+    "Stats cache lookups by cached value (yearly stats or cube) and result.",
+    ["cache", "result"],
+)
+request_seconds = Histogram("http_request_duration_seconds", "Request latency by view.", ["view"])
+request_queries = Histogram(
+    "http_request_db_queries", "Database queries per request by view.", ["view"], buckets=QUERY_BUCKETS,
+)
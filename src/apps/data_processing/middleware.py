@@ -0,0 +1,74 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+from .querylog import QueryBudgetExceeded, QueryRecorder, explain_query_plan, view_query_budget
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Latency and number of database queries of every request, per resolved view (see metrics.py).
+    The queries are counted by the recorder QueryLogMiddleware (below it) attaches to the request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unresolved"
+        metrics.request_seconds.observe(time.perf_counter() - started, view=view)
+        recorder = getattr(request, "query_recorder", None)
+        if recorder is not None:
+            metrics.request_queries.observe(recorder.count, view=view)
+        metrics.flush_metrics()
+        return response
+
+
+class QueryLogMiddleware:
+    """
+    Log the queries of a request slower than DATA_PROCESSING_SLOW_QUERY_SECONDS
+    with their query plan, and check the view's query budget (see querylog.py).
+    Budgets apply to GET and HEAD: writes run as many queries as the data they change needs.
+    The recorder stays on the request as request.query_recorder for RequestMetricsMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = request.query_recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unresolved"
+        self._log_slow_queries(view, recorder)
+        budget = view_query_budget(match) if match is not None and request.method in ("GET", "HEAD") else None
+        if budget is not None and recorder.count > budget:
+            message = f"{view} ran {recorder.count} queries, budget {budget}:\n{recorder.report()}"
+            if settings.DATA_PROCESSING_QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra={"view": view, "queries": recorder.count, "query_budget": budget})
+        return response
+
+    def _log_slow_queries(self, view, recorder):
+        slow = recorder.slow(settings.DATA_PROCESSING_SLOW_QUERY_SECONDS)
+        for query in slow[:settings.DATA_PROCESSING_SLOW_QUERY_EXPLAIN_LIMIT]:
+            plan = explain_query_plan(query["sql"], query["params"])
+            logger.warning(
+                "Повільний запит у %s (%.1f ms): %s%s",
+                view, query["duration"] * 1000, query["sql"], f"\nQUERY PLAN:\n{plan}" if plan else "",
+                extra={"view": view, "duration": query["duration"]},
+            )
+        if len(slow) > settings.DATA_PROCESSING_SLOW_QUERY_EXPLAIN_LIMIT:
+            logger.warning(
+                "Ще %d повільних запитів у %s без плану.", len(slow) - settings.DATA_PROCESSING_SLOW_QUERY_EXPLAIN_LIMIT,
+                view, extra={"view": view},
+            )
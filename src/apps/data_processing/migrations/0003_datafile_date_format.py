@@ -0,0 +1,23 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0002_add_skipped_rows_log"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="datafile",
+            name="date_format",
+            field=models.CharField(
+                blank=True,
+                default="",
+                max_length=50,
+                verbose_name="Detected date format",
+            ),
+        ),
+    ]
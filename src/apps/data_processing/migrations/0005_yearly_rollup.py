@@ -0,0 +1,139 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_rollup(apps, schema_editor):
+    """Fill the new tables from records uploaded before the rollup existed."""
+    DataRecord = apps.get_model("data_processing", "DataRecord")
+    FileYearTotal = apps.get_model("data_processing", "FileYearTotal")
+    YearlyRollup = apps.get_model("data_processing", "YearlyRollup")
+
+    per_file = (
+        DataRecord.objects.filter(year__isnull=False)
+        .values("file_id", "year")
+        .annotate(records_count=Count("id"), total_impressions=Sum("impressions"))
+        .order_by()
+    )
+    FileYearTotal.objects.bulk_create(
+        [
+            FileYearTotal(
+                file_id=row["file_id"],
+                year=row["year"],
+                records_count=row["records_count"],
+                total_impressions=row["total_impressions"] or 0,
+            )
+            for row in per_file
+        ],
+        batch_size=1000,
+    )
+    per_year = (
+        FileYearTotal.objects.values("year")
+        .annotate(records_count=Sum("records_count"), total_impressions=Sum("total_impressions"))
+        .order_by()
+    )
+    YearlyRollup.objects.bulk_create([YearlyRollup(**row) for row in per_year])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0004_ingest_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="YearlyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.PositiveIntegerField(unique=True, verbose_name="Year")),
+                (
+                    "records_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Number of records"
+                    ),
+                ),
+                (
+                    "total_impressions",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=24,
+                        verbose_name="Total impressions",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+            ],
+            options={
+                "verbose_name": "Yearly rollup",
+                "verbose_name_plural": "Yearly rollup",
+                "db_table": "data_processing_yearly_rollup",
+                "ordering": ["year"],
+            },
+        ),
+        migrations.CreateModel(
+            name="FileYearTotal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.PositiveIntegerField(verbose_name="Year")),
+                (
+                    "records_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Number of records"
+                    ),
+                ),
+                (
+                    "total_impressions",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=24,
+                        verbose_name="Total impressions",
+                    ),
+                ),
+                (
+                    "file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="year_totals",
+                        to="data_processing.datafile",
+                        verbose_name="File",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "File year total",
+                "verbose_name_plural": "File year totals",
+                "db_table": "data_processing_file_year_total",
+                "ordering": ["file", "year"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="fileyeartotal",
+            constraint=models.UniqueConstraint(
+                fields=("file", "year"), name="data_processing_file_year_total_unique"
+            ),
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,139 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:29
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce, ExtractMonth
+
+
+def build_cube(apps, schema_editor):
+    """Fill the cube from records uploaded before it existed."""
+    DataRecord = apps.get_model("data_processing", "DataRecord")
+    CubeCell = apps.get_model("data_processing", "CubeCell")
+
+    text_dimensions = ("advertiser", "brand", "platform", "format_type")
+    rows = (
+        DataRecord.objects.filter(year__isnull=False, start_date__isnull=False)
+        .annotate(
+            cube_month=ExtractMonth("start_date"),
+            **{f"cube_{name}": Coalesce(name, Value("")) for name in text_dimensions},
+        )
+        .values("year", "cube_month", *(f"cube_{name}" for name in text_dimensions))
+        .annotate(records_count=Count("id"), total_impressions=Sum("impressions"))
+        .order_by()
+    )
+    CubeCell.objects.bulk_create(
+        [
+            CubeCell(
+                year=r["year"],
+                month=r["cube_month"],
+                records_count=r["records_count"],
+                total_impressions=r["total_impressions"] or 0,
+                **{name: r[f"cube_{name}"] for name in text_dimensions},
+            )
+            for r in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0005_yearly_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CubeCell",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.PositiveIntegerField(verbose_name="Year")),
+                ("month", models.PositiveSmallIntegerField(verbose_name="Month")),
+                (
+                    "advertiser",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        max_length=255,
+                        verbose_name="Advertiser",
+                    ),
+                ),
+                (
+                    "brand",
+                    models.CharField(
+                        blank=True, default="", max_length=255, verbose_name="Brand"
+                    ),
+                ),
+                (
+                    "platform",
+                    models.CharField(
+                        blank=True, default="", max_length=100, verbose_name="Platform"
+                    ),
+                ),
+                (
+                    "format_type",
+                    models.CharField(
+                        blank=True, default="", max_length=100, verbose_name="Format"
+                    ),
+                ),
+                (
+                    "records_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Number of records"
+                    ),
+                ),
+                (
+                    "total_impressions",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=24,
+                        verbose_name="Total impressions",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Cube cell",
+                "verbose_name_plural": "Cube cells",
+                "db_table": "data_processing_cube_cell",
+                "ordering": ["year", "month"],
+                "indexes": [
+                    models.Index(
+                        fields=["platform", "year"],
+                        name="data_proces_platfor_9fb1dd_idx",
+                    ),
+                    models.Index(
+                        fields=["advertiser", "brand"],
+                        name="data_proces_adverti_9fde72_idx",
+                    ),
+                    models.Index(
+                        fields=["format_type", "year"],
+                        name="data_proces_format__77d4e8_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="cubecell",
+            constraint=models.UniqueConstraint(
+                fields=(
+                    "year",
+                    "month",
+                    "advertiser",
+                    "brand",
+                    "platform",
+                    "format_type",
+                ),
+                name="data_processing_cube_cell_unique",
+            ),
+        ),
+        migrations.RunPython(build_cube, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:34
+
+from datetime import date
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def prorate_spans(spans, days):
+    """
+    Frozen copy of the spreading in services.proration as of this migration:
+    add {(first_day, last_day): cents} (day ordinals, inclusive) to days
+    {ordinal: cents}, evenly over the days of each span, the remainder one cent
+    per day from the first day on; End before Start puts the whole amount on Start.
+    """
+    for (first, last), cents in spans.items():
+        last = max(last, first)
+        base, extra = divmod(cents, last - first + 1)
+        for offset in range(last - first + 1):
+            days[first + offset] = days.get(first + offset, 0) + base + (offset < extra)
+
+
+def build_prorated_days(apps, schema_editor):
+    """Spread the impressions of records uploaded before the table existed, file by file."""
+    DataRecord = apps.get_model("data_processing", "DataRecord")
+    ProratedDay = apps.get_model("data_processing", "ProratedDay")
+
+    days = {}
+    rows = (
+        DataRecord.objects.filter(start_date__isnull=False, impressions__isnull=False)
+        .values("file_id", "start_date", "end_date")
+        .annotate(impressions=Sum("impressions"))
+        .order_by("file_id")
+    )
+    spans_by_file = {}
+    for r in rows:
+        spans = spans_by_file.setdefault(r["file_id"], {})
+        key = (r["start_date"].toordinal(), (r["end_date"] or r["start_date"]).toordinal())
+        spans[key] = spans.get(key, 0) + int(r["impressions"].scaleb(2).to_integral_value())
+    for spans in spans_by_file.values():
+        prorate_spans(spans, days)
+    ProratedDay.objects.bulk_create(
+        [
+            ProratedDay(day=day, year=day.year, month=day.month, impressions=Decimal(cents).scaleb(-2))
+            for day, cents in ((date.fromordinal(ordinal), cents) for ordinal, cents in sorted(days.items()))
+            if cents
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0006_aggregation_cube"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProratedDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(unique=True, verbose_name="Day")),
+                ("year", models.PositiveIntegerField(verbose_name="Year")),
+                ("month", models.PositiveSmallIntegerField(verbose_name="Month")),
+                (
+                    "impressions",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=24,
+                        verbose_name="Impressions",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Prorated day",
+                "verbose_name_plural": "Prorated days",
+                "db_table": "data_processing_prorated_day",
+                "ordering": ["day"],
+                "indexes": [
+                    models.Index(
+                        fields=["year", "month"], name="data_proces_year_0e2731_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_prorated_days, migrations.RunPython.noop),
+    ]
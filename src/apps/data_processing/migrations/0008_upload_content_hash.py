@@ -0,0 +1,56 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:38
+
+from django.conf import settings
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_stored_files(apps, schema_editor):
+    """Hash uploads whose raw file is kept (background uploads), so re-uploads of them are detected."""
+    DataFile = apps.get_model("data_processing", "DataFile")
+
+    for data_file in DataFile.objects.exclude(stored_file="").exclude(stored_file__isnull=True).iterator():
+        digest = hashlib.sha256()
+        try:
+            with data_file.stored_file.open("rb") as fileobj:
+                for chunk in fileobj.chunks():
+                    digest.update(chunk)
+        except OSError:
+            continue
+        DataFile.objects.filter(pk=data_file.pk).update(content_hash=digest.hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0007_prorated_days"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="datafile",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                max_length=64,
+                verbose_name="Content hash (SHA-256)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingestjob",
+            name="replace",
+            field=models.BooleanField(
+                default=False, verbose_name="Replace earlier uploads"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="datafile",
+            index=models.Index(
+                fields=["content_hash"], name="data_proces_content_5c2cdb_idx"
+            ),
+        ),
+        migrations.RunPython(hash_stored_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:44
+
+import hashlib
+
+from django.db import migrations, models
+
+# Frozen copy of the row key scheme of services.loader as of this migration
+KEY_FIELDS = ("advertiser", "brand", "start_date", "end_date", "format_type", "platform")
+
+
+class RowKeys:
+    """A hash of KEY_FIELDS; the n-th repeat of the same values gets a hash of that hash and n."""
+
+    def __init__(self):
+        self.seen = {}
+
+    def key(self, values):
+        base = hashlib.blake2b(
+            "\x1f".join("" if v is None else str(v) for v in values).encode(), digest_size=16
+        ).hexdigest()
+        repeat = self.seen.get(base, 0)
+        self.seen[base] = repeat + 1
+        if not repeat:
+            return base
+        return hashlib.blake2b(f"{base}:{repeat}".encode(), digest_size=16).hexdigest()
+
+
+def assign_row_keys(apps, schema_editor):
+    """Key the records of earlier uploads in insertion order, the way ingest keys new ones."""
+    DataRecord = apps.get_model("data_processing", "DataRecord")
+
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    sql = "UPDATE {} SET {} = %s WHERE {} = %s".format(
+        quote(DataRecord._meta.db_table), quote("row_key"), quote("id")
+    )
+    file_ids = DataRecord.objects.order_by().values_list("file_id", flat=True).distinct()
+    for file_id in list(file_ids):
+        row_keys = RowKeys()
+        records = (
+            DataRecord.objects.filter(file_id=file_id).order_by("id").values_list("id", *KEY_FIELDS).iterator()
+        )
+        params = [(row_keys.key(values), record_id) for record_id, *values in records]
+        with connection.cursor() as cursor:
+            for offset in range(0, len(params), 5000):
+                cursor.executemany(sql, params[offset:offset + 5000])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0008_upload_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="datarecord",
+            name="row_key",
+            field=models.CharField(
+                blank=True, default="", max_length=32, verbose_name="Row key"
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingestjob",
+            name="delta",
+            field=models.BooleanField(
+                default=False, verbose_name="Apply as delta to the previous version"
+            ),
+        ),
+        migrations.RunPython(assign_row_keys, migrations.RunPython.noop),
+    ]
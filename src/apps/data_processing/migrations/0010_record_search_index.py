@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# Frozen copy of the index definition at this point (text columns on the records table)
+RECORD_TABLE = "data_processing_data_record"
+SEARCH_TABLE = "data_processing_data_record_fts"
+SEARCH_FIELDS = ("advertiser", "brand", "platform")
+
+
+def index_sql(fields, options=""):
+    columns = ", ".join(fields)
+    new_values = ", ".join(f"new.{field}" for field in fields)
+    old_values = ", ".join(f"old.{field}" for field in fields)
+    insert = f"INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    delete = f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    return [
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5({columns}, "
+        f"content='{RECORD_TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'{options})",
+        f"CREATE TRIGGER {SEARCH_TABLE}_ad AFTER DELETE ON {RECORD_TABLE} BEGIN {delete} END",
+        f"CREATE TRIGGER {SEARCH_TABLE}_au AFTER UPDATE OF {columns} ON {RECORD_TABLE} BEGIN {delete} {insert} END",
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+    ]
+
+
+def drop_sql():
+    return [
+        f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_ad",
+        f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_au",
+        f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+    ]
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5 index over advertiser/brand/platform with its triggers, filled from the existing records."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in index_sql(SEARCH_FIELDS):
+        schema_editor.execute(sql)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in drop_sql():
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0009_delta_ingest"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
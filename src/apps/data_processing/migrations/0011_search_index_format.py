@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Frozen copy of the index definition at this point (text columns on the records table)
+RECORD_TABLE = "data_processing_data_record"
+SEARCH_TABLE = "data_processing_data_record_fts"
+SEARCH_FIELDS = ("advertiser", "brand", "platform", "format_type")
+
+
+def reinstall_search_index(apps, schema_editor):
+    """Recreate the index with the format column and prefix indexes, refilled from the records."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    columns = ", ".join(SEARCH_FIELDS)
+    new_values = ", ".join(f"new.{field}" for field in SEARCH_FIELDS)
+    old_values = ", ".join(f"old.{field}" for field in SEARCH_FIELDS)
+    insert = f"INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    delete = f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    for sql in [
+        f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_ad",
+        f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_au",
+        f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5({columns}, content='{RECORD_TABLE}', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER {SEARCH_TABLE}_ad AFTER DELETE ON {RECORD_TABLE} BEGIN {delete} END",
+        f"CREATE TRIGGER {SEARCH_TABLE}_au AFTER UPDATE OF {columns} ON {RECORD_TABLE} BEGIN {delete} {insert} END",
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+    ]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0010_record_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
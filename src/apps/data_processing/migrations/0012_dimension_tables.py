@@ -0,0 +1,288 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DIMENSIONS = {
+    "advertiser": "Advertiser",
+    "brand": "Brand",
+    "format_type": "FormatType",
+    "platform": "Platform",
+}
+# Frozen copy of the search index definitions: of migration 0011 (text columns on the records
+# table) and of this migration (a view with the dimension names as the external content)
+RECORD_TABLE = "data_processing_data_record"
+CONTENT_VIEW = "data_processing_data_record_text"
+SEARCH_TABLE = "data_processing_data_record_fts"
+SEARCH_FIELDS = ("advertiser", "brand", "platform", "format_type")
+DIMENSION_TABLES = {
+    "advertiser": "data_processing_advertiser",
+    "brand": "data_processing_brand",
+    "platform": "data_processing_platform",
+    "format_type": "data_processing_format_type",
+}
+SEARCH_OPTIONS = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+
+
+def _execute(schema_editor, statements):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def _index_sql(content, new_values, old_values, update_columns):
+    columns = ", ".join(SEARCH_FIELDS)
+    insert = f"INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    delete = f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    return [
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5({columns}, "
+        f"content='{content}', content_rowid='id', {SEARCH_OPTIONS})",
+        f"CREATE TRIGGER {SEARCH_TABLE}_ad AFTER DELETE ON {RECORD_TABLE} BEGIN {delete} END",
+        f"CREATE TRIGGER {SEARCH_TABLE}_au AFTER UPDATE OF {update_columns} ON {RECORD_TABLE} "
+        f"BEGIN {delete} {insert} END",
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+    ]
+
+
+def drop_text_search_index(apps, schema_editor):
+    """The old index reads the text columns, which are dropped below."""
+    _execute(schema_editor, [
+        f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_ad",
+        f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_au",
+        f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+    ])
+
+
+def create_text_search_index(apps, schema_editor):
+    """Reverse: the index of migration 0011 over the restored text columns."""
+    _execute(schema_editor, _index_sql(
+        RECORD_TABLE,
+        new_values=", ".join(f"new.{field}" for field in SEARCH_FIELDS),
+        old_values=", ".join(f"old.{field}" for field in SEARCH_FIELDS),
+        update_columns=", ".join(SEARCH_FIELDS),
+    ))
+
+
+def _name_sql(field, row):
+    return f"(SELECT name FROM {DIMENSION_TABLES[field]} WHERE id = {row}.{field}_id)"
+
+
+def create_search_index(apps, schema_editor):
+    """Index over a view of the records with their dimension names; the triggers look the names up."""
+    joins = "".join(
+        f" LEFT JOIN {DIMENSION_TABLES[field]} d{i} ON d{i}.id = r.{field}_id" for i, field in enumerate(SEARCH_FIELDS)
+    )
+    names = ", ".join(f"d{i}.name AS {field}" for i, field in enumerate(SEARCH_FIELDS))
+    _execute(schema_editor, [
+        f"CREATE VIEW {CONTENT_VIEW} AS SELECT r.id AS id, {names} FROM {RECORD_TABLE} r{joins}",
+        *_index_sql(
+            CONTENT_VIEW,
+            new_values=", ".join(_name_sql(field, "new") for field in SEARCH_FIELDS),
+            old_values=", ".join(_name_sql(field, "old") for field in SEARCH_FIELDS),
+            update_columns=", ".join(f"{field}_id" for field in SEARCH_FIELDS),
+        ),
+    ])
+
+
+def remove_search_index(apps, schema_editor):
+    drop_text_search_index(apps, schema_editor)
+    _execute(schema_editor, [f"DROP VIEW IF EXISTS {CONTENT_VIEW}"])
+
+
+def encode_dimensions(apps, schema_editor):
+    """Fill the dimension tables with the distinct values and point the records at them, one UPDATE per field."""
+    DataRecord = apps.get_model("data_processing", "DataRecord")
+    quote = schema_editor.connection.ops.quote_name
+    records = quote(DataRecord._meta.db_table)
+    for field, model_name in DIMENSIONS.items():
+        model = apps.get_model("data_processing", model_name)
+        values = (
+            DataRecord.objects.exclude(**{f"{field}_name": ""}).exclude(**{f"{field}_name__isnull": True})
+            .order_by().values_list(f"{field}_name", flat=True).distinct()
+        )
+        model.objects.bulk_create([model(name=value) for value in values.iterator()], batch_size=1000)
+        table = quote(model._meta.db_table)
+        schema_editor.execute(
+            f"UPDATE {records} SET {quote(field + '_id')} = "
+            f"(SELECT id FROM {table} WHERE {table}.name = {records}.{quote(field + '_name')}) "
+            f"WHERE {quote(field + '_name')} <> ''"
+        )
+
+
+def decode_dimensions(apps, schema_editor):
+    """Reverse: copy the values back into the text columns."""
+    DataRecord = apps.get_model("data_processing", "DataRecord")
+    quote = schema_editor.connection.ops.quote_name
+    records = quote(DataRecord._meta.db_table)
+    for field, model_name in DIMENSIONS.items():
+        table = quote(apps.get_model("data_processing", model_name)._meta.db_table)
+        schema_editor.execute(
+            f"UPDATE {records} SET {quote(field + '_name')} = "
+            f"COALESCE((SELECT name FROM {table} WHERE {table}.id = {records}.{quote(field + '_id')}), '')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0011_search_index_format"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_text_search_index, create_text_search_index),
+        migrations.CreateModel(
+            name="Advertiser",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, unique=True, verbose_name="Name")),
+            ],
+            options={
+                "verbose_name": "Advertiser",
+                "verbose_name_plural": "Advertisers",
+                "db_table": "data_processing_advertiser",
+                "ordering": ["name"],
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="Brand",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, unique=True, verbose_name="Name")),
+            ],
+            options={
+                "verbose_name": "Brand",
+                "verbose_name_plural": "Brands",
+                "db_table": "data_processing_brand",
+                "ordering": ["name"],
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="FormatType",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, unique=True, verbose_name="Name")),
+            ],
+            options={
+                "verbose_name": "Format",
+                "verbose_name_plural": "Formats",
+                "db_table": "data_processing_format_type",
+                "ordering": ["name"],
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="Platform",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, unique=True, verbose_name="Name")),
+            ],
+            options={
+                "verbose_name": "Platform",
+                "verbose_name_plural": "Platforms",
+                "db_table": "data_processing_platform",
+                "ordering": ["name"],
+                "abstract": False,
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="datarecord",
+            name="data_proces_adverti_c6d1ef_idx",
+        ),
+        migrations.RenameField(
+            model_name="datarecord",
+            old_name="advertiser",
+            new_name="advertiser_name",
+        ),
+        migrations.AddField(
+            model_name="datarecord",
+            name="advertiser",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="records",
+                to="data_processing.advertiser",
+                verbose_name="Advertiser",
+            ),
+        ),
+        migrations.RenameField(
+            model_name="datarecord",
+            old_name="brand",
+            new_name="brand_name",
+        ),
+        migrations.AddField(
+            model_name="datarecord",
+            name="brand",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="records",
+                to="data_processing.brand",
+                verbose_name="Brand",
+            ),
+        ),
+        migrations.RenameField(
+            model_name="datarecord",
+            old_name="format_type",
+            new_name="format_type_name",
+        ),
+        migrations.AddField(
+            model_name="datarecord",
+            name="format_type",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="records",
+                to="data_processing.formattype",
+                verbose_name="Format",
+            ),
+        ),
+        migrations.RenameField(
+            model_name="datarecord",
+            old_name="platform",
+            new_name="platform_name",
+        ),
+        migrations.AddField(
+            model_name="datarecord",
+            name="platform",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="records",
+                to="data_processing.platform",
+                verbose_name="Platform",
+            ),
+        ),
+        migrations.RunPython(encode_dimensions, decode_dimensions),
+        migrations.RemoveField(
+            model_name="datarecord",
+            name="advertiser_name",
+        ),
+        migrations.RemoveField(
+            model_name="datarecord",
+            name="brand_name",
+        ),
+        migrations.RemoveField(
+            model_name="datarecord",
+            name="format_type_name",
+        ),
+        migrations.RemoveField(
+            model_name="datarecord",
+            name="platform_name",
+        ),
+        migrations.AddIndex(
+            model_name="datarecord",
+            index=models.Index(fields=["advertiser", "brand"], name="data_proces_adverti_9cffaf_idx"),
+        ),
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
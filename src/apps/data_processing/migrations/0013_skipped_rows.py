@@ -0,0 +1,143 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:21
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+_LOG_LINE_PREFIX = "Рядок "
+
+
+def _log_reason(detail):
+    """Reason code of a line of the old text log (services.parsing details)."""
+    if detail.startswith("невалідний формат Start"):
+        return "invalid_start"
+    if detail.startswith("невалідний формат End"):
+        return "invalid_end"
+    return "start_gt_end"
+
+
+def split_skipped_rows_logs(apps, schema_editor):
+    """Move the text logs of earlier uploads into SkippedRow rows and per-reason counts."""
+    DataFile = apps.get_model("data_processing", "DataFile")
+    SkippedRow = apps.get_model("data_processing", "SkippedRow")
+
+    files = DataFile.objects.exclude(skipped_rows_log="").only("id", "skipped_rows_log")
+    for data_file in files.iterator(chunk_size=100):
+        rows = []
+        for line in data_file.skipped_rows_log.splitlines():
+            row_num, _, detail = line.removeprefix(_LOG_LINE_PREFIX).partition(": ")
+            if not row_num.isdigit():
+                continue
+            rows.append(
+                SkippedRow(file_id=data_file.id, row_num=int(row_num), reason=_log_reason(detail), detail=detail)
+            )
+        SkippedRow.objects.bulk_create(rows, batch_size=5000)
+        counts = Counter(row.reason for row in rows)
+        DataFile.objects.filter(id=data_file.id).update(
+            rows_skipped=len(rows), skipped_counts=dict(sorted(counts.items()))
+        )
+
+
+def join_skipped_rows_logs(apps, schema_editor):
+    DataFile = apps.get_model("data_processing", "DataFile")
+    SkippedRow = apps.get_model("data_processing", "SkippedRow")
+
+    file_ids = SkippedRow.objects.order_by().values_list("file_id", flat=True).distinct()
+    for file_id in list(file_ids):
+        lines = SkippedRow.objects.filter(file_id=file_id).order_by("row_num").values_list("row_num", "detail")
+        DataFile.objects.filter(id=file_id).update(
+            skipped_rows_log="\n".join(f"{_LOG_LINE_PREFIX}{row_num}: {detail}" for row_num, detail in lines)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0012_dimension_tables"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="datafile",
+            name="rows_skipped",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Number of skipped rows"
+            ),
+        ),
+        migrations.AddField(
+            model_name="datafile",
+            name="skipped_counts",
+            field=models.JSONField(
+                blank=True, default=dict, verbose_name="Skipped rows by reason"
+            ),
+        ),
+        migrations.CreateModel(
+            name="SkippedRow",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("row_num", models.PositiveIntegerField(verbose_name="Row number")),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("invalid_start", "Invalid Start format"),
+                            ("invalid_end", "Invalid End format"),
+                            ("start_gt_end", "Start > End"),
+                        ],
+                        max_length=30,
+                        verbose_name="Reason",
+                    ),
+                ),
+                (
+                    "detail",
+                    models.TextField(blank=True, default="", verbose_name="Detail"),
+                ),
+                (
+                    "raw_values",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Raw values"
+                    ),
+                ),
+                (
+                    "file",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="skipped_rows",
+                        to="data_processing.datafile",
+                        verbose_name="File",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Skipped row",
+                "verbose_name_plural": "Skipped rows",
+                "db_table": "data_processing_skipped_row",
+                "ordering": ["file", "row_num"],
+                "indexes": [
+                    models.Index(
+                        fields=["file", "row_num"],
+                        name="data_proces_file_id_f14d4b_idx",
+                    ),
+                    models.Index(
+                        fields=["file", "reason", "row_num"],
+                        name="data_proces_file_id_05eafe_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(split_skipped_rows_logs, join_skipped_rows_logs),
+        migrations.RemoveField(
+            model_name="datafile",
+            name="skipped_rows_log",
+        ),
+    ]
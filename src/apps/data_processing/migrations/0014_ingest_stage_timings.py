@@ -0,0 +1,89 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0013_skipped_rows"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestStageTiming",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "stage",
+                    models.CharField(
+                        choices=[
+                            ("read", "Read file"),
+                            ("normalize", "Normalize columns"),
+                            ("dates", "Parse dates"),
+                            ("rows", "Build rows"),
+                            ("insert", "Insert records"),
+                            ("aggregate", "Update totals"),
+                            ("save", "Save file"),
+                        ],
+                        max_length=20,
+                        verbose_name="Stage",
+                    ),
+                ),
+                (
+                    "position",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Position"
+                    ),
+                ),
+                ("wall_time", models.FloatField(verbose_name="Wall time (s)")),
+                ("cpu_time", models.FloatField(verbose_name="CPU time (s)")),
+                (
+                    "peak_memory",
+                    models.PositiveBigIntegerField(
+                        blank=True, null=True, verbose_name="Peak memory (bytes)"
+                    ),
+                ),
+                (
+                    "calls",
+                    models.PositiveIntegerField(default=1, verbose_name="Chunks"),
+                ),
+                (
+                    "file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stage_timings",
+                        to="data_processing.datafile",
+                        verbose_name="File",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ingest stage timing",
+                "verbose_name_plural": "Ingest stage timings",
+                "db_table": "data_processing_ingest_stage_timing",
+                "ordering": ["file", "position"],
+                "indexes": [
+                    models.Index(
+                        fields=["-wall_time"], name="data_proces_wall_ti_65f132_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="ingeststagetiming",
+            constraint=models.UniqueConstraint(
+                fields=("file", "stage"),
+                name="data_processing_ingest_stage_timing_unique",
+            ),
+        ),
+    ]
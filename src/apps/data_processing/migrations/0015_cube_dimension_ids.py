@@ -0,0 +1,107 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:30
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, ExtractMonth
+
+# Cube dimensions moved from text to ids of the dimension tables of 0012 (frozen here)
+DIMENSIONS = ("advertiser", "brand", "platform", "format_type")
+LABELS = {"advertiser": "Advertiser", "brand": "Brand", "platform": "Platform", "format_type": "Format"}
+
+
+def _cells(apps, dimension_values):
+    """Cube cells grouped from the records, with each text dimension taken from dimension_values[name]."""
+    DataRecord = apps.get_model("data_processing", "DataRecord")
+    CubeCell = apps.get_model("data_processing", "CubeCell")
+    rows = (
+        DataRecord.objects.filter(year__isnull=False, start_date__isnull=False)
+        .annotate(cube_month=ExtractMonth("start_date"), **{f"cube_{name}": dimension_values[name] for name in DIMENSIONS})
+        .values("year", "cube_month", *(f"cube_{name}" for name in DIMENSIONS))
+        .annotate(records_count=Count("id"), total_impressions=Sum("impressions"))
+        .order_by()
+    )
+    CubeCell.objects.bulk_create(
+        (
+            CubeCell(
+                year=r["year"],
+                month=r["cube_month"],
+                records_count=r["records_count"],
+                total_impressions=r["total_impressions"] or 0,
+                **{name: r[f"cube_{name}"] for name in DIMENSIONS},
+            )
+            for r in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+def clear_cells(apps, schema_editor):
+    """The cube is derived from the records: rebuilt below in its new shape."""
+    apps.get_model("data_processing", "CubeCell").objects.all().delete()
+
+
+def fill_cells_by_id(apps, schema_editor):
+    _cells(apps, {name: Coalesce(F(f"{name}_id"), Value(0)) for name in DIMENSIONS})
+
+
+def fill_cells_by_name(apps, schema_editor):
+    """Reverse: the cube of 0014 with the dimension values as text."""
+    _cells(apps, {name: Coalesce(F(f"{name}__name"), Value("")) for name in DIMENSIONS})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_processing", "0014_ingest_stage_timings"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_cells, fill_cells_by_name),
+        migrations.RemoveConstraint(
+            model_name="cubecell",
+            name="data_processing_cube_cell_unique",
+        ),
+        migrations.RemoveIndex(
+            model_name="cubecell",
+            name="data_proces_platfor_9fb1dd_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="cubecell",
+            name="data_proces_adverti_9fde72_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="cubecell",
+            name="data_proces_format__77d4e8_idx",
+        ),
+        *(migrations.RemoveField(model_name="cubecell", name=name) for name in DIMENSIONS),
+        *(
+            migrations.AddField(
+                model_name="cubecell",
+                name=name,
+                field=models.PositiveIntegerField(
+                    db_column=f"{name}_id", default=0, verbose_name=f"{LABELS[name]} id"
+                ),
+            )
+            for name in DIMENSIONS
+        ),
+        migrations.AddConstraint(
+            model_name="cubecell",
+            constraint=models.UniqueConstraint(
+                fields=("year", "month", "advertiser", "brand", "platform", "format_type"),
+                name="data_processing_cube_cell_unique",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cubecell",
+            index=models.Index(fields=["platform", "year"], name="data_proces_platfor_3ef78e_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="cubecell",
+            index=models.Index(fields=["advertiser", "brand"], name="data_proces_adverti_05f5dc_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="cubecell",
+            index=models.Index(fields=["format_type", "year"], name="data_proces_format__6c3eaf_idx"),
+        ),
+        migrations.RunPython(fill_cells_by_id, clear_cells),
+    ]
@@ -64,10 +64,33 @@ class DataFile(models.Model):
         blank=True,
         verbose_name='Number of processed rows'
     )
-    skipped_rows_log = models.TextField(
+    stored_file = models.FileField(
+        upload_to='uploads/%Y/%m/%d/',
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name='Stored file'
+    )
+    date_format = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        verbose_name='Detected date format'
+    )
+    rows_skipped = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Number of skipped rows'
+    )
+    skipped_counts = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Skipped rows by reason'
+    )
+    content_hash = models.CharField(
+        max_length=64,
         blank=True,
         default='',
-        verbose_name='Лог пропущених рядків (Start > End)'
+        verbose_name='Content hash (SHA-256)'
     )
 
     class Meta:
@@ -79,12 +102,173 @@ class DataFile(models.Model):
             models.Index(fields=['user', '-uploaded_at']),
             models.Index(fields=['status']),
             models.Index(fields=['error_type']),
+            models.Index(fields=['content_hash']),
         ]
 
     def __str__(self):
         return f"{self.filename} - {self.get_status_display()}"
 
 
+class SkippedRow(models.Model):
+    """
+    Row of an uploaded file left out of processing (invalid Start/End or
+    Start > End), inserted in bulk on ingest (services/skipped.py).
+    """
+    _REASON_CHOICES = [
+        ('invalid_start', 'Invalid Start format'),
+        ('invalid_end', 'Invalid End format'),
+        ('start_gt_end', 'Start > End'),
+    ]
+
+    file = models.ForeignKey(
+        DataFile,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='skipped_rows',
+        verbose_name='File'
+    )
+    row_num = models.PositiveIntegerField(
+        verbose_name='Row number'
+    )
+    reason = models.CharField(
+        max_length=30,
+        choices=_REASON_CHOICES,
+        verbose_name='Reason'
+    )
+    detail = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Detail'
+    )
+    raw_values = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Raw values'
+    )
+
+    class Meta:
+        verbose_name = 'Skipped row'
+        verbose_name_plural = 'Skipped rows'
+        db_table = 'data_processing_skipped_row'
+        ordering = ['file', 'row_num']
+        indexes = [
+            models.Index(fields=['file', 'row_num']),
+            models.Index(fields=['file', 'reason', 'row_num']),
+        ]
+
+    def __str__(self):
+        return f"Row {self.row_num} of {self.file_id}: {self.get_reason_display()}"
+
+
+class IngestStageTiming(models.Model):
+    """
+    Time and memory one stage of a file's ingest took, summed over its
+    chunks (services/timing.py).
+    """
+    _STAGE_CHOICES = [
+        ('read', 'Read file'),
+        ('normalize', 'Normalize columns'),
+        ('dates', 'Parse dates'),
+        ('rows', 'Build rows'),
+        ('insert', 'Insert records'),
+        ('aggregate', 'Update totals'),
+        ('save', 'Save file'),
+    ]
+
+    file = models.ForeignKey(
+        DataFile,
+        on_delete=models.CASCADE,
+        related_name='stage_timings',
+        verbose_name='File'
+    )
+    stage = models.CharField(
+        max_length=20,
+        choices=_STAGE_CHOICES,
+        verbose_name='Stage'
+    )
+    position = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Position'
+    )
+    wall_time = models.FloatField(
+        verbose_name='Wall time (s)'
+    )
+    cpu_time = models.FloatField(
+        verbose_name='CPU time (s)'
+    )
+    peak_memory = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Peak memory (bytes)'
+    )
+    calls = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Chunks'
+    )
+
+    class Meta:
+        verbose_name = 'Ingest stage timing'
+        verbose_name_plural = 'Ingest stage timings'
+        db_table = 'data_processing_ingest_stage_timing'
+        ordering = ['file', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['file', 'stage'], name='data_processing_ingest_stage_timing_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['-wall_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.file_id}/{self.stage}: {self.wall_time:.3f}s"
+
+
+class Dimension(models.Model):
+    """
+    Distinct value of a record dimension, stored once and referenced from
+    DataRecord by an integer key (services/dimensions.py).
+    """
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Name'
+    )
+
+    class Meta:
+        abstract = True
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class Advertiser(Dimension):
+    class Meta(Dimension.Meta):
+        verbose_name = 'Advertiser'
+        verbose_name_plural = 'Advertisers'
+        db_table = 'data_processing_advertiser'
+
+
+class Brand(Dimension):
+    class Meta(Dimension.Meta):
+        verbose_name = 'Brand'
+        verbose_name_plural = 'Brands'
+        db_table = 'data_processing_brand'
+
+
+class FormatType(Dimension):
+    class Meta(Dimension.Meta):
+        verbose_name = 'Format'
+        verbose_name_plural = 'Formats'
+        db_table = 'data_processing_format_type'
+
+
+class Platform(Dimension):
+    class Meta(Dimension.Meta):
+        verbose_name = 'Platform'
+        verbose_name_plural = 'Platforms'
+        db_table = 'data_processing_platform'
+
+
 class DataRecord(models.Model):
     """
     Individual records from uploaded files
@@ -100,16 +284,22 @@ class DataRecord(models.Model):
         blank=True,
         verbose_name='Year'
     )
-    advertiser = models.CharField(
-        max_length=255,
+    advertiser = models.ForeignKey(
+        Advertiser,
+        on_delete=models.PROTECT,
         null=True,
         blank=True,
+        db_index=False,
+        related_name='records',
         verbose_name='Advertiser'
     )
-    brand = models.CharField(
-        max_length=255,
+    brand = models.ForeignKey(
+        Brand,
+        on_delete=models.PROTECT,
         null=True,
         blank=True,
+        db_index=False,
+        related_name='records',
         verbose_name='Brand'
     )
     start_date = models.DateField(
@@ -122,16 +312,22 @@ class DataRecord(models.Model):
         blank=True,
         verbose_name='End date'
     )
-    format_type = models.CharField(
-        max_length=100,
+    format_type = models.ForeignKey(
+        FormatType,
+        on_delete=models.PROTECT,
         null=True,
         blank=True,
+        db_index=False,
+        related_name='records',
         verbose_name='Format'
     )
-    platform = models.CharField(
-        max_length=100,
+    platform = models.ForeignKey(
+        Platform,
+        on_delete=models.PROTECT,
         null=True,
         blank=True,
+        db_index=False,
+        related_name='records',
         verbose_name='Platform'
     )
     impressions = models.DecimalField(
@@ -141,6 +337,12 @@ class DataRecord(models.Model):
         blank=True,
         verbose_name='Impressions'
     )
+    row_key = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        verbose_name='Row key'
+    )
     created_at = models.DateTimeField(
         default=timezone.now,
         verbose_name='Created at'
@@ -159,4 +361,257 @@ class DataRecord(models.Model):
         ]
 
     def __str__(self):
-        return f"Data record {self.id} from {self.file.filename} ({self.year})"
+        return f"Data record {self.id} of file {self.file_id} ({self.year})"
+
+
+class IngestJob(models.Model):
+    """
+    Background parsing of a stored upload, drained by `manage.py process_ingest_jobs`.
+    """
+    _STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    data_file = models.OneToOneField(
+        DataFile,
+        on_delete=models.CASCADE,
+        related_name='ingest_job',
+        verbose_name='File'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=_STATUS_CHOICES,
+        default='queued',
+        verbose_name='Job status'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Attempts'
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=3,
+        verbose_name='Max attempts'
+    )
+    replace = models.BooleanField(
+        default=False,
+        verbose_name='Replace earlier uploads'
+    )
+    delta = models.BooleanField(
+        default=False,
+        verbose_name='Apply as delta to the previous version'
+    )
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Available at'
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Locked at'
+    )
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name='Worker'
+    )
+    last_error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Last error'
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Created at'
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Finished at'
+    )
+
+    class Meta:
+        verbose_name = 'Ingest job'
+        verbose_name_plural = 'Ingest jobs'
+        db_table = 'data_processing_ingest_job'
+        ordering = ['available_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"Ingest job {self.id} ({self.get_status_display()})"
+
+
+class YearlyRollup(models.Model):
+    """
+    Totals of DataRecord by year read by the statistics page; updated with
+    per-file deltas on ingest and deletion (services/rollup.py).
+    """
+    year = models.PositiveIntegerField(
+        unique=True,
+        verbose_name='Year'
+    )
+    records_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Number of records'
+    )
+    total_impressions = models.DecimalField(
+        max_digits=24,
+        decimal_places=2,
+        default=0,
+        verbose_name='Total impressions'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Updated at'
+    )
+
+    class Meta:
+        verbose_name = 'Yearly rollup'
+        verbose_name_plural = 'Yearly rollup'
+        db_table = 'data_processing_yearly_rollup'
+        ordering = ['year']
+
+    def __str__(self):
+        return f"Rollup {self.year}: {self.records_count} records"
+
+
+class FileYearTotal(models.Model):
+    """
+    Contribution of one DataFile to YearlyRollup, subtracted when the file is deleted.
+    """
+    file = models.ForeignKey(
+        DataFile,
+        on_delete=models.CASCADE,
+        related_name='year_totals',
+        verbose_name='File'
+    )
+    year = models.PositiveIntegerField(
+        verbose_name='Year'
+    )
+    records_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Number of records'
+    )
+    total_impressions = models.DecimalField(
+        max_digits=24,
+        decimal_places=2,
+        default=0,
+        verbose_name='Total impressions'
+    )
+
+    class Meta:
+        verbose_name = 'File year total'
+        verbose_name_plural = 'File year totals'
+        db_table = 'data_processing_file_year_total'
+        ordering = ['file', 'year']
+        constraints = [
+            models.UniqueConstraint(fields=['file', 'year'], name='data_processing_file_year_total_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.file_id}/{self.year}: {self.records_count} records"
+
+
+class CubeCell(models.Model):
+    """
+    Aggregation cube over DataRecord dimensions (month is the month of Start):
+    one row per dimension combination, updated on ingest and deletion (services/cube.py).
+    Advertiser, brand, platform and format are ids of the dimension tables
+    (0 where the records have none), like the keys of DataRecord.
+    """
+    year = models.PositiveIntegerField(
+        verbose_name='Year'
+    )
+    month = models.PositiveSmallIntegerField(
+        verbose_name='Month'
+    )
+    advertiser = models.PositiveIntegerField(
+        default=0,
+        db_column='advertiser_id',
+        verbose_name='Advertiser id'
+    )
+    brand = models.PositiveIntegerField(
+        default=0,
+        db_column='brand_id',
+        verbose_name='Brand id'
+    )
+    platform = models.PositiveIntegerField(
+        default=0,
+        db_column='platform_id',
+        verbose_name='Platform id'
+    )
+    format_type = models.PositiveIntegerField(
+        default=0,
+        db_column='format_type_id',
+        verbose_name='Format id'
+    )
+    records_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Number of records'
+    )
+    total_impressions = models.DecimalField(
+        max_digits=24,
+        decimal_places=2,
+        default=0,
+        verbose_name='Total impressions'
+    )
+
+    class Meta:
+        verbose_name = 'Cube cell'
+        verbose_name_plural = 'Cube cells'
+        db_table = 'data_processing_cube_cell'
+        ordering = ['year', 'month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['year', 'month', 'advertiser', 'brand', 'platform', 'format_type'],
+                name='data_processing_cube_cell_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['platform', 'year']),
+            models.Index(fields=['advertiser', 'brand']),
+            models.Index(fields=['format_type', 'year']),
+        ]
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} {self.advertiser}/{self.brand}/{self.platform}/{self.format_type}"
+
+
+class ProratedDay(models.Model):
+    """
+    Impressions spread evenly over the days between Start and End of each record,
+    one row per day, maintained on ingest and deletion (services/proration.py).
+    """
+    day = models.DateField(
+        unique=True,
+        verbose_name='Day'
+    )
+    year = models.PositiveIntegerField(
+        verbose_name='Year'
+    )
+    month = models.PositiveSmallIntegerField(
+        verbose_name='Month'
+    )
+    impressions = models.DecimalField(
+        max_digits=24,
+        decimal_places=2,
+        default=0,
+        verbose_name='Impressions'
+    )
+
+    class Meta:
+        verbose_name = 'Prorated day'
+        verbose_name_plural = 'Prorated days'
+        db_table = 'data_processing_prorated_day'
+        ordering = ['day']
+        indexes = [
+            models.Index(fields=['year', 'month']),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.impressions}"
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+
+def estimate_record_count(queryset):
+    """
+    Cheap count of DataRecord for an unfiltered queryset: the sum of the
+    yearly rollup instead of COUNT(*) over the table. None when filtered.
+    """
+    from django.db.models import Sum
+
+    from .models import YearlyRollup
+
+    if queryset.query.where:
+        return None
+    return YearlyRollup.objects.aggregate(total=Sum("records_count"))["total"] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large querysets. Rows are counted exactly only up to
+    `exact_count_limit` (a COUNT over a LIMITed subquery); beyond that the
+    count comes from `estimate(object_list)`, and `estimated` is set so the
+    page can say so; without an estimate the count stays at limit + 1 and
+    `limit_exceeded` is set instead.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 exact_count_limit=None, estimate=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.exact_count_limit = exact_count_limit or settings.DATA_PROCESSING_ADMIN_EXACT_COUNT_LIMIT
+        self.estimate = estimate
+        self.estimated = False
+        self.limit_exceeded = False
+
+    @cached_property
+    def count(self):
+        bounded = self.object_list.order_by()[:self.exact_count_limit + 1].count()
+        if bounded <= self.exact_count_limit:
+            return bounded
+        estimate = self.estimate(self.object_list) if self.estimate else None
+        if estimate is None:
+            self.limit_exceeded = True
+            return bounded
+        self.estimated = True
+        return max(estimate, bounded)
@@ -0,0 +1,122 @@
+"""
+SQL-запити запиту: запис із часом виконання (QueryRecorder через
+connection.execute_wrapper), EXPLAIN QUERY PLAN для повільних і бюджети
+кількості запитів для view. Бюджет оголошується на самому view
+(@query_budget(n), атрибут query_budget класу або query_budgets у
+ModelAdmin); перевищення QueryLogMiddleware пише в лог, а з
+DATA_PROCESSING_QUERY_BUDGET_STRICT (у тестах) кидає QueryBudgetExceeded.
+У тестах record_queries() дає ті самі записи для будь-якого блоку коду.
+"""
+import time
+
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Queries listed in a budget report; the most repeated statements come first
+REPORT_QUERIES_LIMIT = 10
+# Queries a recorder keeps with their SQL; later ones only add to its count and duration
+RECORDED_QUERIES_LIMIT = 1000
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more queries than its declared budget (raised only in strict mode)."""
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper recording the SQL, params and duration of the first
+    `limit` queries; for executemany() params is the batch size, not the rows sent.
+    """
+
+    def __init__(self, limit=RECORDED_QUERIES_LIMIT):
+        self.queries = []
+        self.limit = limit
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if len(self.queries) < self.limit:
+                if many:
+                    params = len(params) if hasattr(params, "__len__") else None
+                self.queries.append({"sql": sql, "params": params, "many": many, "duration": duration})
+
+    def slow(self, threshold):
+        """Single-statement queries that took at least `threshold` seconds, slowest first."""
+        slow = [q for q in self.queries if not q["many"] and q["duration"] >= threshold]
+        return sorted(slow, key=lambda q: q["duration"], reverse=True)
+
+    def report(self, limit=REPORT_QUERIES_LIMIT):
+        """Readable summary: totals and the most repeated statements (an N+1 shows up as one SQL many times)."""
+        repeated = Counter(q["sql"] for q in self.queries)
+        lines = [f"{self.count} queries in {self.duration * 1000:.1f} ms"]
+        if self.count > len(self.queries):
+            lines[0] += f" (statements of the first {len(self.queries)})"
+        lines.extend(f"  {times} x {sql}" for sql, times in repeated.most_common(limit))
+        if len(repeated) > limit:
+            lines.append(f"  ... and {len(repeated) - limit} more distinct statements")
+        return "\n".join(lines)
+
+
+@contextmanager
+def record_queries(using=DEFAULT_DB_ALIAS):
+    """Record the queries run inside the block; yields the QueryRecorder."""
+    recorder = QueryRecorder()
+    with connections[using].execute_wrapper(recorder):
+        yield recorder
+
+
+def explain_query_plan(sql, params, using=DEFAULT_DB_ALIAS):
+    """
+    Query plan of a SELECT as text (EXPLAIN QUERY PLAN on SQLite, EXPLAIN
+    elsewhere), or None for other statements. Must run outside record_queries
+    of the same connection, or the EXPLAIN itself is recorded.
+    """
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    connection = connections[using]
+    prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError as e:
+        return f"(EXPLAIN failed: {e})"
+    if connection.vendor == "sqlite":
+        # (id, parent, notused, detail)
+        return "\n".join(str(row[-1]) for row in rows)
+    return "\n".join(" ".join(str(v) for v in row) for row in rows)
+
+
+def query_budget(limit):
+    """Declare the most queries a function view may run per request."""
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
+
+
+def view_query_budget(resolver_match):
+    """
+    Budget of the resolved view: @query_budget on the function, query_budget
+    on a class-based view, or query_budgets[<view>] on a ModelAdmin, where
+    <view> is the last part of the admin URL name (changelist, change, ...).
+    """
+    func = resolver_match.func
+    budget = getattr(func, "query_budget", None)
+    if budget is None:
+        budget = getattr(getattr(func, "view_class", None), "query_budget", None)
+    model_admin = getattr(func, "model_admin", None)
+    if budget is None and model_admin is not None and resolver_match.url_name:
+        budget = getattr(model_admin, "query_budgets", {}).get(resolver_match.url_name.rsplit("_", 1)[-1])
+    return budget
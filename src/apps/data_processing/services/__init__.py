@@ -1,8 +1,28 @@
 """
-Сервіси обробки даних: парсинг/валідація файлів, завантаження в БД, агрегація.
+Сервіси обробки даних: парсинг/валідація файлів, завантаження в БД, фонова черга, прогрес обробки, агрегація.
+Імена нижче імпортуються з підмодулів лише при першому зверненні: парсер тягне за собою pandas,
+numpy та openpyxl, які не потрібні процесам, що файлів не розбирають (manage.py, міграції, старт воркера).
 """
-from .parsing import validate_and_parse
-from .upload import process_file_upload
-from .aggregation import get_aggregated_stats
+from importlib import import_module
 
-__all__ = ["validate_and_parse", "process_file_upload", "get_aggregated_stats"]
+_EXPORTS = {
+    "validate_and_parse": "parsing",
+    "process_file_upload": "upload",
+    "enqueue_file_upload": "jobs",
+    "get_upload_progress": "progress",
+    "get_aggregated_stats": "aggregation",
+}
+
+__all__ = [
+    "validate_and_parse", "process_file_upload", "enqueue_file_upload", "get_upload_progress",
+    "get_aggregated_stats",
+]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
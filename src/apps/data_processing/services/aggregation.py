@@ -1,30 +1,68 @@
 from django.db.models import Sum
 
-from ..models import DataRecord
+from ..models import ProratedDay, YearlyRollup
+from .cache import cached_stats
 
 
 AGGREGATED_NUMERIC_FIELDS = [
     ("impressions", "Impressions (Impr)"),
 ]
 
+# How a record's impressions are booked to years
+STATS_MODE_START = "start"  # all to the year of Start
+STATS_MODE_PRORATED = "prorated"  # spread evenly over the days between Start and End
+STATS_MODES = (STATS_MODE_START, STATS_MODE_PRORATED)
 
-def get_aggregated_stats():
-    """Returns context for aggregated statistics page: numeric_columns, year_stats."""
-    annotate_kw = {f"total_{name}": Sum(name) for name, _ in AGGREGATED_NUMERIC_FIELDS}
-    qs = (
-        DataRecord.objects.filter(year__isnull=False)
-        .values("year")
-        .annotate(**annotate_kw)
-        .order_by("year")
-    )
-    year_stats = []
-    for r in qs:
-        row = {"year": r["year"], "totals": []}
-        for name, _ in AGGREGATED_NUMERIC_FIELDS:
-            val = r.get(f"total_{name}")
-            row["totals"].append(val if val is not None else 0)
-        year_stats.append(row)
+
+def plain_total(value):
+    """Stored total without the trailing zeros of the decimal column (100.00 -> 100, 1.50 -> 1.5)."""
+    if value == value.to_integral_value():
+        return value.quantize(1)
+    return value.normalize()
+
+
+def get_aggregated_stats(mode=STATS_MODE_START):
+    """
+    Returns context for aggregated statistics page: numeric_columns, year_stats, mode.
+    mode "start" books totals to the year of Start (YearlyRollup), "prorated"
+    to the years of the days they were spread over (ProratedDay).
+    Cached per data version (services.cache).
+    """
+    if mode not in STATS_MODES:
+        raise ValueError(f"Unknown stats mode: {mode!r}")
+    if mode == STATS_MODE_PRORATED:
+        return cached_stats("aggregated:prorated", _compute_prorated_stats)
+    return cached_stats("aggregated", _compute_aggregated_stats)
+
+
+def warm_stats_cache():
+    """Compute and cache the stats for the current data version (e.g. after a bulk ingest)."""
+    for mode in STATS_MODES:
+        get_aggregated_stats(mode)
+
+
+def _compute_aggregated_stats():
+    """Stats context read from the YearlyRollup table maintained on ingest."""
+    fields = [f"total_{name}" for name, _ in AGGREGATED_NUMERIC_FIELDS]
+    year_stats = [
+        {"year": r["year"], "totals": [plain_total(r[field]) for field in fields]}
+        for r in YearlyRollup.objects.values("year", *fields).order_by("year")
+    ]
+    return {
+        "numeric_columns": AGGREGATED_NUMERIC_FIELDS,
+        "year_stats": year_stats,
+        "mode": STATS_MODE_START,
+    }
+
+
+def _compute_prorated_stats():
+    """Stats context with impressions summed per year from ProratedDay (other columns are not prorated)."""
+    year_stats = [
+        {"year": r["year"], "totals": [plain_total(r["impressions"])]}
+        for r in ProratedDay.objects.values("year").annotate(impressions=Sum("impressions")).order_by("year")
+    ]
     return {
         "numeric_columns": AGGREGATED_NUMERIC_FIELDS,
         "year_stats": year_stats,
+        "mode": STATS_MODE_PRORATED,
     }
@@ -0,0 +1,58 @@
+"""
+Кеш агрегованої статистики з версією даних. Версія змінюється, коли
+DataFile завершує обробку або видаляється; закешоване значення
+зберігається разом з версією, для якої його пораховано, тому читання між
+завантаженнями — один запит get_many до кешу.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from ..metrics import stats_cache_requests_total
+
+DATA_VERSION_KEY = "data_processing:data_version"
+STATS_KEY_PREFIX = "data_processing:stats:"
+
+
+def _cache():
+    return caches[settings.DATA_PROCESSING_STATS_CACHE_ALIAS]
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def bump_data_version():
+    """Invalidate every cached stats value (new data version)."""
+    _cache().set(DATA_VERSION_KEY, _new_version(), None)
+
+
+def invalidate_stats_on_commit():
+    """Bump the data version once the current transaction commits (immediately outside one)."""
+    transaction.on_commit(bump_data_version)
+
+
+def cached_stats(name, compute, kind="stats"):
+    """
+    Value of compute() cached under `name` for the current data version.
+    A hit costs one get_many(); on a miss the value is stored with the
+    version read before computing, so a bump during compute is not lost.
+    `kind` labels the lookup in the hit/miss metric ("stats", "cube").
+    """
+    cache = _cache()
+    key = STATS_KEY_PREFIX + name
+    found = cache.get_many([DATA_VERSION_KEY, key])
+    version = found.get(DATA_VERSION_KEY)
+    if version is None:
+        cache.add(DATA_VERSION_KEY, _new_version(), None)
+        version = cache.get(DATA_VERSION_KEY)
+    entry = found.get(key)
+    if entry is not None and entry[0] == version:
+        stats_cache_requests_total.inc(cache=kind, result="hit")
+        return entry[1]
+    stats_cache_requests_total.inc(cache=kind, result="miss")
+    value = compute()
+    cache.set(key, (version, value), settings.DATA_PROCESSING_STATS_CACHE_TIMEOUT)
+    return value
@@ -0,0 +1,250 @@
+"""
+Агрегаційний куб (CubeCell) по вимірах DataRecord: рік, місяць Start,
+рекламодавець, бренд, платформа, формат. Обробка файлу додає до куба
+свої комірки в тій самій транзакції, що й записи; видалення файлу
+віднімає комірки, пораховані з його записів. Рекламодавець, бренд,
+платформа й формат зберігаються в кубі id зі словників
+(services/dimensions.py), як і в записах; назви підставляються лише у
+відповідь. query_cube відповідає на roll-up / drill-down по будь-якій
+підмножині вимірів з фільтрами з куба, а не з сирої таблиці.
+"""
+import hashlib
+import json
+
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth
+
+from .cache import cached_stats, invalidate_stats_on_commit
+from .dimensions import DimensionEncoder, decode_dimensions, dimension_ids, dimension_model
+
+# (dimension, label) in drill-down order
+CUBE_DIMENSIONS = [
+    ("year", "Рік"),
+    ("month", "Місяць"),
+    ("advertiser", "Advertiser"),
+    ("brand", "Brand"),
+    ("platform", "Platform"),
+    ("format_type", "Format"),
+]
+DIMENSION_NAMES = [name for name, _ in CUBE_DIMENSIONS]
+# Dimensions stored as ids of their dictionary tables (0 where a record has none)
+_ID_DIMENSIONS = ("advertiser", "brand", "platform", "format_type")
+MEASURES = ("records_count", "total_impressions")
+
+
+class CubeTotals:
+    """
+    Cube cells (dimension tuple -> [records_count, total_impressions]) of parsed
+    rows of one file, keyed by dimension ids from `dimensions` (a DimensionEncoder,
+    shared with the RecordLoader so values are looked up once per ingest).
+    """
+
+    def __init__(self, dimensions=None):
+        self.cells = {}
+        self.dimensions = DimensionEncoder() if dimensions is None else dimensions
+
+    def add(self, rows):
+        ids = self.dimensions.encode(rows)
+        advertisers, brands, platforms, formats = (ids[name] for name in _ID_DIMENSIONS)
+        cells = self.cells
+        for r in rows:
+            key = (
+                r["year"], r["start_date"].month,
+                advertisers.get(r["advertiser"], 0), brands.get(r["brand"], 0),
+                platforms.get(r["platform"], 0), formats.get(r["format_type"], 0),
+            )
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = [0, Decimal(0)]
+            cell[0] += 1
+            if r["impressions"] is not None:
+                cell[1] += r["impressions"]
+
+
+def _shift_cells(cells, sign):
+    """
+    Add (sign=1) or subtract (sign=-1) cells to CubeCell with one executemany
+    per batch: INSERT ... ON CONFLICT DO UPDATE to add where the backend
+    supports it, UPDATE to subtract (the cells exist). Cells left without
+    records are dropped.
+    """
+    from ..models import CubeCell
+
+    if not cells:
+        return
+    db = connections[DEFAULT_DB_ALIAS]
+    meta = CubeCell._meta
+    quote = db.ops.quote_name
+    table = quote(meta.db_table)
+    dims = [quote(meta.get_field(name).column) for name in DIMENSION_NAMES]
+    measures = [quote(meta.get_field(name).column) for name in MEASURES]
+    prep_total = meta.get_field("total_impressions").get_db_prep_save
+
+    if sign < 0:
+        sql = "UPDATE {table} SET {updates} WHERE {where}".format(
+            table=table,
+            updates=", ".join(f"{m} = {m} - %s" for m in measures),
+            where=" AND ".join(f"{d} = %s" for d in dims),
+        )
+        params = [(count, prep_total(total, db)) + key for key, (count, total) in cells.items()]
+    elif db.features.supports_update_conflicts_with_target:
+        sql = "INSERT INTO {table} ({columns}) VALUES ({values}) ON CONFLICT ({dims}) DO UPDATE SET {updates}".format(
+            table=table,
+            columns=", ".join(dims + measures),
+            values=", ".join(["%s"] * (len(dims) + len(measures))),
+            dims=", ".join(dims),
+            updates=", ".join(f"{m} = {table}.{m} + excluded.{m}" for m in measures),
+        )
+        params = [key + (count, prep_total(total, db)) for key, (count, total) in cells.items()]
+    else:
+        for key, (count, total) in cells.items():
+            cell, _ = CubeCell.objects.get_or_create(**dict(zip(DIMENSION_NAMES, key)))
+            CubeCell.objects.filter(pk=cell.pk).update(
+                records_count=F("records_count") + count, total_impressions=F("total_impressions") + total,
+            )
+        return
+
+    with db.cursor() as cursor:
+        for offset in range(0, len(params), 1000):
+            cursor.executemany(sql, params[offset:offset + 1000])
+    if sign < 0:
+        CubeCell.objects.filter(year__in={key[0] for key in cells}, records_count__lte=0).delete()
+
+
+def apply_file_cells(totals):
+    """Add the cells of a freshly ingested file to the cube. Call inside the ingest transaction."""
+    _shift_cells({key: cell for key, cell in totals.cells.items() if key[0] is not None}, 1)
+
+
+def apply_cells_delta(added, removed):
+    """Adjust the cube by added minus removed rows (CubeTotals of a delta ingest)."""
+    net = {key: list(cell) for key, cell in added.cells.items() if key[0] is not None}
+    for key, (count, total) in removed.cells.items():
+        if key[0] is not None:
+            cell = net.setdefault(key, [0, Decimal(0)])
+            cell[0] -= count
+            cell[1] -= total
+    # Cells losing records go through the subtracting UPDATE, the rest through the upsert.
+    _shift_cells({key: (-count, -total) for key, (count, total) in net.items() if count < 0}, -1)
+    _shift_cells({key: (count, total) for key, (count, total) in net.items() if count >= 0 and (count or total)}, 1)
+
+
+def _record_cells(records):
+    """Cube cells aggregated in the database from a DataRecord queryset, grouped on the dimension ids."""
+    rows = (
+        records.filter(year__isnull=False, start_date__isnull=False)
+        .annotate(cube_month=ExtractMonth("start_date"))
+        .values("year", "cube_month", *_ID_DIMENSIONS)
+        .annotate(records_count=Count("id"), total_impressions=Sum("impressions"))
+        .order_by()
+    )
+    return {
+        (r["year"], r["cube_month"], *(r[name] or 0 for name in _ID_DIMENSIONS)): (
+            r["records_count"], r["total_impressions"] or Decimal(0)
+        )
+        for r in rows
+    }
+
+
+def remove_file_cells(data_file):
+    """Subtract the file's records from the cube (before they are deleted)."""
+    from ..models import DataRecord
+
+    with transaction.atomic():
+        _shift_cells(_record_cells(DataRecord.objects.filter(file=data_file)), -1)
+
+
+def rebuild_cube():
+    """Recompute the cube from DataRecord. Returns the number of cells."""
+    from ..models import CubeCell, DataRecord
+
+    with transaction.atomic():
+        CubeCell.objects.all().delete()
+        CubeCell.objects.bulk_create(
+            [
+                CubeCell(**dict(zip(DIMENSION_NAMES, key)), records_count=count, total_impressions=total)
+                for key, (count, total) in _record_cells(DataRecord.objects.all()).items()
+            ],
+            batch_size=1000,
+        )
+        invalidate_stats_on_commit()
+    return CubeCell.objects.count()
+
+
+def _check_dimensions(names):
+    for name in names:
+        if name not in DIMENSION_NAMES:
+            raise ValueError(f"Unknown cube dimension: {name!r}")
+
+
+def _filter_kwargs(filters):
+    """Lookups of {dimension: values} filters; names of id dimensions are turned into their ids."""
+    _check_dimensions(filters or {})
+    kwargs = {}
+    for name, values in (filters or {}).items():
+        values = list(values) if isinstance(values, (list, tuple, set)) else [values]
+        if values and name in _ID_DIMENSIONS:
+            ids = dimension_ids(name, values, create=False)
+            values = [ids[value] if value else 0 for value in values if not value or value in ids]
+            if not values:
+                return None
+        if values:
+            kwargs[f"{name}__in"] = values
+    return kwargs
+
+
+def _query_cube(group_by, filters):
+    from ..models import CubeCell
+
+    lookups = _filter_kwargs(filters)
+    if lookups is None:
+        return []  # a filter value no record has
+    cells = CubeCell.objects.filter(**lookups)
+    measures = {"records_count": Sum("records_count"), "total_impressions": Sum("total_impressions")}
+    if group_by:
+        # Grouped on the ids; ordered in drill-down order once they are replaced with names
+        rows = list(cells.values(*group_by).annotate(**measures).order_by())
+        decode_dimensions(rows, [name for name in group_by if name in _ID_DIMENSIONS])
+        rows.sort(key=lambda r: [r[name] for name in group_by])
+    else:
+        totals = cells.aggregate(**measures)
+        rows = [{"records_count": totals["records_count"] or 0, "total_impressions": totals["total_impressions"]}]
+    return [{**r, "total_impressions": r["total_impressions"] or Decimal(0)} for r in rows]
+
+
+def query_cube(group_by=(), filters=None):
+    """
+    Roll-up / drill-down from the cube: rows of `group_by` dimensions (any
+    subset of DIMENSION_NAMES, in drill-down order) with records_count and
+    total_impressions, restricted by `filters` ({dimension: value or list}).
+    An empty group_by gives the grand total. Cached per data version.
+    """
+    _check_dimensions([*group_by, *(filters or {})])
+    group_by = [name for name in DIMENSION_NAMES if name in group_by]
+    filters = {
+        name: sorted(map(str, values)) if isinstance(values, (list, tuple, set)) else [str(values)]
+        for name, values in (filters or {}).items()
+    }
+    signature = hashlib.sha1(json.dumps([group_by, filters], sort_keys=True).encode()).hexdigest()
+    return cached_stats(f"cube:{signature}", lambda: _query_cube(group_by, filters), kind="cube")
+
+
+def _dimension_values(name, limit):
+    from ..models import CubeCell
+
+    if name not in _ID_DIMENSIONS:
+        return list(CubeCell.objects.values_list(name, flat=True).distinct().order_by(name)[:limit])
+    # Names of the ids present in the cube, sorted and cut in the dictionary table
+    return list(
+        dimension_model(name).objects.filter(pk__in=CubeCell.objects.values(name))
+        .order_by("name").values_list("name", flat=True)[:limit]
+    )
+
+
+def dimension_values(name, limit=500):
+    """Distinct values of a dimension present in the cube (for filter pickers)."""
+    _check_dimensions([name])
+    return cached_stats(f"cube_values:{name}:{limit}", lambda: _dimension_values(name, limit), kind="cube")
@@ -0,0 +1,266 @@
+"""
+Розбір дат Start/End: поелементний каскад форматів (_parse_date) та
+колонковий рушій, який розбирає цілу колонку векторизовано.
+"""
+import re
+
+from datetime import datetime, date
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMATS = [
+    "%d.%m.%y",
+    "%d.%m.%Y",
+    "%Y-%m-%d",
+    "%d/%m/%y",
+    "%d/%m/%Y",
+    "%d-%m-%y",
+    "%d-%m-%Y",
+    "%Y.%m.%d",
+    "%d %b %Y",
+    "%d %B %Y",
+    "%b %d, %Y",
+    "%B %d, %Y",
+    "%Y/%m/%d",
+    "%m/%d/%Y",
+    "%m.%d.%Y",
+    "%m-%d-%Y",
+]
+
+_EXCEL_EPOCH = np.datetime64("1899-12-30")
+
+# Serials above this are left to _parse_date: close to the Timedelta limit
+# pandas overflows and the per-value path has its own fallbacks.
+_EXCEL_SERIAL_VECTOR_MAX = 100_000
+_SERIAL_STRING_RE = re.compile(r"[1-9][0-9]{4}")
+
+# Vectorized string passes: (full-match pattern, formats tried in order).
+# _parse_date tries pd.Timestamp first, which reads ambiguous D/M/Y as
+# month-first and swaps only when the month is out of range, so the passes
+# mirror that order. Values are matched with surrounding spaces stripped
+# (pd.Timestamp ignores them); anything else goes to _parse_date unchanged.
+_VECTOR_DATE_PASSES = (
+    (r"[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}", ("%Y-%m-%d",)),
+    (r"[0-9]{4}\.[0-9]{1,2}\.[0-9]{1,2}", ("%Y.%m.%d",)),
+    (r"[0-9]{4}/[0-9]{1,2}/[0-9]{1,2}", ("%Y/%m/%d",)),
+    (r"[0-9]{1,2}\.[0-9]{1,2}\.[0-9]{4}", ("%m.%d.%Y", "%d.%m.%Y")),
+    (r"[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}", ("%m/%d/%Y", "%d/%m/%Y")),
+    (r"[0-9]{1,2}-[0-9]{1,2}-[0-9]{4}", ("%m-%d-%Y", "%d-%m-%Y")),
+    (r"[0-9]{1,2}\.[0-9]{1,2}\.[0-9]{2}", ("%m.%d.%y", "%d.%m.%y")),
+    (r"[0-9]{1,2}/[0-9]{1,2}/[0-9]{2}", ("%m/%d/%y", "%d/%m/%y")),
+    (r"[0-9]{1,2}-[0-9]{1,2}-[0-9]{2}", ("%m-%d-%y", "%d-%m-%y")),
+    (r"[0-9]{1,2} [A-Za-z]{3,9} [0-9]{4}", ("%d %b %Y", "%d %B %Y")),
+    (r"[A-Za-z]{3,9} [0-9]{1,2}, [0-9]{4}", ("%b %d, %Y", "%B %d, %Y")),
+)
+_VECTOR_YEAR_RANGE = (1900, 2200)
+
+# Per-file detection: a sample of the column votes for one format from
+# DATE_FORMATS (or Excel-serial mode), which then parses the whole column.
+EXCEL_SERIAL_FORMAT = "excel_serial"
+DETECTION_SAMPLE_SIZE = 1000
+DETECTION_MIN_SHARE = 0.8
+
+
+def _excel_serial_to_date(n):
+    """Convert Excel serial number to date."""
+    try:
+        days = int(round(float(n)))
+        if 0 < days <= 500000:
+            ts = pd.Timestamp("1899-12-30") + pd.Timedelta(days=days)
+            return ts.date()
+    except (ValueError, TypeError):
+        pass
+    return None
+
+
+_EXCEL_ERROR_STRINGS = frozenset(
+    s.strip().upper()
+    for s in ("#N/A", "#VALUE!", "#REF!", "#DIV/0!", "#NAME?", "#NULL!", "#NUM!", "#GETTING_DATA", "-", "—")
+)
+
+
+def _parse_date(val):  # noqa: C901
+    """Parse date from string, number (Excel serial), or datetime."""
+    if pd.isna(val) or val == "" or (isinstance(val, str) and not val.strip()):
+        return None
+    if isinstance(val, str) and val.strip().upper() in _EXCEL_ERROR_STRINGS:
+        return None
+    if isinstance(val, (datetime, date)):
+        return val.date() if isinstance(val, datetime) else val
+    if isinstance(val, (int, float)):
+        d = _excel_serial_to_date(val)
+        if d is not None:
+            return d
+        try:
+            return pd.Timestamp(val).date()
+        except (ValueError, TypeError, AttributeError):
+            pass
+        return None
+
+    try:
+        ts = pd.Timestamp(val)
+        return ts.date()
+    except (ValueError, TypeError, AttributeError):
+        pass
+    s = str(val).strip().strip("\ufeff")
+    if s.upper() in _EXCEL_ERROR_STRINGS:
+        return None
+
+    if s.isdigit() and len(s) >= 4:
+        d = _excel_serial_to_date(s)
+        if d is not None:
+            return d
+    try:
+        n = float(s.replace(",", "."))
+        d = _excel_serial_to_date(n)
+        if d is not None:
+            return d
+    except (ValueError, TypeError):
+        pass
+    if " " in s:
+        s = s.split(" ")[0].strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except (ValueError, TypeError):
+            continue
+
+    for dayfirst in (True, False):
+        try:
+            ts = pd.to_datetime(s, dayfirst=dayfirst, errors="coerce")
+            if pd.notna(ts):
+                return ts.date()
+        except (ValueError, TypeError):
+            continue
+
+    try:
+        ts = pd.to_datetime(val, errors="coerce")
+        if pd.notna(ts):
+            return ts.date()
+    except (ValueError, TypeError):
+        pass
+    return None
+
+
+def _two_digit_year_range():
+    """
+    Years on which strptime's %y pivot agrees with the dateutil window
+    that pd.Timestamp applies to two-digit years (today ± 50 years).
+    """
+    this_year = date.today().year
+    return max(1969, this_year - 50), min(2068, this_year + 49)
+
+
+def _excel_serial_pass(uniques, parsed, pending):
+    """
+    Convert Excel serials with NumPy arithmetic: int/float values and
+    five-digit strings (pd.Timestamp rejects those as out-of-range years).
+    """
+    serial = np.fromiter(
+        (isinstance(v, (int, float)) or (isinstance(v, str) and _SERIAL_STRING_RE.fullmatch(v) is not None)
+         for v in uniques),
+        dtype=bool,
+        count=len(uniques),
+    )
+    idx = np.flatnonzero(serial & pending)
+    if not len(idx):
+        return
+    days = np.round(uniques[idx].astype(float))
+    ok = (days > 0) & (days <= _EXCEL_SERIAL_VECTOR_MAX)
+    idx, days = idx[ok], days[ok]
+    parsed[idx] = (_EXCEL_EPOCH + days.astype("timedelta64[D]")).astype(object)
+    pending[idx] = False
+
+
+def _string_format_passes(uniques, parsed, pending):
+    """Run one vectorized to_datetime pass per candidate format over string uniques."""
+    is_str = np.fromiter((isinstance(v, str) for v in uniques), dtype=bool, count=len(uniques))
+    idx = np.flatnonzero(is_str & pending)
+    if not len(idx):
+        return
+    strings = pd.Series(uniques[idx], dtype=object).str.strip(" ")
+    lo, hi = _VECTOR_YEAR_RANGE
+    for pattern, formats in _VECTOR_DATE_PASSES:
+        matched = strings.str.fullmatch(pattern).to_numpy(dtype=bool)
+        for fmt in formats:
+            todo = matched & pending[idx]
+            if not todo.any():
+                break
+            ts = pd.DatetimeIndex(pd.to_datetime(strings[todo], format=fmt, errors="coerce"))
+            years = ts.year.to_numpy(dtype=float, na_value=np.nan)
+            y_lo, y_hi = _two_digit_year_range() if "%y" in fmt else (lo, hi)
+            ok = (years >= max(lo, y_lo)) & (years <= min(hi, y_hi))
+            target = idx[todo][ok]
+            parsed[target] = ts[ok].date
+            pending[target] = False
+
+
+def _parse_unique_dates(uniques):
+    """Parse distinct raw values: vectorized passes first, _parse_date for the residue."""
+    parsed = np.full(len(uniques), None, dtype=object)
+    pending = np.ones(len(uniques), dtype=bool)
+    _excel_serial_pass(uniques, parsed, pending)
+    _string_format_passes(uniques, parsed, pending)
+    for i in np.flatnonzero(pending):
+        parsed[i] = _parse_date(uniques[i])
+    return parsed
+
+
+def _apply_format(values, date_format):
+    """Parse values with a single format (or Excel-serial mode); None where it does not apply."""
+    parsed = np.full(len(values), None, dtype=object)
+    if date_format == EXCEL_SERIAL_FORMAT:
+        _excel_serial_pass(values, parsed, np.ones(len(values), dtype=bool))
+        return parsed
+    idx = np.flatnonzero(np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values)))
+    if len(idx):
+        strings = pd.Series(values[idx], dtype=object).str.strip()
+        ts = pd.DatetimeIndex(pd.to_datetime(strings, format=date_format, errors="coerce"))
+        ok = ~ts.isna()
+        parsed[idx[ok]] = ts[ok].date
+    return parsed
+
+
+def detect_date_format(values, sample_size=DETECTION_SAMPLE_SIZE):
+    """
+    Pick the format that parses the largest share of an evenly spaced sample
+    of the column. Ties go to the earlier candidate (Excel serial, then
+    DATE_FORMATS order). Returns None if no format covers DETECTION_MIN_SHARE.
+    """
+    values = np.asarray(values)
+    values = values[~pd.isna(values)]
+    if not len(values):
+        return None
+    sample = values[:: max(1, len(values) // sample_size)][:sample_size]
+    best, best_hits = None, 0
+    for date_format in (EXCEL_SERIAL_FORMAT, *DATE_FORMATS):
+        hits = int(pd.notna(_apply_format(sample, date_format)).sum())
+        if hits > best_hits:
+            best, best_hits = date_format, hits
+    return best if best_hits >= DETECTION_MIN_SHARE * len(sample) else None
+
+
+def parse_date_column(values, date_format=None):
+    """
+    Parse a whole Start/End column at once; returns an object array of date/None.
+    Without date_format the result is identical to calling _parse_date per value.
+    With a detected date_format the column is parsed with it and only values
+    it rejects go through the full _parse_date cascade.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques)
+    if date_format:
+        parsed = _apply_format(uniques, date_format)
+        failed = np.flatnonzero(pd.isna(parsed))
+        parsed[failed] = _parse_unique_dates(uniques[failed])
+    else:
+        parsed = _parse_unique_dates(uniques)
+    return np.append(parsed, None)[codes]
+
+
+def has_blank_values(values):
+    """True if the column holds NaN/None or whitespace-only values."""
+    if pd.isna(values).any():
+        return True
+    return any(str(v).strip() == "" for v in pd.unique(values))
@@ -0,0 +1,65 @@
+"""
+Дедуплікація завантажень за хешем вмісту (SHA-256, рахується потоково по
+частинах файлу) у межах користувача. Повторне завантаження файлу, який
+цей користувач уже успішно обробив, пропускається без розбору й вставки
+(копія, що ще в обробці, не блокує: її обробка може завершитись
+помилкою); з опцією replace файл обробляється заново, а попередні
+завантаження користувача, які він заміняє, видаляються в тій самій
+транзакції, що й вставка нових записів.
+"""
+import hashlib
+
+from django.db.models import Q
+
+from .deletion import delete_data_file
+
+
+def compute_content_hash(uploaded_file):
+    """Hex SHA-256 of an uploaded file, read chunk by chunk; the file is rewound afterwards."""
+    digest = hashlib.sha256()
+    uploaded_file.seek(0)
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def find_duplicate(user, content_hash):
+    """The user's earliest successfully processed DataFile with this content, or None."""
+    from ..models import DataFile
+
+    if not content_hash:
+        return None
+    return (
+        DataFile.objects.filter(user=user, content_hash=content_hash, status="success")
+        .order_by("uploaded_at", "id")
+        .first()
+    )
+
+
+def duplicate_message(duplicate):
+    return (
+        f"Файл з таким самим вмістом вже завантажено ({duplicate.filename}, "
+        f"{duplicate.uploaded_at:%d.%m.%Y %H:%M}). Повторне завантаження пропущено."
+    )
+
+
+def superseded_files(data_file):
+    """
+    Earlier successful uploads of the same user replaced by data_file:
+    files with the same content or with the same name.
+    """
+    from ..models import DataFile
+
+    same = Q(filename=data_file.filename)
+    if data_file.content_hash:
+        same |= Q(content_hash=data_file.content_hash)
+    return DataFile.objects.filter(same, user_id=data_file.user_id, status="success").exclude(pk=data_file.pk)
+
+
+def delete_superseded_files(data_file):
+    """Delete the uploads data_file replaces (with their records). Call inside the ingest transaction."""
+    replaced = list(superseded_files(data_file))
+    for old in replaced:
+        delete_data_file(old)
+    return [old.filename for old in replaced]
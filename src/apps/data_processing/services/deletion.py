@@ -0,0 +1,91 @@
+"""
+Швидке видалення завантажених файлів. Записи файлу видаляються сирими
+DELETE за file_id порціями, без завантаження їх первинних ключів у
+пам'ять; підсумки по роках, куб і розподіл по днях коригуються
+агрегатними запитами до видалення записів. Усе — в одній транзакції;
+збережена копія завантаження видаляється зі сховища після коміту.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .cube import remove_file_cells
+from .proration import remove_file_days
+from .rollup import remove_file_totals
+
+
+def delete_file_records(data_file, chunk_size=None):
+    """Delete the file's records in raw chunks of chunk_size rows. Returns the number deleted."""
+    from ..models import DataRecord
+
+    chunk_size = chunk_size or settings.DATA_PROCESSING_DELETE_CHUNK_SIZE
+    db = connections[DEFAULT_DB_ALIAS]
+    meta = DataRecord._meta
+    quote = db.ops.quote_name
+    table, pk, file_column = quote(meta.db_table), quote(meta.pk.column), quote(meta.get_field("file").column)
+    sql = f"DELETE FROM {table} WHERE {pk} IN (SELECT {pk} FROM {table} WHERE {file_column} = %s LIMIT %s)"
+    deleted = 0
+    with transaction.atomic(), db.cursor() as cursor:
+        while True:
+            cursor.execute(sql, [data_file.pk, chunk_size])
+            deleted += cursor.rowcount
+            if cursor.rowcount < chunk_size:
+                return deleted
+
+
+def remove_stored_file(data_file):
+    """
+    Delete the uploaded copy of data_file from storage once the current
+    transaction commits and clear the field (the caller saves or deletes data_file).
+    """
+    stored_file = data_file.stored_file
+    if not stored_file:
+        return
+    storage, name = stored_file.storage, stored_file.name
+    data_file.stored_file = None
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+def delete_data_file(data_file, chunk_size=None):
+    """
+    Delete data_file with its records, subtracting it from the rollups first;
+    its stored upload is removed after commit. Returns the number of deleted records.
+    """
+    with transaction.atomic():
+        remove_file_totals(data_file)
+        remove_file_cells(data_file)
+        remove_file_days(data_file)
+        deleted = delete_file_records(data_file, chunk_size)
+        remove_stored_file(data_file)
+        # Nothing is left to cascade to but the job; the pre_delete signal finds no records to subtract.
+        data_file.delete()
+    return deleted
+
+
+def delete_data_files(data_files, chunk_size=None):
+    """Delete several files with delete_data_file in one transaction. Returns the number of deleted records."""
+    with transaction.atomic():
+        return sum(delete_data_file(data_file, chunk_size) for data_file in data_files)
+
+
+def deletion_summary(data_files):
+    """
+    (file, records count) pairs for a deletion confirmation, counted with one
+    grouped query instead of collecting every related record.
+    """
+    from django.db.models import Count
+
+    from ..models import DataRecord
+
+    data_files = list(data_files)
+    counts = dict(
+        DataRecord.objects.filter(file__in=data_files).order_by()
+        .values_list("file_id").annotate(count=Count("id"))
+    )
+    return [(data_file, counts.get(data_file.pk, 0)) for data_file in data_files]
+
+
+def running_jobs(data_files):
+    """Ingest jobs of data_files that a worker is processing right now; such files must not be deleted."""
+    from ..models import IngestJob
+
+    return list(IngestJob.objects.filter(data_file__in=list(data_files), status="running").select_related("data_file"))
@@ -0,0 +1,179 @@
+"""
+Дельта-обробка нової версії файлу (той самий користувач і назва). Рядки
+нової версії порівнюються з записами попередньої за row_key: нові
+рядки вставляються, рядки зі зміненими показами оновлюються, відсутні —
+видаляються, усе пакетами. Незмінені записи переходять до нового
+DataFile одним UPDATE, а підсумки по роках, куб і розподіл по днях
+коригуються на різницю, без перерахунку.
+"""
+import logging
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .cube import CubeTotals, apply_cells_delta
+from .deletion import remove_stored_file
+from .dimensions import decode_dimensions
+from .loader import KEY_FIELDS, RecordLoader, RowKeys
+from .proration import DayTotals, apply_spans_delta, record_spans, same_cents
+from .rollup import YearTotals, apply_file_delta
+
+logger = logging.getLogger(__name__)
+
+_ROW_FIELDS = ("year", *KEY_FIELDS, "impressions")
+
+
+def find_delta_base(data_file):
+    """The previous successful version of data_file (same user and name), or None."""
+    from ..models import DataFile
+
+    return (
+        DataFile.objects.filter(user_id=data_file.user_id, filename=data_file.filename, status="success")
+        .exclude(pk=data_file.pk)
+        .order_by("-uploaded_at", "-id")
+        .first()
+    )
+
+
+class DeltaLoader:
+    """
+    Applies a new version of base_file as a delta, with the interface of
+    RecordLoader: load() takes parsed rows chunk by chunk (inserting new and
+    updating changed records right away), apply() deletes the rows missing
+    from the new version, moves the records to data_file, adjusts the rollups
+    and deletes base_file. Meant to run inside the ingest transaction.
+    """
+
+    def __init__(self, data_file, base_file, batch_size=None, strategy=None):
+        self.data_file = data_file
+        self.base_file = base_file
+        self.inserter = RecordLoader(data_file, batch_size, strategy)
+        self.batch_size = self.inserter.batch_size
+        self.strategy = self.inserter.strategy
+        self.row_keys = RowKeys()
+        self.rows_loaded = 0
+        self.inserted = self.updated = self.unchanged = self.deleted = 0
+        self.seconds = 0.0
+        self._stored = None
+        self._old_spans = {}
+        self._added = (YearTotals(), CubeTotals(self.inserter.dimensions))
+        self._removed = (YearTotals(), CubeTotals(self.inserter.dimensions))
+        self._new_spans = DayTotals()
+
+    @property
+    def rows_per_second(self):
+        return self.rows_loaded / self.seconds if self.seconds else 0.0
+
+    def _load_stored(self):
+        """
+        row_key -> (id, impressions) of the base file's records. The previous
+        version's impressions per (Start, End) span are summed in the database.
+        """
+        from ..models import DataRecord
+
+        records = DataRecord.objects.filter(file=self.base_file).order_by("id")
+        self._old_spans = record_spans(records)
+        if records.filter(row_key="").exists():
+            # Stored before row keys existed: key them in insertion order, as ingest would have.
+            legacy_keys = RowKeys()
+            rows = decode_dimensions(list(records.values("id", "impressions", *KEY_FIELDS)))
+            return {
+                legacy_keys.key([r[name] for name in KEY_FIELDS]): (r["id"], r["impressions"]) for r in rows
+            }
+        return {
+            row_key: (record_id, impressions)
+            for row_key, record_id, impressions in records.values_list("row_key", "id", "impressions")
+        }
+
+    def load(self, rows):
+        """Diff rows against the previous version; insert new and update changed ones. Returns len(rows)."""
+        started = time.perf_counter()
+        try:
+            if self._stored is None:
+                self._stored = self._load_stored()
+            self.row_keys.assign(rows)
+            self._new_spans.add(rows)
+            stored = self._stored
+            inserts, updates, update_ids, replaced = [], [], [], []
+            for r in rows:
+                old = stored.pop(r["row_key"], None)
+                if old is None:
+                    inserts.append(r)
+                elif same_cents(old[1], r["impressions"]):
+                    self.unchanged += 1
+                else:
+                    updates.append(r)
+                    update_ids.append(old[0])
+                    replaced.append({**r, "impressions": old[1]})
+            if inserts:
+                self.inserter.load(inserts)
+            if updates:
+                self._update(updates, update_ids)
+            for added, removed in zip(self._added, self._removed):
+                added.add(inserts)
+                added.add(updates)
+                removed.add(replaced)
+            self.inserted += len(inserts)
+            self.updated += len(updates)
+            self.rows_loaded += len(rows)
+        finally:
+            self.seconds += time.perf_counter() - started
+        return len(rows)
+
+    def _update(self, rows, ids):
+        from ..models import DataRecord
+
+        db = connections[DEFAULT_DB_ALIAS]
+        meta = DataRecord._meta
+        quote = db.ops.quote_name
+        sql = "UPDATE {} SET {} = %s WHERE {} = %s".format(
+            quote(meta.db_table), quote(meta.get_field("impressions").column), quote(meta.pk.column)
+        )
+        prep = meta.get_field("impressions").get_db_prep_save
+        params = [(prep(r["impressions"], db), record_id) for r, record_id in zip(rows, ids)]
+        with db.cursor() as cursor:
+            for offset in range(0, len(params), self.batch_size):
+                cursor.executemany(sql, params[offset:offset + self.batch_size])
+
+    def _old_rows(self, ids):
+        """Rows (as parsed-row dicts) of stored records by id, for subtracting from the rollups."""
+        from ..models import DataRecord
+
+        rows = []
+        for offset in range(0, len(ids), self.batch_size):
+            rows += DataRecord.objects.filter(id__in=ids[offset:offset + self.batch_size]).values(*_ROW_FIELDS)
+        return decode_dimensions(rows)
+
+    def apply(self):
+        """Finish the delta; returns a summary for the upload message."""
+        from ..models import DataRecord, FileYearTotal
+
+        started = time.perf_counter()
+        if self._stored is None:
+            self._stored = self._load_stored()
+        deleted_ids = [record_id for record_id, _ in self._stored.values()]
+        for totals in self._removed:
+            totals.add(self._old_rows(deleted_ids))
+        for offset in range(0, len(deleted_ids), self.batch_size):
+            DataRecord.objects.filter(id__in=deleted_ids[offset:offset + self.batch_size]).delete()
+        self.deleted = len(deleted_ids)
+
+        DataRecord.objects.filter(file=self.base_file).update(file=self.data_file)
+        FileYearTotal.objects.filter(file=self.base_file).update(file=self.data_file)
+        apply_file_delta(self.data_file, self._added[0], self._removed[0])
+        apply_cells_delta(self._added[1], self._removed[1])
+        apply_spans_delta(self._old_spans, self._new_spans.spans)
+        remove_stored_file(self.base_file)
+        self.base_file.delete()  # its records and totals now belong to data_file
+        self.seconds += time.perf_counter() - started
+        return (
+            f"Порівняно з попередньою версією: додано {self.inserted}, змінено {self.updated}, "
+            f"видалено {self.deleted}, без змін {self.unchanged}."
+        )
+
+    def log_stats(self):
+        logger.info(
+            "Delta of file %s against %s: %s inserted, %s updated, %s deleted, %s unchanged in %.2fs",
+            self.data_file.pk, self.base_file.pk, self.inserted, self.updated, self.deleted, self.unchanged,
+            self.seconds,
+        )
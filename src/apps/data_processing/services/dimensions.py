@@ -0,0 +1,120 @@
+"""
+Словникове кодування вимірів запису (рекламодавець, бренд, формат,
+платформа): кожне значення зберігається один раз у своїй таблиці, а
+DataRecord посилається на нього цілим ключем, тож таблиця записів та її
+індекси містять лише числа. Відповідність значення→id кешується в пам'яті
+процесу; до кешу потрапляють лише значення з закомічених транзакцій, щоб
+відкочена обробка файлу не залишила id рядків, яких немає.
+"""
+from django.db import transaction
+
+DIMENSION_FIELDS = ("advertiser", "brand", "format_type", "platform")
+
+_LOOKUP_CHUNK = 500
+
+
+def dimension_model(field):
+    from ..models import DataRecord
+
+    return DataRecord._meta.get_field(field).related_model
+
+
+class DimensionCache:
+    """value -> id and id -> value of every dimension field, for the whole process."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.ids = {field: {} for field in DIMENSION_FIELDS}
+        self.names = {field: {} for field in DIMENSION_FIELDS}
+
+    def remember(self, field, ids):
+        """Cache {value: id} once the current transaction commits (right away outside one)."""
+        if ids:
+            transaction.on_commit(lambda: self._store(field, ids))
+
+    def _store(self, field, ids):
+        self.ids[field].update(ids)
+        self.names[field].update((pk, name) for name, pk in ids.items())
+
+
+cache = DimensionCache()
+
+
+def _select_ids(field, values):
+    model = dimension_model(field)
+    values = list(values)
+    found = {}
+    for offset in range(0, len(values), _LOOKUP_CHUNK):
+        found.update(model.objects.filter(name__in=values[offset:offset + _LOOKUP_CHUNK]).values_list("name", "id"))
+    return found
+
+
+def dimension_ids(field, values, create=True):
+    """
+    {value: id} for values of a dimension field; missing values are created
+    unless create is False (then they are left out). Empty values have no id.
+    """
+    values = {value for value in values if value}
+    cached = cache.ids[field]
+    ids = {value: cached[value] for value in values if value in cached}
+    missing = values - ids.keys()
+    if missing:
+        found = _select_ids(field, missing)
+        if create and len(found) < len(missing):
+            model = dimension_model(field)
+            model.objects.bulk_create(
+                [model(name=value) for value in missing - found.keys()], ignore_conflicts=True,
+            )
+            found = _select_ids(field, missing)
+        cache.remember(field, found)
+        ids.update(found)
+    return ids
+
+
+def dimension_names(field, ids):
+    """{id: value} for ids of a dimension field."""
+    ids = {pk for pk in ids if pk is not None}
+    cached = cache.names[field]
+    names = {pk: cached[pk] for pk in ids if pk in cached}
+    missing = list(ids - names.keys())
+    if missing:
+        model = dimension_model(field)
+        found = {}
+        for offset in range(0, len(missing), _LOOKUP_CHUNK):
+            found.update(model.objects.filter(pk__in=missing[offset:offset + _LOOKUP_CHUNK]).values_list("name", "id"))
+        cache.remember(field, found)
+        names.update((pk, name) for name, pk in found.items())
+    return names
+
+
+def decode_dimensions(rows, fields=DIMENSION_FIELDS):
+    """
+    Replace dimension ids with their values in dicts from `.values()`, in
+    place ('' where a record has none). Returns rows.
+    """
+    for field in fields:
+        names = dimension_names(field, {r[field] for r in rows})
+        for r in rows:
+            r[field] = names.get(r[field], "")
+    return rows
+
+
+class DimensionEncoder:
+    """
+    Ids of the dimension values of one ingest. Each value is looked up (or
+    created) once per encoder; known values come from the process cache.
+    """
+
+    def __init__(self):
+        self.ids = {field: {} for field in DIMENSION_FIELDS}
+
+    def encode(self, rows):
+        """Make sure every dimension value in rows has an id; returns {field: {value: id}}."""
+        for field in DIMENSION_FIELDS:
+            known = self.ids[field]
+            missing = {r[field] for r in rows if r[field] and r[field] not in known}
+            if missing:
+                known.update(dimension_ids(field, missing))
+        return self.ids
@@ -0,0 +1,187 @@
+"""
+Фонова обробка завантажень: черга IngestJob у БД, яку розбирає
+`manage.py process_ingest_jobs` (без зовнішнього брокера, працює з SQLite).
+"""
+import logging
+import traceback
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_stats_on_commit
+from .cube import remove_file_cells
+from .dedup import compute_content_hash, duplicate_message, find_duplicate
+from .deletion import delete_file_records, remove_stored_file
+from .progress import mark_queued
+from .proration import remove_file_days
+from .rollup import remove_file_totals
+from .skipped import remove_skipped_rows
+from .upload import ingest_data_file
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_file_upload(user, uploaded_file, replace=False, delta=False):
+    """
+    Store the raw file, create DataFile (status 'processing') and a queued IngestJob.
+    A file whose content the user already uploaded is neither stored nor queued unless replace is set.
+    If the database stays locked (OperationalError) the upload is refused with a message to retry.
+    Returns: (success: bool, message: str, is_error: bool), like process_file_upload.
+    """
+    from ..models import DataFile, IngestJob
+
+    content_hash = compute_content_hash(uploaded_file)
+    if not replace:
+        duplicate = find_duplicate(user, content_hash)
+        if duplicate is not None:
+            return True, duplicate_message(duplicate), False
+
+    data_file = DataFile(
+        user=user,
+        filename=uploaded_file.name,
+        status="processing",
+        file_size=uploaded_file.size,
+        stored_file=uploaded_file,
+        content_hash=content_hash,
+    )
+    try:
+        with transaction.atomic():
+            data_file.save()
+            IngestJob.objects.create(
+                data_file=data_file,
+                max_attempts=settings.DATA_PROCESSING_JOB_MAX_ATTEMPTS,
+                replace=replace,
+                delta=delta,
+            )
+    except OperationalError:
+        # SQLite stayed locked by an ingest longer than the connection timeout
+        logger.warning("Could not queue %s: database is locked", uploaded_file.name, exc_info=True)
+        if data_file.stored_file._committed:
+            data_file.stored_file.delete(save=False)
+        return False, "Сервер зараз зайнятий обробкою інших файлів, спробуйте завантажити файл ще раз.", True
+    mark_queued(data_file)
+    return True, f"Файл {data_file.filename} прийнято в обробку.", False
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically move the oldest available queued job to 'running' and return it (None if the queue is empty).
+    The claim is a conditional UPDATE, so concurrent dispatchers never get the same job.
+    """
+    from ..models import IngestJob
+
+    now = timezone.now()
+    candidates = (
+        IngestJob.objects.filter(status="queued", available_at__lte=now)
+        .order_by("available_at", "id")
+        .values_list("id", flat=True)[:10]
+    )
+    for job_id in candidates:
+        claimed = IngestJob.objects.filter(id=job_id, status="queued").update(
+            status="running",
+            locked_at=now,
+            locked_by=worker_id,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return IngestJob.objects.select_related("data_file").get(id=job_id)
+    return None
+
+
+def _retry_or_fail(job, error):
+    """
+    Requeue job with exponential backoff, or give up after max_attempts, mark
+    the file as failed and remove its stored upload.
+    """
+    job.last_error = error
+    job.locked_at = None
+    if job.attempts < job.max_attempts:
+        delay = settings.DATA_PROCESSING_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        job.status = "queued"
+        job.available_at = timezone.now() + timedelta(seconds=delay)
+        job.save(update_fields=["status", "available_at", "locked_at", "last_error"])
+        mark_queued(job.data_file)
+        return
+    job.status = "failed"
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at", "locked_at", "last_error"])
+    data_file = job.data_file
+    data_file.status = "error"
+    data_file.error_type = "other"
+    data_file.error_message = error.strip().splitlines()[-1] if error.strip() else "Помилка обробки файлу."
+    remove_stored_file(data_file)
+    data_file.save(update_fields=["status", "error_type", "error_message", "stored_file"])
+    invalidate_stats_on_commit()
+
+
+def run_job(job_id):
+    """
+    Process one claimed job: parse the stored file into the DataFile.
+    Validation errors finish the job (the DataFile gets status 'error');
+    unexpected exceptions are retried. Records and skipped rows of a previous failed attempt are removed first.
+    The stored upload is kept for retries and removed once the job is done or failed.
+    """
+    from ..models import IngestJob
+
+    job = IngestJob.objects.select_related("data_file").get(id=job_id)
+    data_file = job.data_file
+    try:
+        if job.attempts > 1:
+            with transaction.atomic():
+                remove_file_totals(data_file)
+                remove_file_cells(data_file)
+                remove_file_days(data_file)
+                delete_file_records(data_file)
+                remove_skipped_rows(data_file)
+        with data_file.stored_file.open("rb") as fileobj:
+            success = ingest_data_file(data_file, fileobj, replace=job.replace, delta=job.delta)[0]
+    except Exception:
+        logger.exception("Ingest job %s failed (attempt %s/%s)", job.id, job.attempts, job.max_attempts)
+        _retry_or_fail(job, traceback.format_exc())
+        return False
+    job.status = "done"
+    job.finished_at = timezone.now()
+    job.locked_at = None
+    job.save(update_fields=["status", "finished_at", "locked_at"])
+    remove_stored_file(data_file)
+    data_file.save(update_fields=["stored_file"])
+    return success
+
+
+def fail_job(job_id, error):
+    """Retry or fail a job whose worker process died before it could report back."""
+    from ..models import IngestJob
+
+    job = IngestJob.objects.select_related("data_file").get(id=job_id)
+    if job.status == "running":
+        _retry_or_fail(job, error)
+
+
+def heartbeat(job_ids):
+    """Refresh locked_at of jobs still being processed so they are not recovered as stale."""
+    from ..models import IngestJob
+
+    if job_ids:
+        IngestJob.objects.filter(id__in=job_ids, status="running").update(locked_at=timezone.now())
+
+
+def recover_stale_jobs(stale_after=None):
+    """
+    Requeue (or fail, if out of attempts) jobs stuck in 'running' longer than
+    `stale_after` seconds, e.g. after a worker crash. Returns the number of recovered jobs.
+    """
+    from ..models import IngestJob
+
+    stale_after = settings.DATA_PROCESSING_JOB_STALE_AFTER if stale_after is None else stale_after
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = IngestJob.objects.select_related("data_file").filter(status="running", locked_at__lt=cutoff)
+    count = 0
+    for job in stale:
+        logger.warning("Recovering stale ingest job %s locked by %s", job.id, job.locked_by)
+        _retry_or_fail(job, f"Worker {job.locked_by} did not finish the job in {stale_after}s.")
+        count += 1
+    return count
@@ -0,0 +1,194 @@
+"""
+Пакетне збереження розпарсених рядків у DataRecord. Рядки вставляються
+пакетами по batch_size, кожен пакет — у власній точці збереження
+всередині транзакції обробки файлу. Стратегія "executemany" пише сирим
+INSERT без створення екземплярів моделі, "orm" — через bulk_create.
+Швидкість (рядків/с) рахується, щоб порівнювати стратегії. Виміри
+(рекламодавець, бренд, формат, платформа) пишуться id зі словників
+(services/dimensions.py). Кожен рядок
+отримує стабільний ключ row_key (хеш вимірів і номера повтору), за яким
+нова версія файлу порівнюється з попередньою (services/delta.py).
+"""
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+
+from .cube import CubeTotals
+from .dimensions import DIMENSION_FIELDS, DimensionEncoder
+from .proration import DayTotals
+from .rollup import YearTotals
+from .search import index_inserted_records
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_AUTO = "auto"
+STRATEGY_ORM = "orm"
+STRATEGY_EXECUTEMANY = "executemany"
+STRATEGIES = (STRATEGY_AUTO, STRATEGY_ORM, STRATEGY_EXECUTEMANY)
+
+# Backends whose DB-API executemany is a fast path (SQLite runs it as one prepared statement).
+EXECUTEMANY_VENDORS = ("sqlite",)
+
+# Keys of parsed rows, in the order of RECORD_FIELDS
+RECORD_FIELDS = (
+    "year", "advertiser", "brand", "start_date", "end_date", "format_type", "platform", "impressions", "row_key",
+)
+
+# Columns identifying a row of a file across its versions (impressions may change)
+KEY_FIELDS = ("advertiser", "brand", "start_date", "end_date", "format_type", "platform")
+
+
+class RowKeys:
+    """
+    Assigns row_key to rows of one file: a hash of KEY_FIELDS, and for the
+    n-th repeat of the same values a hash of that hash and n, so identical
+    rows keep distinct keys as long as their order is kept.
+    """
+
+    def __init__(self):
+        self.seen = {}
+
+    def key(self, values):
+        base = hashlib.blake2b(
+            "\x1f".join("" if v is None else str(v) for v in values).encode(), digest_size=16
+        ).hexdigest()
+        repeat = self.seen.get(base, 0)
+        self.seen[base] = repeat + 1
+        if not repeat:
+            return base
+        return hashlib.blake2b(f"{base}:{repeat}".encode(), digest_size=16).hexdigest()
+
+    def assign(self, rows):
+        """Set row_key of rows that have none yet."""
+        for r in rows:
+            if "row_key" not in r:
+                r["row_key"] = self.key([r[name] for name in KEY_FIELDS])
+
+
+def resolve_strategy(strategy=None):
+    """Strategy to use: an explicit orm/executemany, or 'auto' picked by the database vendor."""
+    strategy = strategy or settings.DATA_PROCESSING_BULK_LOAD_STRATEGY
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown bulk load strategy: {strategy!r}")
+    if strategy == STRATEGY_AUTO:
+        return STRATEGY_EXECUTEMANY if connection.vendor in EXECUTEMANY_VENDORS else STRATEGY_ORM
+    return strategy
+
+
+class RecordLoader:
+    """
+    Inserts parsed rows as DataRecord of one DataFile. Meant to be used inside
+    transaction.atomic(): a failed batch is rolled back to its savepoint and
+    the error propagates, so the caller's transaction decides what to keep.
+    Per-year totals, cube cells and prorated day spans of the inserted rows
+    are collected in year_totals / cube_totals / day_totals.
+    """
+
+    def __init__(self, data_file, batch_size=None, strategy=None):
+        self.data_file = data_file
+        self.batch_size = batch_size or settings.DATA_PROCESSING_BULK_BATCH_SIZE
+        self.strategy = resolve_strategy(strategy)
+        self.rows_loaded = 0
+        self.dimensions = DimensionEncoder()
+        self.year_totals = YearTotals()
+        self.cube_totals = CubeTotals(self.dimensions)
+        self.day_totals = DayTotals()
+        self.row_keys = RowKeys()
+        self.seconds = 0.0
+        self._created_at = timezone.now()
+        self._insert_sql = None
+        self._preps = None
+        self._created_at_db = None
+        self._db = None
+
+    @property
+    def rows_per_second(self):
+        return self.rows_loaded / self.seconds if self.seconds else 0.0
+
+    def load(self, rows):
+        """Insert rows batch by batch; returns the number of inserted rows."""
+        started = time.perf_counter()
+        try:
+            self.row_keys.assign(rows)
+            # Outside the batch savepoints: a rolled back batch must not take new dimension values with it
+            self.dimensions.encode(rows)
+            for offset in range(0, len(rows), self.batch_size):
+                batch = rows[offset:offset + self.batch_size]
+                with transaction.atomic():
+                    if self.strategy == STRATEGY_EXECUTEMANY:
+                        self._executemany(batch)
+                    else:
+                        self._bulk_create(batch)
+                    index_inserted_records(len(batch))
+                self.rows_loaded += len(batch)
+                self.year_totals.add(batch)
+                self.cube_totals.add(batch)
+                self.day_totals.add(batch)
+        finally:
+            self.seconds += time.perf_counter() - started
+        return len(rows)
+
+    def log_stats(self):
+        logger.info(
+            "Loaded %s rows of file %s in %.2fs (%.0f rows/s, strategy %s, batch %s)",
+            self.rows_loaded, self.data_file.pk, self.seconds, self.rows_per_second, self.strategy, self.batch_size,
+        )
+
+    def _bulk_create(self, batch):
+        from ..models import DataRecord
+
+        ids = self.dimensions.ids
+        DataRecord.objects.bulk_create(
+            [
+                DataRecord(
+                    file=self.data_file,
+                    created_at=self._created_at,
+                    **{
+                        f"{key}_id" if key in ids else key: ids[key].get(r[key]) if key in ids else r[key]
+                        for key in RECORD_FIELDS
+                    },
+                )
+                for r in batch
+            ],
+            batch_size=self.batch_size,
+        )
+
+    def _prepare_insert(self):
+        """INSERT statement and per-column value converters, built once per loader."""
+        from ..models import DataRecord
+
+        # The wrapper itself, not the thread-local `connection` proxy: it is hit for every value.
+        db = connections[DEFAULT_DB_ALIAS]
+        meta = DataRecord._meta
+        fields = [meta.get_field(name) for name in RECORD_FIELDS]
+        columns = [meta.get_field("file").column, meta.get_field("created_at").column]
+        columns += [field.column for field in fields]
+        quote = db.ops.quote_name
+        self._insert_sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            quote(meta.db_table), ", ".join(quote(c) for c in columns), ", ".join(["%s"] * len(columns)),
+        )
+        self._preps = [
+            (name, name in DIMENSION_FIELDS, field.get_db_prep_save) for name, field in zip(RECORD_FIELDS, fields)
+        ]
+        created_at = meta.get_field("created_at").get_db_prep_save(self._created_at, db)
+        self._created_at_db = created_at
+        self._db = db
+
+    def _executemany(self, batch):
+        if self._insert_sql is None:
+            self._prepare_insert()
+        db = self._db
+        # Values are converted column by column, the way bulk_create would, then zipped into rows.
+        columns = [[self.data_file.pk] * len(batch), [self._created_at_db] * len(batch)]
+        for name, is_dimension, prep in self._preps:
+            if is_dimension:
+                ids = self.dimensions.ids[name]
+                columns.append([ids.get(r[name]) for r in batch])
+            else:
+                columns.append([None if r[name] is None else prep(r[name], db) for r in batch])
+        with db.cursor() as cursor:
+            cursor.executemany(self._insert_sql, list(zip(*columns)))
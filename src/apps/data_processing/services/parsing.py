@@ -1,12 +1,13 @@
-import logging
-
-from datetime import datetime, date
+from contextlib import closing, nullcontext
 from decimal import Decimal, InvalidOperation
 from io import BytesIO
 
+import numpy as np
 import pandas as pd
 
-logger = logging.getLogger(__name__)
+from .dates import detect_date_format, has_blank_values, parse_date_column
+from .readers import iter_xlsx_frames, resolve_csv_engine, sniff_csv_fileobj
+from .skipped import SkipLogger
 
 COLUMN_ALIASES = {
     "advertis": "advertiser",
@@ -20,25 +21,6 @@ COLUMN_ALIASES = {
 }
 REQUIRED_COLUMNS = {"start", "end"}
 
-DATE_FORMATS = [
-    "%d.%m.%y",
-    "%d.%m.%Y",
-    "%Y-%m-%d",
-    "%d/%m/%y",
-    "%d/%m/%Y",
-    "%d-%m-%y",
-    "%d-%m-%Y",
-    "%Y.%m.%d",
-    "%d %b %Y",
-    "%d %B %Y",
-    "%b %d, %Y",
-    "%B %d, %Y",
-    "%Y/%m/%d",
-    "%m/%d/%Y",
-    "%m.%d.%Y",
-    "%m-%d-%Y",
-]
-
 
 def _normalize_columns(df):
     """Map dataframe columns to standard names."""
@@ -50,173 +32,226 @@ def _normalize_columns(df):
     return df.rename(columns=mapping)
 
 
-def _excel_serial_to_date(n):
-    """Convert Excel serial number to date."""
+def _parse_number(val):
+    """Parse number with space/comma."""
+    if pd.isna(val) or val == "":
+        return None
+    s = str(val).strip().replace(" ", "").replace(",", ".")
     try:
-        days = int(round(float(n)))
-        if 0 < days <= 500000:
-            ts = pd.Timestamp("1899-12-30") + pd.Timedelta(days=days)
-            return ts.date()
-    except (ValueError, TypeError):
-        pass
-    return None
+        return Decimal(s)
+    except (InvalidOperation, ValueError):
+        return None
 
 
-_EXCEL_ERROR_STRINGS = frozenset(
-    s.strip().upper()
-    for s in ("#N/A", "#VALUE!", "#REF!", "#DIV/0!", "#NAME?", "#NULL!", "#NUM!", "#GETTING_DATA", "-", "—")
-)
+def _column_values(df, col):
+    """
+    Column values boxed the way df.iterrows() yields them: mixed frames
+    give Python objects, all-numeric frames give the common NumPy dtype.
+    """
+    return df[col].to_numpy(dtype=df.iloc[:0].to_numpy().dtype)
 
 
-def _parse_date(val):  # noqa: C901
-    """Parse date from string, number (Excel serial), or datetime."""
-    if pd.isna(val) or val == "" or (isinstance(val, str) and not val.strip()):
-        return None
-    if isinstance(val, str) and val.strip().upper() in _EXCEL_ERROR_STRINGS:
-        return None
-    if isinstance(val, (datetime, date)):
-        return val.date() if isinstance(val, datetime) else val
-    if isinstance(val, (int, float)):
-        d = _excel_serial_to_date(val)
-        if d is not None:
-            return d
-        try:
-            return pd.Timestamp(val).date()
-        except (ValueError, TypeError, AttributeError):
-            pass
-        return None
+def _text_column(df, col, positions):
+    """Stripped string values of a text column at the given positions ('' for NaN or a missing column)."""
+    if col not in df.columns:
+        return [""] * len(positions)
+    values = _column_values(df, col)[positions]
+    return [str(v).strip() if present else "" for v, present in zip(values, pd.notna(values))]
 
-    try:
-        ts = pd.Timestamp(val)
-        return ts.date()
-    except (ValueError, TypeError, AttributeError):
-        pass
-    s = str(val).strip().strip("\ufeff")
-    if s.upper() in _EXCEL_ERROR_STRINGS:
-        return None
 
-    if s.isdigit() and len(s) >= 4:
-        d = _excel_serial_to_date(s)
-        if d is not None:
-            return d
-    try:
-        n = float(s.replace(",", "."))
-        d = _excel_serial_to_date(n)
-        if d is not None:
-            return d
-    except (ValueError, TypeError):
-        pass
-    if " " in s:
-        s = s.split(" ")[0].strip()
-    for fmt in DATE_FORMATS:
-        try:
-            return datetime.strptime(s, fmt).date()
-        except (ValueError, TypeError):
-            continue
+def _raw_values(df, positions):
+    """Values of the known columns at the given positions as stripped strings, one dict per row."""
+    columns = [col for col in dict.fromkeys(COLUMN_ALIASES.values()) if col in df.columns]
+    values = [_text_column(df, col, positions) for col in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)] if columns else [{} for _ in positions]
 
-    for dayfirst in (True, False):
-        try:
-            ts = pd.to_datetime(s, dayfirst=dayfirst, errors="coerce")
-            if pd.notna(ts):
-                return ts.date()
-        except (ValueError, TypeError):
-            continue
 
-    try:
-        ts = pd.to_datetime(val, errors="coerce")
-        if pd.notna(ts):
-            return ts.date()
-    except (ValueError, TypeError):
-        pass
-    return None
+def _skip_logger(info, filename):
+    """The SkipLogger of the file being parsed, kept in info across chunks."""
+    if "skip_logger" not in info:
+        info["skip_logger"] = SkipLogger(filename)
+    return info["skip_logger"]
 
 
-def _parse_number(val):
-    """Parse number with space/comma."""
-    if pd.isna(val) or val == "":
-        return None
-    s = str(val).strip().replace(" ", "").replace(",", ".")
-    try:
-        return Decimal(s)
-    except (InvalidOperation, ValueError):
-        return None
+def _stage(info, name):
+    """Time a parsing stage with the StageTimer of the ingest, if one was passed in info."""
+    timer = info.get("stage_timer")
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+def _read_frame(fileobj, filename, info, dialect=None, engine="c", chunksize=None):
+    """
+    Read csv/xls(x) into a DataFrame (or a chunk iterator for csv with chunksize).
+    CSV dialect is sniffed from the head of the file unless given; it is stored in info["csv_dialect"].
+    """
+    if not filename.lower().endswith(".csv"):
+        return pd.read_excel(fileobj, engine="openpyxl")
+    if dialect is None:
+        dialect = sniff_csv_fileobj(fileobj)
+    info["csv_dialect"] = dialect
+    engine = resolve_csv_engine(engine, dialect, chunked=chunksize is not None)
+    kwargs = {"chunksize": chunksize} if chunksize is not None else {}
+    return pd.read_csv(fileobj, engine=engine, **dialect.read_csv_kwargs(), **kwargs)
 
 
-def validate_and_parse(file_content, filename):  # noqa: C901
+def validate_and_parse(file_content, filename, info=None, dialect=None, engine="c"):
     """
     Validate file and return (success, data_or_error_message, error_type, skipped_rows).
+    If `info` dict is passed, it is filled with parse details (CSV dialect, detected date formats,
+    the file's SkipLogger); a StageTimer in info["stage_timer"] times the parsing stages.
+    `dialect` (CsvDialect) skips sniffing for files from a known source; `engine` is "c" or "pyarrow".
     """
+    info = {} if info is None else info
     try:
-        if filename.lower().endswith(".csv"):
-            df = pd.read_csv(BytesIO(file_content), sep=None, engine="python", encoding="utf-8")
-        else:
-            df = pd.read_excel(BytesIO(file_content), engine="openpyxl")
+        with _stage(info, "read"):
+            df = _read_frame(BytesIO(file_content), filename, info, dialect=dialect, engine=engine)
     except Exception as e:
         return False, str(e), "format", []
 
     if df.empty or len(df) == 0:
         return False, "Файл не містить даних.", "structure", []
+    result = _parse_frame(df, filename, info)
+    _skip_logger(info, filename).summary()
+    return result
+
+
+def iter_csv_chunks(fileobj, filename, chunk_size, info=None, dialect=None):
+    """
+    Stream a CSV file in chunks of `chunk_size` rows.
+    Yields (success, data_or_error_message, error_type, skipped_rows) per chunk,
+    stopping after the first failed one. The dialect is sniffed once and date
+    formats are detected on the first chunk, both reused for the rest;
+    row numbers continue across chunks.
+    """
+    info = {} if info is None else info
+    try:
+        with _stage(info, "read"):
+            reader = _read_frame(fileobj, filename, info, dialect=dialect, chunksize=chunk_size)
+    except Exception as e:
+        yield False, str(e), "format", []
+        return
+    with reader:
+        yield from _parse_chunks(reader, filename, info)
+
+
+def iter_xlsx_chunks(fileobj, filename, chunk_size, info=None):
+    """
+    Stream the first sheet of an xlsx file in chunks of `chunk_size` rows
+    (openpyxl read-only mode). Yields the same per-chunk tuples as iter_csv_chunks.
+    """
+    info = {} if info is None else info
+    with closing(iter_xlsx_frames(fileobj, chunk_size)) as frames:
+        yield from _parse_chunks(frames, filename, info)
+
+
+def _parse_chunks(frames, filename, info):
+    """Validate and parse frames one by one; read errors become a 'format' failure."""
+    has_rows = False
+    while True:
+        try:
+            with _stage(info, "read"):
+                df = next(frames)
+        except StopIteration:
+            break
+        except Exception as e:
+            yield False, str(e), "format", []
+            return
+        if df.empty:
+            continue
+        has_rows = True
+        result = _parse_frame(df, filename, info)
+        yield result
+        if not result[0]:
+            return
+    if not has_rows:
+        yield False, "Файл не містить даних.", "structure", []
+        return
+    _skip_logger(info, filename).summary()
 
-    df = _normalize_columns(df)
+
+def _parse_frame(df, filename, info):  # noqa: C901
+    """Validate a non-empty frame (whole file or chunk) and parse its rows."""
+    with _stage(info, "normalize"):
+        df = _normalize_columns(df)
     missing = REQUIRED_COLUMNS - set(df.columns)
     if missing:
         return False, f"Відсутні обов'язкові колонки: {', '.join(missing)}.", "required_columns", []
 
-    start_col = "start"
-    end_col = "end"
-    for idx, row in df.iterrows():
-        if pd.isna(row.get(start_col)) or str(row.get(start_col, "")).strip() == "":
-            return False, "Колонки Start та End не можуть бути порожніми. Таблиця невалідна.", "empty_dates", []
-        if pd.isna(row.get(end_col)) or str(row.get(end_col, "")).strip() == "":
+    with _stage(info, "dates"):
+        start_values = _column_values(df, "start")
+        end_values = _column_values(df, "end")
+        if has_blank_values(start_values) or has_blank_values(end_values):
             return False, "Колонки Start та End не можуть бути порожніми. Таблиця невалідна.", "empty_dates", []
 
-    rows = []
-    skipped_rows = []
-    for idx, row in df.iterrows():
-        raw_start = row.get(start_col)
-        raw_end = row.get(end_col)
-        start_date = _parse_date(raw_start)
-        end_date = _parse_date(raw_end)
-        row_num = int(idx) + 2
-
-        if start_date is None:
-            skipped_rows.append({
-                "row_num": row_num,
-                "reason": "invalid_start",
-                "detail": f"невалідний формат Start (значення: {raw_start!r})",
-            })
-            logger.warning("Пропущено рядок %s: невалідний формат Start. Файл: %s. Значення: %s", row_num, filename, raw_start)
-            continue
-        if end_date is None:
-            skipped_rows.append({
-                "row_num": row_num,
-                "reason": "invalid_end",
-                "detail": f"невалідний формат End (значення: {raw_end!r})",
-            })
-            logger.warning("Пропущено рядок %s: невалідний формат End. Файл: %s. Значення: %s", row_num, filename, raw_end)
-            continue
-        if start_date > end_date:
-            skipped_rows.append({
-                "row_num": row_num,
-                "reason": "start_gt_end",
-                "detail": f"Start ({start_date}) > End ({end_date})",
-            })
-            logger.warning(
-                "Пропущено рядок %s: Start (%s) пізніше за End (%s). Файл: %s.",
-                row_num, start_date, end_date, filename,
-            )
-            continue
+        date_formats = info.get("date_formats")
+        if date_formats is None:
+            date_formats = {"start": detect_date_format(start_values), "end": detect_date_format(end_values)}
+            info["date_formats"] = date_formats
+        start_dates = parse_date_column(start_values, date_formats["start"])
+        end_dates = parse_date_column(end_values, date_formats["end"])
+        invalid_start = pd.isna(start_dates)
+        invalid_end = ~invalid_start & pd.isna(end_dates)
+        start_gt_end = ~(invalid_start | invalid_end) & (
+            start_dates.astype("datetime64[D]") > end_dates.astype("datetime64[D]")
+        )
+        row_nums = np.asarray(df.index, dtype=np.int64) + 2
 
-        year = start_date.year
-        impr = _parse_number(row.get("impressions")) if "impressions" in df.columns else None
-        rows.append({
-            "year": year,
-            "advertiser": str(row.get("advertiser", "")).strip() if pd.notna(row.get("advertiser")) else "",
-            "brand": str(row.get("brand", "")).strip() if pd.notna(row.get("brand")) else "",
-            "start_date": start_date,
-            "end_date": end_date,
-            "format_type": str(row.get("format", "")).strip() if pd.notna(row.get("format")) else "",
-            "platform": str(row.get("platform", "")).strip() if pd.notna(row.get("platform")) else "",
-            "impressions": impr,
-        })
+    with _stage(info, "rows"):
+        skip_logger = _skip_logger(info, filename)
+        skipped_rows = []
+        skipped_positions = np.flatnonzero(invalid_start | invalid_end | start_gt_end)
+        for i, raw_values in zip(skipped_positions, _raw_values(df, skipped_positions)):
+            row_num = int(row_nums[i])
+            if invalid_start[i]:
+                raw_start = start_values[i]
+                skipped_rows.append({
+                    "row_num": row_num,
+                    "reason": "invalid_start",
+                    "detail": f"невалідний формат Start (значення: {raw_start!r})",
+                    "values": raw_values,
+                })
+            elif invalid_end[i]:
+                raw_end = end_values[i]
+                skipped_rows.append({
+                    "row_num": row_num,
+                    "reason": "invalid_end",
+                    "detail": f"невалідний формат End (значення: {raw_end!r})",
+                    "values": raw_values,
+                })
+            else:
+                start_date, end_date = start_dates[i], end_dates[i]
+                skipped_rows.append({
+                    "row_num": row_num,
+                    "reason": "start_gt_end",
+                    "detail": f"Start ({start_date}) > End ({end_date})",
+                    "values": raw_values,
+                })
+            skip_logger.add(skipped_rows[-1]["reason"], row_num, skipped_rows[-1]["detail"])
+
+        keep = np.flatnonzero(~(invalid_start | invalid_end | start_gt_end))
+        if "impressions" in df.columns:
+            impressions = [_parse_number(v) for v in _column_values(df, "impressions")[keep]]
+        else:
+            impressions = [None] * len(keep)
+        rows = [
+            {
+                "year": start_date.year,
+                "advertiser": advertiser,
+                "brand": brand,
+                "start_date": start_date,
+                "end_date": end_date,
+                "format_type": format_type,
+                "platform": platform,
+                "impressions": impr,
+            }
+            for start_date, end_date, advertiser, brand, format_type, platform, impr in zip(
+                start_dates[keep],
+                end_dates[keep],
+                _text_column(df, "advertiser", keep),
+                _text_column(df, "brand", keep),
+                _text_column(df, "format", keep),
+                _text_column(df, "platform", keep),
+                impressions,
+            )
+        ]
     return True, rows, None, skipped_rows
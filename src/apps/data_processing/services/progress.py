@@ -0,0 +1,152 @@
+"""
+Прогрес обробки завантаженого файлу (прочитано/вставлено/пропущено рядків,
+етап, час, ETA). Записи файлу вставляються в одній транзакції, тому прогрес
+тримається не в БД, а в кеші PROGRESS_CACHE_ALIAS, спільному для web і
+воркерів, і оновлюється раз на порцію рядків.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+PROGRESS_CACHE_ALIAS = "progress"
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
+STAGE_QUEUED = "queued"
+STAGE_READING = "reading"
+STAGE_INSERTING = "inserting"
+STAGE_DONE = "done"
+STAGE_ERROR = "error"
+FINAL_STAGES = (STAGE_DONE, STAGE_ERROR)
+
+_STATUS_STAGES = {"processing": STAGE_QUEUED, "success": STAGE_DONE, "error": STAGE_ERROR}
+
+
+def _cache_key(data_file_id):
+    return f"data_processing:progress:{data_file_id}"
+
+
+class UploadProgress:
+    """
+    Ingest counters of one DataFile. update() accumulates them and writes the
+    snapshot to the progress cache at most once per
+    DATA_PROCESSING_PROGRESS_INTERVAL seconds (stage changes are always written).
+    """
+
+    def __init__(self, data_file, stage=STAGE_READING):
+        self.data_file_id = data_file.pk
+        self.bytes_total = data_file.file_size or 0
+        self.bytes_read = 0
+        self.rows_read = 0
+        self.rows_inserted = 0
+        self.rows_skipped = 0
+        self.rows_per_second = 0.0
+        self.stage = stage
+        self.started_at = time.time()
+        self.finished_at = None
+        self._saved_at = None
+
+    def update(self, stage=None, rows_read=0, rows_inserted=0, rows_skipped=0, bytes_read=None,
+               rows_per_second=None):
+        """Add row counts, set stage / file position / insert rate and save if due."""
+        self.rows_read += rows_read
+        self.rows_inserted += rows_inserted
+        self.rows_skipped += rows_skipped
+        if bytes_read is not None:
+            self.bytes_read = bytes_read
+        if rows_per_second is not None:
+            self.rows_per_second = rows_per_second
+        stage_changed = stage is not None and stage != self.stage
+        if stage_changed:
+            self.stage = stage
+        if stage_changed or self._saved_at is None or (
+            time.monotonic() - self._saved_at >= settings.DATA_PROCESSING_PROGRESS_INTERVAL
+        ):
+            self.save()
+
+    def finish(self, stage):
+        """Record the final stage (done/error) and save."""
+        self.stage = stage
+        self.finished_at = time.time()
+        if stage == STAGE_DONE:
+            self.bytes_read = self.bytes_total
+        self.save()
+
+    def as_dict(self):
+        return {
+            "stage": self.stage,
+            "bytes_total": self.bytes_total,
+            "bytes_read": self.bytes_read,
+            "rows_read": self.rows_read,
+            "rows_inserted": self.rows_inserted,
+            "rows_skipped": self.rows_skipped,
+            "rows_per_second": self.rows_per_second,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def save(self):
+        caches[PROGRESS_CACHE_ALIAS].set(_cache_key(self.data_file_id), self.as_dict(), PROGRESS_TIMEOUT)
+        self._saved_at = time.monotonic()
+
+
+def mark_queued(data_file):
+    """Reset the progress of a file that waits (again) in the ingest queue."""
+    UploadProgress(data_file, stage=STAGE_QUEUED).save()
+
+
+def get_upload_progress(data_file):
+    """
+    Progress of data_file for the polling API: counters from the progress cache
+    (or from the DataFile itself if the entry expired), elapsed seconds, ETA
+    extrapolated from the share of bytes read and percent done.
+    """
+    snapshot = caches[PROGRESS_CACHE_ALIAS].get(_cache_key(data_file.pk))
+    if snapshot is None:
+        rows_skipped = data_file.rows_skipped
+        snapshot = {
+            "stage": _STATUS_STAGES.get(data_file.status, STAGE_QUEUED),
+            "bytes_total": data_file.file_size or 0,
+            "bytes_read": 0,
+            "rows_read": (data_file.rows_processed or 0) + rows_skipped,
+            "rows_inserted": data_file.rows_processed or 0,
+            "rows_skipped": rows_skipped,
+            "rows_per_second": None,
+            "started_at": None,
+            "finished_at": None,
+        }
+    elif data_file.status != "processing" and snapshot["stage"] not in FINAL_STAGES:
+        # The worker died or gave up after the last snapshot.
+        snapshot["stage"] = _STATUS_STAGES[data_file.status]
+
+    stage = snapshot["stage"]
+    started_at, finished_at = snapshot["started_at"], snapshot["finished_at"]
+    elapsed = None
+    if started_at is not None and stage != STAGE_QUEUED:
+        elapsed = (finished_at or time.time()) - started_at
+
+    bytes_total, bytes_read = snapshot["bytes_total"], snapshot["bytes_read"]
+    if stage == STAGE_DONE:
+        percent = 100.0
+    elif bytes_total:
+        percent = min(100.0, 100.0 * bytes_read / bytes_total)
+    else:
+        percent = 0.0
+    eta = None
+    if stage not in FINAL_STAGES and elapsed and bytes_read and bytes_total:
+        eta = max(0.0, elapsed * (bytes_total - bytes_read) / bytes_read)
+
+    return {
+        "id": data_file.pk,
+        "filename": data_file.filename,
+        "status": data_file.status,
+        "stage": stage,
+        "rows_read": snapshot["rows_read"],
+        "rows_inserted": snapshot["rows_inserted"],
+        "rows_skipped": snapshot["rows_skipped"],
+        "rows_per_second": None if snapshot["rows_per_second"] is None else round(snapshot["rows_per_second"]),
+        "percent": round(percent, 1),
+        "elapsed": None if elapsed is None else round(elapsed, 1),
+        "eta": None if eta is None else round(eta, 1),
+        "error_message": data_file.error_message if data_file.status == "error" else None,
+    }
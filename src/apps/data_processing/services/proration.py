@@ -0,0 +1,163 @@
+"""
+Розподіл показів по днях кампанії (ProratedDay). Покази кожного запису
+рівномірно розподіляються по днях між Start і End включно, у цілих
+копійках: остача копійок іде на перші дні, тож сума по днях точно
+дорівнює сумі файлу. Розподіл рахується векторно (різницевий масив +
+префіксні суми) для кожного файлу окремо, тому додавання при обробці,
+віднімання при видаленні й повний перерахунок дають ті самі значення.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Sum
+
+from .cache import invalidate_stats_on_commit
+
+
+def to_cents(value):
+    """Decimal amount in whole cents (as stored in the 2-decimal impressions column)."""
+    return int(value.scaleb(2).to_integral_value())
+
+
+def same_cents(a, b):
+    """True if two amounts (Decimal or None) are equal once stored."""
+    if a is None or b is None:
+        return a is b
+    return a == b or to_cents(a) == to_cents(b)
+
+
+class DayTotals:
+    """Impression cents of parsed rows of one file, summed per (Start, End) span of days."""
+
+    def __init__(self):
+        self.spans = {}
+
+    def add(self, rows):
+        spans = self.spans
+        for r in rows:
+            if r["impressions"] is None or r["start_date"] is None:
+                continue
+            key = (r["start_date"].toordinal(), (r["end_date"] or r["start_date"]).toordinal())
+            spans[key] = spans.get(key, 0) + to_cents(r["impressions"])
+
+
+def prorate_spans(spans):
+    """
+    Spread {(first_day, last_day): cents} (day ordinals, inclusive) evenly
+    over the days of each span. Returns (first day ordinal, int64 array of
+    cents per day), or (None, empty array) without spans.
+
+    Each span adds base = cents // days to every day and one extra cent to
+    its first cents % days days; both are written as +/- steps into a
+    difference array which a cumulative sum turns into daily values.
+    """
+    import numpy as np
+
+    if not spans:
+        return None, np.zeros(0, dtype=np.int64)
+    bounds = np.array(list(spans), dtype=np.int64)
+    cents = np.fromiter(spans.values(), dtype=np.int64, count=len(spans))
+    first = int(bounds[:, 0].min())
+    starts = bounds[:, 0] - first
+    ends = np.maximum(bounds[:, 1] - first, starts)  # End before Start: the whole amount on Start
+    base, extra = np.divmod(cents, ends - starts + 1)
+
+    diff = np.zeros(int(ends.max()) + 2, dtype=np.int64)
+    np.add.at(diff, starts, base + (extra > 0))
+    np.add.at(diff, ends + 1, -base)
+    np.add.at(diff, starts + extra, -(extra > 0).astype(np.int64))
+    return first, np.cumsum(diff[:-1])
+
+
+def _shift_days(spans, sign):
+    """Add (sign=1) or subtract (sign=-1) the prorated spans to ProratedDay; drop days left at zero."""
+    from ..models import ProratedDay
+
+    first, daily = prorate_spans(spans)
+    offsets = daily.nonzero()[0]
+    if not len(offsets):
+        return
+    days = [
+        (date.fromordinal(first + int(offset)), Decimal(int(daily[offset])).scaleb(-2) * sign)
+        for offset in offsets
+    ]
+    db = connections[DEFAULT_DB_ALIAS]
+    if db.features.supports_update_conflicts_with_target:
+        meta = ProratedDay._meta
+        quote = db.ops.quote_name
+        table = quote(meta.db_table)
+        columns = [quote(meta.get_field(name).column) for name in ("day", "year", "month", "impressions")]
+        impressions = columns[-1]
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES (%s, %s, %s, %s) "
+            f"ON CONFLICT ({columns[0]}) DO UPDATE SET {impressions} = {table}.{impressions} + excluded.{impressions}"
+        )
+        prep_day = meta.get_field("day").get_db_prep_save
+        prep_value = meta.get_field("impressions").get_db_prep_save
+        with db.cursor() as cursor:
+            cursor.executemany(
+                sql, [(prep_day(day, db), day.year, day.month, prep_value(value, db)) for day, value in days],
+            )
+    else:
+        for day, value in days:
+            ProratedDay.objects.get_or_create(day=day, defaults={"year": day.year, "month": day.month})
+            ProratedDay.objects.filter(day=day).update(impressions=F("impressions") + value)
+    if sign < 0:
+        # SQLite adds decimals as REAL, so a day emptied by subtraction may keep a tiny residue.
+        half_cent = Decimal("0.005")
+        ProratedDay.objects.filter(
+            day__range=(days[0][0], days[-1][0]), impressions__gt=-half_cent, impressions__lt=half_cent,
+        ).delete()
+
+
+def apply_file_days(totals):
+    """Add the prorated impressions of a freshly ingested file. Call inside the ingest transaction."""
+    _shift_days(totals.spans, 1)
+
+
+def apply_spans_delta(old_spans, new_spans):
+    """
+    Replace the prorated days of a file's spans whose totals changed between
+    two versions of the file. Proration is not linear in the amount, so the
+    old split is subtracted and the new one added rather than prorating the difference.
+    """
+    changed = [key for key in old_spans.keys() | new_spans.keys() if old_spans.get(key) != new_spans.get(key)]
+    _shift_days({key: old_spans[key] for key in changed if old_spans.get(key)}, -1)
+    _shift_days({key: new_spans[key] for key in changed if new_spans.get(key)}, 1)
+
+
+def record_spans(records):
+    """{(Start, End) ordinals: cents} aggregated in the database from a DataRecord queryset of one file."""
+    rows = (
+        records.filter(start_date__isnull=False, impressions__isnull=False)
+        .values("start_date", "end_date")
+        .annotate(impressions=Sum("impressions"))
+        .order_by()
+    )
+    spans = {}
+    for r in rows:
+        key = (r["start_date"].toordinal(), (r["end_date"] or r["start_date"]).toordinal())
+        spans[key] = spans.get(key, 0) + to_cents(r["impressions"])
+    return spans
+
+
+def remove_file_days(data_file):
+    """Subtract the file's prorated impressions (before its records are deleted)."""
+    from ..models import DataRecord
+
+    with transaction.atomic():
+        _shift_days(record_spans(DataRecord.objects.filter(file=data_file)), -1)
+
+
+def rebuild_prorated_days():
+    """Recompute ProratedDay from DataRecord, file by file. Returns the number of days."""
+    from ..models import DataRecord, ProratedDay
+
+    with transaction.atomic():
+        ProratedDay.objects.all().delete()
+        file_ids = DataRecord.objects.order_by().values_list("file_id", flat=True).distinct()
+        for file_id in file_ids:
+            _shift_days(record_spans(DataRecord.objects.filter(file_id=file_id)), 1)
+        invalidate_stats_on_commit()
+    return ProratedDay.objects.count()
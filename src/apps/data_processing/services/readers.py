@@ -0,0 +1,162 @@
+"""
+Читання вхідних файлів: визначення діалекту CSV (роздільник, лапки,
+кодування/BOM) по невеликому фрагменту на початку файлу та потокове
+читання xlsx порціями рядків.
+"""
+import codecs
+import csv
+import importlib.util
+
+from dataclasses import asdict, dataclass
+
+import openpyxl
+import pandas as pd
+
+from openpyxl.cell.cell import TYPE_ERROR
+
+SNIFF_SAMPLE_SIZE = 64 * 1024
+SNIFF_DELIMITERS = ",;\t|"
+FALLBACK_ENCODING = "cp1251"
+
+CSV_ENGINES = ("c", "pyarrow")
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+@dataclass(frozen=True)
+class CsvDialect:
+    """CSV layout passed to pd.read_csv; detected by sniff_csv_dialect or given by the caller."""
+    delimiter: str = ","
+    quotechar: str = '"'
+    doublequote: bool = True
+    skipinitialspace: bool = False
+    encoding: str = "utf-8"
+
+    def read_csv_kwargs(self):
+        """Keyword arguments for pd.read_csv."""
+        return {"sep": self.delimiter, **{k: v for k, v in asdict(self).items() if k != "delimiter"}}
+
+
+def _detect_encoding(head):
+    """Encoding by BOM, else utf-8 if the sample decodes, else FALLBACK_ENCODING."""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sample is still utf-8.
+        if e.start < len(head) - 3:
+            return FALLBACK_ENCODING
+    return "utf-8"
+
+
+def sniff_csv_dialect(head):
+    """Detect delimiter, quoting and encoding from the first bytes of a CSV file."""
+    encoding = _detect_encoding(head)
+    text = head.decode(encoding, errors="ignore")
+    if len(head) >= SNIFF_SAMPLE_SIZE and "\n" in text:
+        text = text[:text.rindex("\n")]
+    try:
+        sniffed = csv.Sniffer().sniff(text, delimiters=SNIFF_DELIMITERS)
+    except csv.Error:
+        return CsvDialect(encoding=encoding)
+    return CsvDialect(
+        delimiter=sniffed.delimiter,
+        quotechar=sniffed.quotechar or '"',
+        skipinitialspace=bool(sniffed.skipinitialspace),
+        encoding=encoding,
+    )
+
+
+def sniff_csv_fileobj(fileobj):
+    """Sniff the dialect from the head of a seekable binary file and rewind it."""
+    position = fileobj.tell()
+    head = fileobj.read(SNIFF_SAMPLE_SIZE)
+    fileobj.seek(position)
+    return sniff_csv_dialect(head)
+
+
+def resolve_csv_engine(engine, dialect, chunked=False):
+    """
+    pd.read_csv engine to use: pyarrow only if requested, installed and the
+    read needs nothing pyarrow lacks (chunksize, skipinitialspace);
+    otherwise the C parser.
+    """
+    if engine == "pyarrow" and PYARROW_AVAILABLE and not chunked and not dialect.skipinitialspace:
+        return "pyarrow"
+    return "c"
+
+
+# Strings pd.read_excel turns into NaN by default (pandas' STR_NA_VALUES).
+_XLSX_NA_STRINGS = frozenset((
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+))
+
+
+def _xlsx_value(cell):
+    """Cell value as pd.read_excel would give it: errors and NA strings -> None, whole floats -> int."""
+    value = cell.value
+    if value is None or cell.data_type == TYPE_ERROR:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value in _XLSX_NA_STRINGS:
+        return None
+    return value
+
+
+def _xlsx_columns(header):
+    """Column names from the header row: blanks become 'Unnamed: N', duplicates get '.N' suffixes."""
+    columns, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def iter_xlsx_frames(fileobj, chunk_size):
+    """
+    Read the first sheet of an xlsx file with openpyxl in read-only mode and
+    yield DataFrames of up to `chunk_size` rows. The first row is the header;
+    like pd.read_excel, empty rows inside the data are kept and trailing ones
+    dropped, and the index continues across frames. Only one batch of rows
+    is held in memory.
+    """
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows()
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _xlsx_columns([_xlsx_value(cell) for cell in header])
+        width = len(columns)
+        batch, start, blank_rows = [], 0, 0
+        for row in rows:
+            values = [_xlsx_value(cell) for cell in row[:width]]
+            if all(v is None for v in values):
+                blank_rows += 1
+                continue
+            values.extend([None] * (width - len(values)))
+            batch.extend([[None] * width for _ in range(blank_rows)])
+            batch.append(values)
+            blank_rows = 0
+            while len(batch) >= chunk_size:
+                frame, batch = batch[:chunk_size], batch[chunk_size:]
+                yield pd.DataFrame(frame, columns=columns, index=pd.RangeIndex(start, start + len(frame)))
+                start += len(frame)
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch)))
+    finally:
+        workbook.close()
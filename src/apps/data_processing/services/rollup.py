@@ -0,0 +1,124 @@
+"""
+Матеріалізовані підсумки по роках (YearlyRollup). Кожен файл під час
+обробки зберігає свій внесок по роках (FileYearTotal) і додає його до
+YearlyRollup в тій самій транзакції, що й записи; при видаленні файлу
+внесок віднімається. rebuild_yearly_rollup перераховує все з DataRecord.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .cache import invalidate_stats_on_commit
+
+# DataRecord columns summed into total_<name> of YearlyRollup / FileYearTotal
+ROLLUP_SUM_FIELDS = ("impressions",)
+
+
+def _empty_totals():
+    return {"records_count": 0, **{f"total_{name}": Decimal(0) for name in ROLLUP_SUM_FIELDS}}
+
+
+class YearTotals:
+    """Per-year record counts and sums accumulated from parsed rows of one file."""
+
+    def __init__(self):
+        self.years = {}
+
+    def add(self, rows):
+        for row in rows:
+            totals = self.years.get(row["year"])
+            if totals is None:
+                totals = self.years[row["year"]] = _empty_totals()
+            totals["records_count"] += 1
+            for name in ROLLUP_SUM_FIELDS:
+                if row[name] is not None:
+                    totals[f"total_{name}"] += row[name]
+
+
+def _shift_rollup(year_totals, sign):
+    """Add (sign=1) or subtract (sign=-1) per-year totals to YearlyRollup; drop years left without records."""
+    from ..models import YearlyRollup
+
+    for year, totals in year_totals.items():
+        YearlyRollup.objects.get_or_create(year=year)
+        YearlyRollup.objects.filter(year=year).update(
+            **{field: F(field) + sign * value for field, value in totals.items()}
+        )
+    YearlyRollup.objects.filter(year__in=list(year_totals), records_count__lte=0).delete()
+
+
+def apply_file_totals(data_file, totals):
+    """Store the file's per-year totals and add them to YearlyRollup. Call inside the ingest transaction."""
+    from ..models import FileYearTotal
+
+    years = {year: values for year, values in totals.years.items() if year is not None}
+    FileYearTotal.objects.bulk_create(
+        [FileYearTotal(file=data_file, year=year, **values) for year, values in years.items()]
+    )
+    _shift_rollup(years, 1)
+
+
+def apply_file_delta(data_file, added, removed):
+    """
+    Adjust the file's FileYearTotal rows and YearlyRollup by added minus removed
+    rows (YearTotals of a delta ingest). Call inside the ingest transaction.
+    """
+    from ..models import FileYearTotal
+
+    net = {}
+    for sign, totals in ((1, added), (-1, removed)):
+        for year, values in totals.years.items():
+            if year is not None:
+                acc = net.setdefault(year, _empty_totals())
+                for field, value in values.items():
+                    acc[field] += sign * value
+    net = {year: values for year, values in net.items() if any(values.values())}
+    for year, values in net.items():
+        FileYearTotal.objects.get_or_create(file=data_file, year=year)
+        FileYearTotal.objects.filter(file=data_file, year=year).update(
+            **{field: F(field) + value for field, value in values.items()}
+        )
+    FileYearTotal.objects.filter(file=data_file, year__in=list(net), records_count__lte=0).delete()
+    _shift_rollup(net, 1)
+
+
+def remove_file_totals(data_file):
+    """Subtract the file's contribution from YearlyRollup and forget it (before its records are deleted)."""
+    from ..models import FileYearTotal
+
+    fields = ["records_count"] + [f"total_{name}" for name in ROLLUP_SUM_FIELDS]
+    with transaction.atomic():
+        file_totals = FileYearTotal.objects.filter(file=data_file)
+        years = {row.pop("year"): row for row in file_totals.values("year", *fields)}
+        if years:
+            _shift_rollup(years, -1)
+            file_totals.delete()
+
+
+def rebuild_yearly_rollup():
+    """Recompute FileYearTotal and YearlyRollup from DataRecord. Returns the number of years."""
+    from ..models import DataRecord, FileYearTotal, YearlyRollup
+
+    sums = {f"total_{name}": Sum(name) for name in ROLLUP_SUM_FIELDS}
+    with transaction.atomic():
+        FileYearTotal.objects.all().delete()
+        YearlyRollup.objects.all().delete()
+        per_file = (
+            DataRecord.objects.filter(year__isnull=False)
+            .values("file_id", "year")
+            .annotate(records_count=Count("id"), **sums)
+            .order_by()
+        )
+        FileYearTotal.objects.bulk_create(
+            [FileYearTotal(**{k: (Decimal(0) if v is None else v) for k, v in row.items()}) for row in per_file],
+            batch_size=1000,
+        )
+        per_year = (
+            FileYearTotal.objects.values("year")
+            .annotate(records_count=Sum("records_count"), **{k: Sum(k) for k in sums})
+            .order_by()
+        )
+        YearlyRollup.objects.bulk_create([YearlyRollup(**row) for row in per_year])
+    invalidate_stats_on_commit()
+    return YearlyRollup.objects.count()
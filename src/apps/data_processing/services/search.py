@@ -0,0 +1,199 @@
+"""
+Повнотекстовий індекс записів (SQLite FTS5) по рекламодавцю, бренду,
+платформі та формату. Записи зберігають виміри як id словників, тож
+зовнішнім вмістом індексу служить представлення з назвами вимірів.
+Нові записи індексуються пакетами одразу після вставки (тригер на
+кожен рядок уповільнив би обробку файлу в рази), а видалення й зміна
+вимірів записів відстежуються тригерами, тож дельта й видалення файлів
+оновлюють індекс без окремого коду. На інших СУБД індексу немає, і
+пошук іде звичайними icontains. search_records() повертає останні збіги
+та підсумки показів по роках за всіма збігами.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, F, Q, Sum
+from django.db.models.expressions import RawSQL
+
+from .dimensions import decode_dimensions, dimension_model
+
+RECORD_TABLE = "data_processing_data_record"
+CONTENT_VIEW = "data_processing_data_record_text"
+SEARCH_TABLE = "data_processing_data_record_fts"
+SEARCH_FIELDS = ("advertiser", "brand", "platform", "format_type")
+SEARCH_RESULTS_LIMIT = 50
+SEARCH_RESULTS_MAX = 500
+RESULT_FIELDS = ("id", "advertiser", "brand", "platform", "format_type", "start_date", "end_date", "year", "impressions")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _name_sql(field, row):
+    """Scalar subquery of the dimension value a trigger row refers to."""
+    return f"(SELECT name FROM {dimension_model(field)._meta.db_table} WHERE id = {row}.{field}_id)"
+
+
+def _index_sql():
+    columns = ", ".join(SEARCH_FIELDS)
+    joins = "".join(
+        f" LEFT JOIN {dimension_model(field)._meta.db_table} d{i} ON d{i}.id = r.{field}_id"
+        for i, field in enumerate(SEARCH_FIELDS)
+    )
+    names = ", ".join(f"d{i}.name AS {field}" for i, field in enumerate(SEARCH_FIELDS))
+    new_values = ", ".join(_name_sql(field, "new") for field in SEARCH_FIELDS)
+    old_values = ", ".join(_name_sql(field, "old") for field in SEARCH_FIELDS)
+    insert = f"INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    delete = f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    id_columns = ", ".join(f"{field}_id" for field in SEARCH_FIELDS)
+    return [
+        f"CREATE VIEW IF NOT EXISTS {CONTENT_VIEW} AS SELECT r.id AS id, {names} FROM {RECORD_TABLE} r{joins}",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5({columns}, "
+        f"content='{CONTENT_VIEW}', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON {RECORD_TABLE} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF {id_columns} ON {RECORD_TABLE} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def search_index_supported(connection=None):
+    connection = connection or connections[DEFAULT_DB_ALIAS]
+    return connection.vendor == "sqlite"
+
+
+def install_search_index(connection=None):
+    """
+    Create the FTS5 table and its triggers if missing and fill the index.
+    Migrations that rebuild the records table (SQLite drops its triggers) call this again.
+    """
+    connection = connection or connections[DEFAULT_DB_ALIAS]
+    if not search_index_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for sql in _index_sql():
+            cursor.execute(sql)
+    rebuild_search_index(connection)
+
+
+def drop_search_index(connection=None):
+    connection = connection or connections[DEFAULT_DB_ALIAS]
+    if not search_index_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for suffix in ("ad", "au"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        cursor.execute(f"DROP VIEW IF EXISTS {CONTENT_VIEW}")
+
+
+def rebuild_search_index(connection=None):
+    """Re-read all records (through the content view) into the index."""
+    connection = connection or connections[DEFAULT_DB_ALIAS]
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def index_records(first_id, last_id, connection=None):
+    """Add the records with ids first_id..last_id to the index (every inserted record must be indexed once)."""
+    connection = connection or connections[DEFAULT_DB_ALIAS]
+    if not search_index_supported(connection):
+        return
+    columns = ", ".join(SEARCH_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, {columns}) SELECT id, {columns} FROM {CONTENT_VIEW} "
+            "WHERE id BETWEEN %s AND %s",
+            [first_id, last_id],
+        )
+
+
+def index_inserted_records(count, connection=None):
+    """
+    Index the `count` records just inserted on this connection. Inside the
+    write transaction SQLite hands out consecutive rowids, so they are the
+    `count` ids ending at last_insert_rowid().
+    """
+    connection = connection or connections[DEFAULT_DB_ALIAS]
+    if not count or not search_index_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT last_insert_rowid()")
+        last_id = cursor.fetchone()[0]
+    index_records(last_id - count + 1, last_id, connection)
+
+
+def match_expression(text, fields=None):
+    """
+    FTS5 query for free text: every word must occur as a word prefix
+    ("nik sp" finds "Nike Sport"), in any of `fields` when given.
+    None when the text has no words.
+    """
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    expression = " ".join(f'"{token}"*' for token in tokens)
+    if fields:
+        return "{%s} : (%s)" % (" ".join(fields), expression)
+    return expression
+
+
+def matching_ids(text, fields=None):
+    """RawSQL of the ids of records matching text, for `pk__in`; None when the text has no words."""
+    expression = match_expression(text, fields)
+    if expression is None:
+        return None
+    return RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [expression])
+
+
+def _latest_matching_ids(expression, limit):
+    """Newest matching ids straight from the index, which walks rowids in descending order."""
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s",
+            [expression, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _icontains_matches(text, fields):
+    """Fallback without the index: every word must occur in one of the fields."""
+    from ..models import DataRecord
+
+    matches = DataRecord.objects.all()
+    for token in _TOKEN_RE.findall(text):
+        word = Q()
+        for field in fields:
+            word |= Q(**{f"{field}__name__icontains": token})
+        matches = matches.filter(word)
+    return matches
+
+
+def search_records(text, fields=None, limit=SEARCH_RESULTS_LIMIT):
+    """
+    Records matching text (newest first, at most limit) and impressions per
+    year over all matches. Raises ValueError for an empty query or an unknown field.
+    """
+    from ..models import DataRecord
+
+    unknown = [field for field in fields or () if field not in SEARCH_FIELDS]
+    if unknown:
+        raise ValueError(f"Невідоме поле пошуку: {', '.join(unknown)}")
+    if match_expression(text) is None:
+        raise ValueError("Порожній пошуковий запит.")
+    limit = max(1, min(limit, SEARCH_RESULTS_MAX))
+
+    if search_index_supported():
+        ids = _latest_matching_ids(match_expression(text, fields), limit)
+        records = DataRecord.objects.filter(pk__in=ids)
+        matches = DataRecord.objects.filter(pk__in=matching_ids(text, fields))
+    else:
+        matches = records = _icontains_matches(text, fields or SEARCH_FIELDS)
+    year_totals = list(
+        matches.order_by("year").values("year")
+        .annotate(records_count=Count("id"), total_impressions=Sum("impressions"))
+    )
+    rows = list(records.order_by("-id").values(*RESULT_FIELDS, filename=F("file__filename"))[:limit])
+    return {
+        "records": decode_dimensions(rows, SEARCH_FIELDS),
+        "year_totals": year_totals,
+        "total": sum(row["records_count"] for row in year_totals),
+    }
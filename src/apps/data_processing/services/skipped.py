@@ -0,0 +1,96 @@
+"""
+Пропущені при обробці рядки файлу (невалідні Start/End, Start > End)
+зберігаються окремою таблицею SkippedRow: номер рядка, код причини та
+сирі значення, вставлені пакетами разом із записами файлу. DataFile
+тримає лише лічильники по причинах, тож завантаження файлу (і сторінки
+адмінки) не читають увесь лог. У лог потрапляють лише перші приклади
+кожної причини та один підсумок на файл (SkipLogger).
+"""
+import logging
+
+from collections import Counter
+
+from django.conf import settings
+
+from ..metrics import rows_skipped_total
+
+logger = logging.getLogger(__name__)
+
+
+class SkipLogger:
+    """
+    Summarizing log of the rows skipped in one file: the first `examples`
+    rows of each reason are logged, the rest only counted, and summary()
+    emits one record with the counts per reason.
+    """
+
+    def __init__(self, filename, examples=None):
+        self.filename = filename
+        self.examples = settings.DATA_PROCESSING_SKIPPED_LOG_EXAMPLES if examples is None else examples
+        self.counts = Counter()
+        self.summarized = False
+
+    def add(self, reason, row_num, detail):
+        self.counts[reason] += 1
+        if self.counts[reason] <= self.examples:
+            logger.warning("Пропущено рядок %s: %s. Файл: %s.", row_num, detail, self.filename)
+
+    def summary(self):
+        """Log the counts per reason once per file and add them to the rows_skipped_total metric."""
+        if self.summarized or not self.counts:
+            return
+        self.summarized = True
+        counts = dict(sorted(self.counts.items()))
+        for reason, count in counts.items():
+            rows_skipped_total.inc(count, reason=reason)
+        logger.warning(
+            "Пропущено рядків: %s (%s). Файл: %s.",
+            sum(counts.values()), ", ".join(f"{reason}: {count}" for reason, count in counts.items()), self.filename,
+            extra={"skipped_counts": counts},
+        )
+
+
+class SkippedRowWriter:
+    """Bulk-insert the skipped rows of one ingest and count them per reason."""
+
+    def __init__(self, data_file, batch_size=None):
+        self.data_file = data_file
+        self.batch_size = batch_size or settings.DATA_PROCESSING_BULK_BATCH_SIZE
+        self.counts = Counter()
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def add(self, skipped_rows):
+        """Insert skipped rows as returned by services.parsing."""
+        from ..models import SkippedRow
+
+        if not skipped_rows:
+            return
+        SkippedRow.objects.bulk_create(
+            [
+                SkippedRow(
+                    file=self.data_file,
+                    row_num=s["row_num"],
+                    reason=s["reason"],
+                    detail=s["detail"],
+                    raw_values=s.get("values", {}),
+                )
+                for s in skipped_rows
+            ],
+            batch_size=self.batch_size,
+        )
+        self.counts.update(s["reason"] for s in skipped_rows)
+
+    def store_counts(self):
+        """Copy the counters to the DataFile (saved by the caller)."""
+        self.data_file.rows_skipped = self.total
+        self.data_file.skipped_counts = dict(sorted(self.counts.items()))
+
+
+def remove_skipped_rows(data_file):
+    """Delete the skipped rows stored for data_file (before it is ingested again)."""
+    from ..models import SkippedRow
+
+    SkippedRow.objects.filter(file=data_file).delete()
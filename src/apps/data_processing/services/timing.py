@@ -0,0 +1,66 @@
+"""
+Вимірювання етапів обробки файлу: читання, нормалізація колонок, розбір
+дат, побудова рядків, вставка, підсумки та збереження файлу. Для кожного
+етапу рахуються час (wall та CPU) і пік пам'яті за tracemalloc, сумарно
+по всіх чанках; результати зберігаються в IngestStageTiming і видні в
+адмінці файлу.
+"""
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class StageTimer:
+    """
+    Wall time, CPU time and peak traced memory per stage, summed over the
+    chunks of one ingest. Stages must not nest. Memory is traced only with
+    trace_memory (DATA_PROCESSING_TRACE_MEMORY); tracemalloc sees the whole
+    process, so uploads processed in parallel threads blur each other's peaks.
+    """
+
+    def __init__(self, trace_memory=None):
+        self.trace_memory = settings.DATA_PROCESSING_TRACE_MEMORY if trace_memory is None else trace_memory
+        self.stages = {}
+        self._started_tracing = False
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(name, {"wall_time": 0.0, "cpu_time": 0.0, "peak_memory": None, "calls": 0})
+            totals["wall_time"] += time.perf_counter() - wall
+            totals["cpu_time"] += time.process_time() - cpu
+            totals["calls"] += 1
+            if tracing:
+                peak = max(0, tracemalloc.get_traced_memory()[1] - memory_before)
+                totals["peak_memory"] = max(totals["peak_memory"] or 0, peak)
+
+
+def store_stage_timings(data_file, timer):
+    """Replace the stage timings of data_file with those of timer, in the order the stages ran."""
+    from ..models import IngestStageTiming
+
+    IngestStageTiming.objects.filter(file=data_file).delete()
+    IngestStageTiming.objects.bulk_create([
+        IngestStageTiming(file=data_file, stage=name, position=position, **totals)
+        for position, (name, totals) in enumerate(timer.stages.items())
+    ])
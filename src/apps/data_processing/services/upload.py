@@ -1,60 +1,262 @@
-from .parsing import validate_and_parse
+import pickle
+import tempfile
 
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
 
-def process_file_upload(user, uploaded_file):
+from .. import metrics
+from .cache import invalidate_stats_on_commit
+from .cube import apply_file_cells
+from .dedup import compute_content_hash, delete_superseded_files, duplicate_message, find_duplicate
+from .delta import DeltaLoader, find_delta_base
+from .loader import RecordLoader
+from .progress import STAGE_DONE, STAGE_ERROR, STAGE_INSERTING, UploadProgress
+from .proration import apply_file_days
+from .rollup import apply_file_totals
+from .skipped import SkippedRowWriter
+from .timing import StageTimer, store_stage_timings
+
+
+class _ChunkSpool:
     """
-    Validate file, create DataFile and DataRecord, return result for view.
+    Parsed (rows, skipped rows) chunks pickled to a temporary file, so a
+    streamed file is parsed in full before the write transaction opens while
+    only one chunk is kept in memory. Iterating reads the chunks back in order.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self.chunks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+    def add(self, rows, skipped_rows):
+        pickle.dump((rows, skipped_rows), self._file, pickle.HIGHEST_PROTOCOL)
+        self.chunks += 1
+
+    def __iter__(self):
+        self._file.seek(0)
+        for _ in range(self.chunks):
+            yield pickle.load(self._file)
+
+
+def _describe_date_formats(date_formats):
+    """Detected Start/End formats as one string: 'fmt' or 'start_fmt / end_fmt'."""
+    if not date_formats:
+        return ""
+    start, end = date_formats["start"] or "-", date_formats["end"] or "-"
+    return start if start == end else f"{start} / {end}"
+
+
+def _file_position(fileobj):
+    """Bytes consumed from fileobj so far (None if it cannot tell)."""
+    try:
+        return fileobj.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _finish_success(data_file, rows_count, skipped, progress, timer, note=""):
+    """Mark data_file as processed with its skipped rows counters and build the message for the view."""
+    data_file.status = "success"
+    data_file.rows_processed = rows_count
+    skipped.store_counts()
+    with timer.stage("save"):
+        data_file.save(update_fields=["status", "rows_processed", "rows_skipped", "skipped_counts", "date_format"])
+    invalidate_stats_on_commit()
+    progress.finish(STAGE_DONE)
+
+    msg = f"Оброблено рядків: {rows_count}."
+    if skipped.total:
+        msg += f" Пропущено рядків: {skipped.total} (див. лог в адмінці)."
+    if note:
+        msg += f" {note}"
+    return True, msg, False
+
+
+def _finish_error(data_file, message, error_type, progress):
+    """Mark data_file as failed validation and build the result for the view."""
+    data_file.status = "error"
+    data_file.error_type = error_type
+    data_file.error_message = message
+    data_file.save(update_fields=["status", "error_type", "error_message", "date_format"])
+    invalidate_stats_on_commit()
+    progress.finish(STAGE_ERROR)
+    return False, message, True
+
+
+def _read_rows(rows, skipped_count, fileobj, progress):
+    """Report one parsed batch of rows to progress."""
+    progress.update(rows_read=len(rows) + skipped_count, rows_skipped=skipped_count, bytes_read=_file_position(fileobj))
+
+
+def _load_file(data_file, chunks, progress, loader, replace, timer):
+    """
+    Insert parsed (rows, skipped rows) chunks and apply the file's rollups in
+    one transaction: the only part of an ingest that holds the database write
+    lock. Returns (rows inserted, SkippedRowWriter, note for the message).
+    """
+    rows_count = 0
+    skipped = SkippedRowWriter(data_file)
+    progress.update(stage=STAGE_INSERTING)
+    with transaction.atomic():
+        for rows, skipped_rows in chunks:
+            with timer.stage("insert"):
+                rows_count += loader.load(rows)
+                skipped.add(skipped_rows)
+            progress.update(rows_inserted=len(rows), rows_per_second=loader.rows_per_second)
+        with timer.stage("aggregate"):
+            note = _apply_file(data_file, loader, replace)
+    return rows_count, skipped, note
+
+
+def _record_metrics(data_file, timer):
+    """Count the finished upload and observe its parse and insert times (see metrics.py)."""
+    metrics.uploads_total.inc(status=data_file.status, error_type=data_file.error_type or "")
+    if data_file.status == "success":
+        metrics.rows_ingested_total.inc(data_file.rows_processed or 0)
+    stages = timer.stages
+    metrics.parse_seconds.observe(sum(
+        stages[name]["wall_time"] for name in ("read", "normalize", "dates", "rows") if name in stages
+    ))
+    if "insert" in stages:
+        metrics.insert_seconds.observe(stages["insert"]["wall_time"])
+    metrics.flush_metrics(force=True)
+
+
+def _apply_file(data_file, loader, replace):
+    """
+    Add the file's totals, cube cells and prorated days (or finish a delta);
+    with replace drop the uploads it supersedes. Returns a note for the message.
+    """
+    if isinstance(loader, DeltaLoader):
+        return loader.apply()
+    apply_file_totals(data_file, loader.year_totals)
+    apply_file_cells(loader.cube_totals)
+    apply_file_days(loader.day_totals)
+    replaced = delete_superseded_files(data_file) if replace else []
+    return f"Замінено попередні завантаження: {', '.join(replaced)}." if replaced else ""
+
+
+def _process_stream(data_file, fileobj, iter_chunks, chunk_size, progress, loader, replace, timer, **kwargs):
+    """
+    Read and validate a file chunk by chunk (iter_csv_chunks / iter_xlsx_chunks)
+    so only one chunk is in memory; parsed chunks wait in a _ChunkSpool. A failed
+    chunk fails the file before anything is written, otherwise the records of all
+    chunks are inserted in one transaction (_load_file). Progress is reported once per chunk.
+    """
+    info = {"stage_timer": timer}
+    with _ChunkSpool() as spool:
+        for ok, data_or_message, error_type, chunk_skipped in iter_chunks(
+            fileobj, data_file.filename, chunk_size, info, **kwargs
+        ):
+            if not ok:
+                return _finish_error(data_file, data_or_message, error_type, progress)
+            with timer.stage("rows"):
+                spool.add(data_or_message, chunk_skipped)
+            _read_rows(data_or_message, len(chunk_skipped), fileobj, progress)
+        data_file.date_format = _describe_date_formats(info.get("date_formats"))
+        rows_count, skipped, note = _load_file(data_file, spool, progress, loader, replace, timer)
+    return _finish_success(data_file, rows_count, skipped, progress, timer, note)
+
+
+def ingest_data_file(data_file, fileobj, csv_dialect=None, replace=False, delta=False):
+    """
+    Parse a binary file object into records of an existing DataFile and set its final status.
+    CSV and xlsx files are streamed in chunks of DATA_PROCESSING_CSV_CHUNK_SIZE /
+    DATA_PROCESSING_XLSX_CHUNK_SIZE rows (0 disables streaming);
+    csv_dialect (CsvDialect) skips dialect sniffing for files from a known source.
+    The whole file is parsed before its records are inserted by RecordLoader
+    in one transaction, together with the file's YearlyRollup deltas, cube
+    cells, prorated days and skipped rows (services.skipped), so the database
+    write lock is held only for the load; rows the database rejects fail the
+    file without leaving partial records. With replace, the
+    uploads the file supersedes (services.dedup) are deleted in that transaction;
+    with delta, a previous version of the file is updated in place (services.delta).
+    Progress is published for the polling API (services.progress); time and
+    memory of each stage are stored as IngestStageTiming (services.timing).
     Returns: (success: bool, message: str, is_error: bool).
     """
-    from ..models import DataFile, DataRecord
+    progress = UploadProgress(data_file)
+    progress.save()
+    base_file = find_delta_base(data_file) if delta else None
+    loader = RecordLoader(data_file) if base_file is None else DeltaLoader(data_file, base_file)
+    timer = StageTimer()
+    timer.start()
+    try:
+        result = _ingest(data_file, fileobj, csv_dialect, progress, loader, replace, timer)
+    except (DataError, IntegrityError) as e:
+        result = _finish_error(data_file, f"Помилка збереження даних: {e}", "other", progress)
+    else:
+        loader.log_stats()
+    finally:
+        timer.stop()
+    store_stage_timings(data_file, timer)
+    _record_metrics(data_file, timer)
+    return result
 
-    filename = uploaded_file.name
-    content = uploaded_file.read()
-    file_size = len(content)
 
-    ok, data_or_message, error_type, skipped_rows = validate_and_parse(content, filename)
+def _ingest(data_file, fileobj, csv_dialect, progress, loader, replace, timer):
+    # pandas and openpyxl are loaded with the parser, on the first file only
+    from .parsing import iter_csv_chunks, iter_xlsx_chunks, validate_and_parse
 
-    data_file = DataFile.objects.create(
-        user=user,
-        filename=filename,
-        status="error" if not ok else "processing",
-        file_size=file_size,
-        error_type=error_type if not ok else None,
-        error_message=data_or_message if not ok else None,
-    )
+    extension = data_file.filename.lower().rsplit(".", 1)[-1]
+    if extension == "csv" and settings.DATA_PROCESSING_CSV_CHUNK_SIZE:
+        return _process_stream(
+            data_file, fileobj, iter_csv_chunks, settings.DATA_PROCESSING_CSV_CHUNK_SIZE, progress, loader, replace,
+            timer, dialect=csv_dialect,
+        )
+    if extension == "xlsx" and settings.DATA_PROCESSING_XLSX_CHUNK_SIZE:
+        return _process_stream(
+            data_file, fileobj, iter_xlsx_chunks, settings.DATA_PROCESSING_XLSX_CHUNK_SIZE, progress, loader, replace,
+            timer,
+        )
 
+    info = {"stage_timer": timer}
+    ok, data_or_message, error_type, skipped_rows = validate_and_parse(
+        fileobj.read(), data_file.filename, info, dialect=csv_dialect, engine=settings.DATA_PROCESSING_CSV_ENGINE
+    )
+    data_file.date_format = _describe_date_formats(info.get("date_formats"))
     if not ok:
-        data_file.status = "error"
-        data_file.save(update_fields=["status"])
-        return False, data_or_message, True
-
-    records = [
-        DataRecord(
-            file=data_file,
-            year=r["year"],
-            advertiser=r["advertiser"] or "",
-            brand=r["brand"] or "",
-            start_date=r["start_date"],
-            end_date=r["end_date"],
-            format_type=r["format_type"] or "",
-            platform=r["platform"] or "",
-            impressions=r["impressions"],
-        )
-        for r in data_or_message
-    ]
-    DataRecord.objects.bulk_create(records)
-
-    skipped_log = (
-        "\n".join(f"Рядок {s['row_num']}: {s['detail']}" for s in skipped_rows)
-        if skipped_rows
-        else ""
+        return _finish_error(data_file, data_or_message, error_type, progress)
+
+    _read_rows(data_or_message, len(skipped_rows), fileobj, progress)
+    rows_count, skipped, note = _load_file(
+        data_file, [(data_or_message, skipped_rows)], progress, loader, replace, timer
     )
-    data_file.status = "success"
-    data_file.rows_processed = len(records)
-    data_file.skipped_rows_log = skipped_log
-    data_file.save(update_fields=["status", "rows_processed", "skipped_rows_log"])
+    return _finish_success(data_file, rows_count, skipped, progress, timer, note)
 
-    msg = f"Оброблено рядків: {len(records)}."
-    if skipped_rows:
-        msg += f" Пропущено рядків: {len(skipped_rows)} (див. лог в адмінці)."
-    return True, msg, False
+
+def process_file_upload(user, uploaded_file, csv_dialect=None, replace=False, delta=False):
+    """
+    Validate file, create DataFile and DataRecord, return result for view.
+    A file whose content the user already uploaded is skipped unless replace is set;
+    replace re-ingests it and deletes the uploads it supersedes, delta applies
+    only the rows that changed since the previous upload with the same name.
+    Returns: (success: bool, message: str, is_error: bool).
+    """
+    from ..models import DataFile
+
+    content_hash = compute_content_hash(uploaded_file)
+    if not replace:
+        duplicate = find_duplicate(user, content_hash)
+        if duplicate is not None:
+            return True, duplicate_message(duplicate), False
+
+    data_file = DataFile.objects.create(
+        user=user,
+        filename=uploaded_file.name,
+        status="processing",
+        file_size=uploaded_file.size,
+        content_hash=content_hash,
+    )
+    try:
+        return ingest_data_file(data_file, uploaded_file.file, csv_dialect, replace=replace, delta=delta)
+    except Exception:
+        # Records were rolled back; do not leave the file in 'processing'.
+        _finish_error(data_file, "Не вдалося обробити файл.", "other", UploadProgress(data_file))
+        raise
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import DataFile, DataRecord
+from .services.cache import invalidate_stats_on_commit
+from .services.cube import remove_file_cells
+from .services.proration import remove_file_days
+from .services.rollup import remove_file_totals
+from .services.search import index_records
+
+
+@receiver(pre_delete, sender=DataFile)
+def subtract_file_from_rollup(sender, instance, **kwargs):
+    """Keep YearlyRollup, the cube and prorated days in sync when a file (and its records) is deleted."""
+    remove_file_totals(instance)
+    remove_file_cells(instance)
+    remove_file_days(instance)
+
+
+@receiver(post_delete, sender=DataFile)
+def invalidate_stats(sender, instance, **kwargs):
+    invalidate_stats_on_commit()
+
+
+@receiver(post_save, sender=DataRecord)
+def index_created_record(sender, instance, created, **kwargs):
+    """Records saved one by one (admin, fixtures) are indexed here; ingest indexes its batches itself."""
+    if created:
+        index_records(instance.pk, instance.pk)
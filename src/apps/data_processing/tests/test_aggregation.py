@@ -2,6 +2,7 @@ import pytest
 
 from apps.data_processing.models import DataFile, DataRecord
 from apps.data_processing.services.aggregation import AGGREGATED_NUMERIC_FIELDS, get_aggregated_stats
+from apps.data_processing.services.rollup import rebuild_yearly_rollup
 
 
 @pytest.mark.django_db
@@ -27,6 +28,7 @@ class TestGetAggregatedStats:
             DataRecord(file=data_file, year=2021, impressions=200),
             DataRecord(file=data_file, year=2022, impressions=500),
         ])
+        rebuild_yearly_rollup()  # records inserted directly, not through ingest
         result = get_aggregated_stats()
         assert len(result["year_stats"]) == 2
         years = {r["year"]: r["totals"] for r in result["year_stats"]}
@@ -0,0 +1,179 @@
+import json
+
+from collections import Counter
+from io import StringIO
+from types import SimpleNamespace
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from apps.data_processing.benchmarks.generator import (
+    XLSX_MAX_ROWS, CampaignFileSpec, generate_campaign_file, iter_campaign_rows,
+)
+from apps.data_processing.benchmarks.startup import compare_startup, import_profile, parse_importtime
+from apps.data_processing.benchmarks.suite import compare_results, run_suite, scaling_exponent
+from apps.data_processing import services
+from apps.data_processing.management.commands import run_benchmarks
+from apps.data_processing.models import DataFile
+from apps.data_processing.services.parsing import validate_and_parse
+
+MIXED = {"mixed_date_ratio": 0.08, "excel_serial_ratio": 0.08, "bad_date_ratio": 0.03, "start_gt_end_ratio": 0.05}
+
+
+class TestGenerator:
+
+    @pytest.mark.parametrize("file_format", ["csv", "xlsx"])
+    def test_same_spec_same_bytes(self, file_format):
+        spec = CampaignFileSpec(rows=300, seed=7, **MIXED)
+        first = generate_campaign_file(spec, file_format)
+        assert generate_campaign_file(spec, file_format).content == first.content
+        assert generate_campaign_file(CampaignFileSpec(rows=300, seed=8, **MIXED), file_format).content != first.content
+
+    @pytest.mark.parametrize("file_format", ["csv", "xlsx"])
+    def test_counts_match_parser(self, file_format):
+        generated = generate_campaign_file(CampaignFileSpec(rows=2000, seed=1, **MIXED), file_format)
+        ok, rows, _, skipped = validate_and_parse(generated.content, f"bench.{file_format}")
+        assert ok
+        assert len(rows) == generated.valid_rows
+        assert Counter(s["reason"] for s in skipped) == {
+            "invalid_start": generated.counts["bad_date"], "start_gt_end": generated.counts["start_gt_end"],
+        }
+        assert all(generated.counts[kind] > 0 for kind in ("mixed_date", "excel_serial"))
+
+    def test_ratios(self):
+        counts = {}
+        for _ in iter_campaign_rows(CampaignFileSpec(rows=20000, seed=3, **MIXED), counts=counts):
+            pass
+        assert counts["mixed_date"] == pytest.approx(1600, rel=0.1)
+        assert counts["bad_date"] == pytest.approx(600, rel=0.15)
+
+    def test_limits(self):
+        with pytest.raises(ValueError):
+            generate_campaign_file(CampaignFileSpec(rows=XLSX_MAX_ROWS + 1), "xlsx")
+        with pytest.raises(ValueError):
+            CampaignFileSpec(rows=10, bad_date_ratio=0.6, start_gt_end_ratio=0.6)
+
+
+class TestSuite:
+
+    def test_scaling_exponent(self):
+        assert scaling_exponent([{"rows": 10, "seconds": 1.0}, {"rows": 100, "seconds": 10.0}]) == 1.0
+        assert scaling_exponent([{"rows": 10, "seconds": 1.0}, {"rows": 100, "seconds": 100.0}]) == 2.0
+        assert scaling_exponent([{"rows": 10, "seconds": 1.0}]) is None
+
+    def test_compare(self):
+        baseline = {"results": {"a": [{"rows": 10, "rows_per_second": 100.0}, {"rows": 20, "rows_per_second": 50}]}}
+        current = {"results": {"a": [{"rows": 10, "rows_per_second": 80.0}, {"rows": 30, "rows_per_second": 1}]}}
+        assert compare_results(baseline, current) == [
+            {"benchmark": "a", "rows": 10, "baseline": 100.0, "current": 80.0, "change": pytest.approx(-0.2)},
+        ]
+
+    @pytest.mark.django_db
+    def test_run(self, user):
+        results = run_suite(user, sizes=[100, 200], repeat=1, spec_options={"seed": 2})
+        assert set(results["results"]) == {
+            "validate_and_parse[csv]", "process_file_upload[csv]",
+            "get_aggregated_stats[start,cold]", "get_aggregated_stats[start,warm]",
+            "get_aggregated_stats[prorated,cold]", "get_aggregated_stats[prorated,warm]",
+        }
+        upload = results["results"]["process_file_upload[csv]"]
+        assert [p["rows"] for p in upload] == [100, 200]
+        assert all(p["rows_per_second"] > 0 and p["peak_memory"] > 0 for p in upload)
+        assert results["scaling"]["validate_and_parse[csv]"] is not None
+        assert results["spec"]["seed"] == 2
+        assert not DataFile.objects.exists()
+
+
+class TestStartup:
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:      2500 |       3100 | django.conf\n"
+            "some other stderr line\n"
+        )
+        assert parse_importtime(output) == [("_io", 0.00012, 0.00012, 1), ("django.conf", 0.0025, 0.0031, 0)]
+
+    def test_compare_startup(self):
+        baseline = {"startup": {"check": {"seconds": 1.0}}}
+        assert compare_startup(baseline, {"startup": {"check": {"seconds": 0.75}}})["change"] == pytest.approx(-0.25)
+        assert compare_startup({}, {"startup": {"check": {"seconds": 0.75}}}) is None
+
+    def test_services_resolve_lazily(self):
+        assert services.validate_and_parse is validate_and_parse
+        with pytest.raises(AttributeError):
+            services.parse_everything
+
+    def test_parser_dependencies_not_imported_at_startup(self):
+        profile = import_profile()
+        assert profile["modules"] > 0
+        assert profile["heavy_modules"] == []
+
+
+def _canned_results(rate):
+    point = {"rows": 100, "seconds": 100 / rate, "min_seconds": 100 / rate, "peak_memory": None,
+             "rows_per_second": rate}
+    return {"results": {"validate_and_parse[csv]": [point]}, "scaling": {"validate_and_parse[csv]": None}}
+
+
+class TestCommand:
+
+    @pytest.fixture
+    def suite(self, monkeypatch):
+        """
+        The command without its throwaway database and subprocesses: canned
+        results at suite.rate rows/sec and suite.check seconds of startup.
+        """
+        suite = SimpleNamespace(rate=1000.0, check=None, calls=[])
+
+        def run_isolated(command, tmp, sizes, formats, options, spec_options):
+            suite.calls.append({"sizes": sizes, "formats": formats, "spec_options": spec_options})
+            return _canned_results(suite.rate)
+
+        def run_startup(repeat):
+            imports = {"modules": 10, "total_seconds": 0.1, "slowest": [], "heavy_modules": []}
+            return {"check": {"seconds": suite.check, "min_seconds": suite.check}, "imports": imports}
+
+        monkeypatch.setattr(run_benchmarks.Command, "_run_isolated", run_isolated)
+        monkeypatch.setattr(run_benchmarks, "run_startup", run_startup)
+        return suite
+
+    def test_output(self, suite, tmp_path):
+        output = tmp_path / "run.json"
+        call_command("run_benchmarks", sizes="1k,2.5k,5M", formats="csv,xlsx", seed=4, output=str(output),
+                     startup_repeat=0, stdout=StringIO())
+        assert suite.calls[0]["sizes"] == [1000, 2500, 5_000_000]
+        assert suite.calls[0]["formats"] == ["csv", "xlsx"]
+        assert suite.calls[0]["spec_options"]["seed"] == 4
+        assert json.loads(output.read_text()) == _canned_results(1000.0)
+
+    def test_compare(self, suite, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        baseline.write_text(json.dumps(_canned_results(1000.0)))
+        suite.rate = 900.0
+        stdout = StringIO()
+        call_command("run_benchmarks", compare=str(baseline), max_regression=0.2, startup_repeat=0, stdout=stdout)
+        assert "-10.0%" in stdout.getvalue()
+        suite.rate = 700.0
+        with pytest.raises(CommandError, match="slower than the baseline"):
+            call_command("run_benchmarks", compare=str(baseline), max_regression=0.2, startup_repeat=0,
+                         stdout=StringIO())
+
+    def test_compare_startup(self, suite, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        baseline.write_text(json.dumps({**_canned_results(1000.0), "startup": {"check": {"seconds": 1.0}}}))
+        suite.check = 0.6
+        stdout = StringIO()
+        call_command("run_benchmarks", compare=str(baseline), max_regression=0.2, stdout=stdout)
+        assert "manage.py check: 1.000 s -> 0.600 s  -40.0%" in stdout.getvalue()
+        suite.check = 1.5
+        with pytest.raises(CommandError, match="1 benchmark"):
+            call_command("run_benchmarks", compare=str(baseline), max_regression=0.2, stdout=StringIO())
+
+    @pytest.mark.parametrize("options", [{"sizes": "lots"}, {"sizes": "0"}, {"formats": "xls"}, {"repeat": 0}])
+    def test_invalid_options(self, options):
+        with pytest.raises(CommandError):
+            call_command("run_benchmarks", **options)
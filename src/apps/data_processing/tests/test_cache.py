@@ -0,0 +1,68 @@
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from apps.data_processing.models import DataFile
+from apps.data_processing.services.aggregation import get_aggregated_stats
+from apps.data_processing.services.cache import bump_data_version, cached_stats
+from apps.data_processing.services.upload import process_file_upload
+
+
+def _years():
+    return {row["year"]: row["totals"][0] for row in get_aggregated_stats()["year_stats"]}
+
+
+@pytest.mark.django_db
+class TestStatsCache:
+
+    def test_repeated_read_hits_cache(self, user, csv_valid_content, django_assert_num_queries):
+        process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        first = get_aggregated_stats()
+        with django_assert_num_queries(0):
+            assert get_aggregated_stats() == first
+
+    def test_finished_upload_invalidates(
+        self, user, csv_valid_content, csv_start_gt_end, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        assert _years() == {2021: 3000}
+        with django_capture_on_commit_callbacks(execute=True):
+            process_file_upload(user, SimpleUploadedFile("b.csv", csv_start_gt_end))
+        assert _years() == {2021: 3200}
+
+    def test_deleted_file_invalidates(self, user, csv_valid_content, django_capture_on_commit_callbacks):
+        process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        assert _years() == {2021: 3000}
+        with django_capture_on_commit_callbacks(execute=True):
+            DataFile.objects.get().delete()
+        assert _years() == {}
+
+    def test_invalidation_waits_for_commit(self, user, csv_valid_content, django_capture_on_commit_callbacks):
+        assert _years() == {}
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        assert _years() == {}
+        for callback in callbacks:
+            callback()
+        assert _years() == {2021: 3000}
+
+    def test_bump_during_compute_is_not_lost(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                bump_data_version()  # data changed while the value was being computed
+            return len(calls)
+
+        assert cached_stats("test", compute) == 1
+        assert cached_stats("test", compute) == 2
+        assert cached_stats("test", compute) == 2
+
+    def test_warm_command(self, user, csv_valid_content, django_assert_num_queries):
+        process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        call_command("warm_stats_cache")
+        with django_assert_num_queries(0):
+            get_aggregated_stats()
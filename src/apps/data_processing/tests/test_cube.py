@@ -0,0 +1,158 @@
+from decimal import Decimal
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+
+from apps.data_processing.models import CubeCell, DataFile, DataRecord, Platform
+from apps.data_processing.services.cube import dimension_values, query_cube
+from apps.data_processing.services.dimensions import decode_dimensions
+from apps.data_processing.services.upload import process_file_upload
+
+CSV_CUBE = b"""Advertis,Brand,Start,End,Format,Platforr,Impr
+A,B,04.01.21,10.01.21,banner,DV360,100
+A,B,14.01.21,20.01.21,banner,DV360,
+A,C,14.02.21,20.02.21,video,Meta,50
+D,E,14.03.22,20.03.22,banner,DV360,1.5"""
+
+
+def _cells():
+    """Cells with their dimension ids replaced by names."""
+    fields = ("advertiser", "brand", "platform", "format_type")
+    cells = decode_dimensions(
+        list(CubeCell.objects.values("year", "month", *fields, "records_count", "total_impressions")), fields
+    )
+    return {
+        (c["year"], c["month"], *(c[name] for name in fields)): (c["records_count"], c["total_impressions"])
+        for c in cells
+    }
+
+
+@pytest.mark.django_db
+class TestCubeMaintenance:
+
+    @pytest.mark.parametrize("chunk_size", [0, 1])
+    def test_upload_adds_cells(self, user, settings, chunk_size):
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = chunk_size
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_CUBE))
+        process_file_upload(user, SimpleUploadedFile("b.csv", CSV_CUBE + b"\n"))
+        assert _cells() == {
+            (2021, 1, "A", "B", "DV360", "banner"): (4, Decimal("200")),
+            (2021, 2, "A", "C", "Meta", "video"): (2, Decimal("100")),
+            (2022, 3, "D", "E", "DV360", "banner"): (2, Decimal("3")),
+        }
+
+    def test_failed_upload_leaves_cube_untouched(self, user, csv_empty_dates):
+        process_file_upload(user, SimpleUploadedFile("bad.csv", csv_empty_dates))
+        assert _cells() == {}
+
+    def test_deleting_file_subtracts_cells(self, user, csv_valid_content):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_CUBE))
+        process_file_upload(user, SimpleUploadedFile("b.csv", csv_valid_content))
+        DataFile.objects.get(filename="a.csv").delete()
+        assert _cells() == {
+            (2021, 1, "Company A", "Brand X", "DV360", "banner"): (1, Decimal("1000")),
+            (2021, 1, "Company B", "Brand Y", "Facebook", "banner"): (1, Decimal("2000")),
+        }
+        DataFile.objects.all().delete()
+        assert _cells() == {}
+
+    def test_rebuild_command(self, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_CUBE))
+        expected = _cells()
+        CubeCell.objects.update(records_count=99)
+        DataRecord.objects.create(file=DataFile.objects.get(), year=2023, start_date="2023-05-01", impressions=7)
+
+        call_command("rebuild_aggregation_cube")
+        assert _cells() == {**expected, (2023, 5, "", "", "", ""): (1, Decimal("7"))}
+
+
+@pytest.mark.django_db
+class TestQueryCube:
+
+    @pytest.fixture(autouse=True)
+    def _data(self, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_CUBE))
+
+    def test_grand_total(self):
+        assert query_cube() == [{"records_count": 4, "total_impressions": Decimal("151.5")}]
+
+    def test_roll_up_and_drill_down(self):
+        assert query_cube(["year"]) == [
+            {"year": 2021, "records_count": 3, "total_impressions": Decimal("150")},
+            {"year": 2022, "records_count": 1, "total_impressions": Decimal("1.5")},
+        ]
+        # dimensions come back in drill-down order whatever order they were asked in
+        assert query_cube(["platform", "year"]) == [
+            {"year": 2021, "platform": "DV360", "records_count": 2, "total_impressions": Decimal("100")},
+            {"year": 2021, "platform": "Meta", "records_count": 1, "total_impressions": Decimal("50")},
+            {"year": 2022, "platform": "DV360", "records_count": 1, "total_impressions": Decimal("1.5")},
+        ]
+
+    def test_filters(self):
+        rows = query_cube(["brand"], {"advertiser": "A", "year": ["2021"]})
+        assert [(r["brand"], r["records_count"]) for r in rows] == [("B", 2), ("C", 1)]
+        assert query_cube(["year"], {"platform": ["Nope"]}) == []
+
+    def test_unknown_dimension(self):
+        with pytest.raises(ValueError):
+            query_cube(["impressions"])
+        with pytest.raises(ValueError):
+            query_cube(["year"], {"file": "1"})
+
+    def test_result_follows_data_version(self, user, django_capture_on_commit_callbacks):
+        assert query_cube()[0]["records_count"] == 4
+        with django_capture_on_commit_callbacks(execute=True):
+            process_file_upload(user, SimpleUploadedFile("b.csv", CSV_CUBE + b"\n"))
+        assert query_cube()[0]["records_count"] == 8
+
+    def test_dimension_values(self):
+        assert dimension_values("platform") == ["DV360", "Meta"]
+
+    def test_text_dimensions_stored_as_ids(self):
+        platforms = dict(Platform.objects.values_list("name", "id"))
+        assert set(CubeCell.objects.values_list("platform", flat=True)) == {platforms["DV360"], platforms["Meta"]}
+        # a known name no cell has, and an unknown one
+        Platform.objects.create(name="TikTok")
+        assert query_cube(["year"], {"platform": ["TikTok"]}) == []
+        assert dimension_values("platform") == ["DV360", "Meta"]
+
+
+@pytest.mark.django_db
+class TestCubeViews:
+
+    def test_query_endpoint(self, client, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_CUBE))
+        client.force_login(user)
+        response = client.get(reverse("data_processing:cube"), {"group_by": "year,platform", "platform": "DV360"})
+        assert response.status_code == 200
+        assert response.json() == {
+            "group_by": ["year", "platform"],
+            "rows": [
+                {"year": 2021, "platform": "DV360", "records_count": 2, "total_impressions": "100"},
+                {"year": 2022, "platform": "DV360", "records_count": 1, "total_impressions": "1.5"},
+            ],
+        }
+
+    def test_query_endpoint_rejects_unknown_dimension(self, client, user):
+        client.force_login(user)
+        response = client.get(reverse("data_processing:cube"), {"group_by": "password"})
+        assert response.status_code == 400
+
+    def test_query_endpoint_requires_login(self, client):
+        assert client.get(reverse("data_processing:cube")).status_code == 403
+
+    def test_stats_page_renders_pickers_and_cube(self, client, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_CUBE))
+        client.force_login(user)
+        response = client.get(reverse("data_processing:stats"), {"group_by": "advertiser", "year": "2021"})
+        cube = response.context["cube"]
+        assert cube["columns"] == [("advertiser", "Advertiser")]
+        assert [(r["values"], r["records_count"], r["total_impressions"]) for r in cube["rows"]] == [
+            (["A"], 3, Decimal("150")),
+        ]
+        years = next(d for d in cube["dimensions"] if d["name"] == "year")
+        assert years["values"] == ["2021", "2022"] and years["selected"] == ["2021"]
+        assert 'name="group_by" value="advertiser"' in response.content.decode()
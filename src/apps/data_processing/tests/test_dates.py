@@ -0,0 +1,71 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from apps.data_processing.services.dates import (
+    EXCEL_SERIAL_FORMAT,
+    _parse_date,
+    detect_date_format,
+    has_blank_values,
+    parse_date_column,
+)
+
+
+MIXED_VALUES = [
+    "04.01.21", "15.01.21", "04.01.2021", "15/01/2021", "01.15.2021", "2021-01-04",
+    "2021.01.04", "2021/1/4", "04-01-21", "04 Jan 2021", "January 04, 2021",
+    " 04.01.21 ", "04.01.70", "04.01.80", "31.02.21", "13.13.21", "04.01.21 10:00",
+    "44200", "44200.5", "2021", "20210104", "not-a-date", "-", "#N/A",
+    44200, 44200.6, 2.5, -3, 0, 500001,
+    datetime(2021, 1, 4, 12, 30), date(2021, 1, 5),
+]
+
+
+class TestParseDateColumn:
+    """Column engine must give exactly what _parse_date gives per value."""
+
+    def test_matches_per_value_parser(self):
+        values = np.array(MIXED_VALUES * 3, dtype=object)
+        expected = [_parse_date(v) for v in values]
+        assert list(parse_date_column(values)) == expected
+
+    @pytest.mark.parametrize("values", [
+        np.array([44200.0, 44201.4, np.nan, 1e9]),
+        np.array([44200, 44201, 7], dtype=np.int64),
+    ])
+    def test_numeric_arrays(self, values):
+        assert list(parse_date_column(values)) == [_parse_date(v) for v in values]
+
+    def test_missing_values_are_none(self):
+        values = np.array(["04.01.21", None, np.nan], dtype=object)
+        assert list(parse_date_column(values)) == [date(2021, 4, 1), None, None]
+
+
+class TestHasBlankValues:
+
+    def test_detects_nan_and_whitespace(self):
+        assert has_blank_values(np.array(["04.01.21", None], dtype=object))
+        assert has_blank_values(np.array(["04.01.21", "  "], dtype=object))
+
+    def test_filled_column(self):
+        assert not has_blank_values(np.array(["04.01.21", 44200], dtype=object))
+
+
+class TestDetectDateFormat:
+
+    def test_day_first_dotted(self):
+        values = np.array(["04.01.21", "15.01.21", "28.02.21"], dtype=object)
+        assert detect_date_format(values) == "%d.%m.%y"
+
+    def test_excel_serial(self):
+        assert detect_date_format(np.array([44200, 44201.0, "44202"], dtype=object)) == EXCEL_SERIAL_FORMAT
+
+    def test_no_dominant_format(self):
+        values = np.array(["04.01.21", "2021-01-04", "Jan 4 2021", "x"], dtype=object)
+        assert detect_date_format(values) is None
+
+    def test_detected_format_parses_column_with_cascade_fallback(self):
+        values = np.array(["04.01.21", "15.01.21", "2021-01-20", "bad"], dtype=object)
+        parsed = parse_date_column(values, "%d.%m.%y")
+        assert list(parsed) == [date(2021, 1, 4), date(2021, 1, 15), date(2021, 1, 20), None]
@@ -0,0 +1,142 @@
+import hashlib
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from apps.data_processing.models import DataFile, DataRecord, IngestJob, YearlyRollup
+from apps.data_processing.services.dedup import compute_content_hash
+from apps.data_processing.services.jobs import enqueue_file_upload, run_job
+from apps.data_processing.services.upload import process_file_upload
+
+
+@pytest.fixture
+def other_user(django_user_model):
+    return django_user_model.objects.create_user(username="other", password="x")
+
+
+def _upload(user, content, name="a.csv", **kwargs):
+    return process_file_upload(user, SimpleUploadedFile(name, content), **kwargs)
+
+
+@pytest.mark.django_db
+class TestContentHashDedup:
+
+    def test_hash_is_stored(self, user, csv_valid_content):
+        _upload(user, csv_valid_content)
+        assert DataFile.objects.get().content_hash == hashlib.sha256(csv_valid_content).hexdigest()
+
+    def test_streamed_hash_rewinds_file(self, csv_valid_content):
+        uploaded = SimpleUploadedFile("a.csv", csv_valid_content)
+        uploaded.read(10)
+        assert compute_content_hash(uploaded) == hashlib.sha256(csv_valid_content).hexdigest()
+        assert uploaded.read() == csv_valid_content
+
+    def test_identical_reupload_is_skipped(self, user, csv_valid_content, django_assert_max_num_queries):
+        _upload(user, csv_valid_content)
+        with django_assert_max_num_queries(1):
+            success, msg, is_error = _upload(user, csv_valid_content, name="copy.csv")
+        assert (success, is_error) == (True, False)
+        assert "a.csv" in msg and "пропущено" in msg
+        assert DataFile.objects.count() == 1
+        assert DataRecord.objects.count() == 2
+        assert YearlyRollup.objects.get(year=2021).records_count == 2
+
+    def test_same_content_of_another_user_is_ingested(self, user, other_user, csv_valid_content):
+        _upload(user, csv_valid_content)
+        success, msg, is_error = _upload(other_user, csv_valid_content, name="copy.csv")
+        assert (success, is_error) == (True, False)
+        assert "пропущено" not in msg
+        assert sorted(DataFile.objects.values_list("user__username", "status")) == [
+            (other_user.username, "success"), (user.username, "success"),
+        ]
+        assert YearlyRollup.objects.get(year=2021).records_count == 4
+
+    def test_replace_keeps_same_content_of_another_user(self, user, other_user, csv_valid_content):
+        _upload(user, csv_valid_content)
+        _upload(other_user, csv_valid_content, name="copy.csv", replace=True)
+        assert sorted(DataFile.objects.values_list("user__username", "filename")) == [
+            (other_user.username, "copy.csv"), (user.username, "a.csv"),
+        ]
+        assert DataRecord.objects.count() == 4
+
+    def test_failed_upload_does_not_block_retry(self, user, csv_empty_dates):
+        _upload(user, csv_empty_dates)
+        _upload(user, csv_empty_dates)
+        assert DataFile.objects.filter(status="error").count() == 2
+
+    def test_replace_swaps_records_of_same_content(self, user, csv_valid_content):
+        _upload(user, csv_valid_content)
+        first = DataFile.objects.get()
+        success, msg, _ = _upload(user, csv_valid_content, name="again.csv", replace=True)
+        assert success and "a.csv" in msg
+        assert not DataFile.objects.filter(pk=first.pk).exists()
+        assert DataRecord.objects.count() == 2
+        assert set(DataRecord.objects.values_list("file__filename", flat=True)) == {"again.csv"}
+        assert YearlyRollup.objects.get(year=2021).records_count == 2
+
+    def test_replace_swaps_earlier_version_with_same_name(self, user, other_user, csv_valid_content):
+        _upload(user, csv_valid_content, name="export.csv")
+        _upload(other_user, csv_valid_content + b"\n", name="export.csv")
+        updated = csv_valid_content + b"\nCompany C,Brand Z,16.01.22,20.01.22,banner,DV360,5"
+        _upload(user, updated, name="export.csv", replace=True)
+        # only the user's own export.csv is replaced
+        assert sorted(DataFile.objects.values_list("user__username", "rows_processed")) == [
+            (other_user.username, 2), (user.username, 3),
+        ]
+        assert {r.year: r.records_count for r in YearlyRollup.objects.all()} == {2021: 4, 2022: 1}
+
+    def test_failed_replacement_keeps_earlier_upload(self, user, csv_valid_content, csv_empty_dates):
+        _upload(user, csv_valid_content, name="export.csv")
+        _upload(user, csv_empty_dates, name="export.csv", replace=True)
+        assert DataFile.objects.filter(status="success").count() == 1
+        assert DataRecord.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestQueuedDedup:
+
+    def test_duplicate_is_not_stored_or_queued(self, user, other_user, csv_valid_content):
+        _upload(user, csv_valid_content)
+        success, msg, is_error = enqueue_file_upload(user, SimpleUploadedFile("b.csv", csv_valid_content))
+        assert (success, is_error) == (True, False) and "a.csv" in msg
+        assert not IngestJob.objects.exists()
+        enqueue_file_upload(other_user, SimpleUploadedFile("b.csv", csv_valid_content))
+        assert IngestJob.objects.get().data_file.user == other_user
+
+    def test_copy_still_processing_does_not_block_reupload(self, user, csv_valid_content):
+        enqueue_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        first_job = IngestJob.objects.get()
+        enqueue_file_upload(user, SimpleUploadedFile("b.csv", csv_valid_content))
+        assert IngestJob.objects.count() == 2
+
+        # the first copy fails for good: the data still loads from the second one
+        first_job.data_file.stored_file.delete()
+        first_job.attempts = first_job.max_attempts
+        first_job.save()
+        assert not run_job(first_job.id)
+        second_job = IngestJob.objects.exclude(pk=first_job.pk).get()
+        second_job.attempts = 1
+        second_job.save()
+        assert run_job(second_job.id)
+        assert sorted(DataFile.objects.values_list("filename", "status")) == [("a.csv", "error"), ("b.csv", "success")]
+        assert DataRecord.objects.count() == 2
+
+    def test_queued_replace(self, user, csv_valid_content):
+        _upload(user, csv_valid_content)
+        enqueue_file_upload(user, SimpleUploadedFile("b.csv", csv_valid_content), replace=True)
+        job = IngestJob.objects.get()
+        assert job.replace
+        job.attempts = 1
+        job.save()
+        assert run_job(job.id)
+        assert list(DataFile.objects.values_list("filename", flat=True)) == ["b.csv"]
+
+    def test_upload_view_passes_replace(self, client, user, csv_valid_content, settings):
+        settings.DATA_PROCESSING_BACKGROUND_UPLOADS = False
+        client.force_login(user)
+        url = reverse("data_processing:upload")
+        client.post(url, {"file": SimpleUploadedFile("a.csv", csv_valid_content)})
+        client.post(url, {"file": SimpleUploadedFile("b.csv", csv_valid_content), "replace": "on"})
+        assert list(DataFile.objects.values_list("filename", flat=True)) == ["b.csv"]
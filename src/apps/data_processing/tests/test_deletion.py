@@ -0,0 +1,131 @@
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.data_processing.models import CubeCell, DataFile, DataRecord, FileYearTotal, IngestJob, ProratedDay, YearlyRollup
+from apps.data_processing.services.cube import rebuild_cube
+from apps.data_processing.services.deletion import delete_data_file, delete_file_records
+from apps.data_processing.services.proration import rebuild_prorated_days
+from apps.data_processing.services.rollup import rebuild_yearly_rollup
+from apps.data_processing.services.upload import process_file_upload
+
+HEADER = b"Advertis,Brand,Start,End,Format,Platforr,Impr\n"
+
+
+def _csv(rows, advertiser=b"A"):
+    lines = [advertiser + b",B,%02d.01.21,%02d.02.22,banner,DV360,%d" % (i % 28 + 1, i % 28 + 1, i) for i in range(rows)]
+    return HEADER + b"\n".join(lines)
+
+
+def _upload(user, name, content):
+    process_file_upload(user, SimpleUploadedFile(name, content))
+    return DataFile.objects.get(filename=name)
+
+
+def _derived_state():
+    return (
+        sorted(YearlyRollup.objects.values_list("year", "records_count", "total_impressions")),
+        sorted(FileYearTotal.objects.values_list("file_id", "year", "records_count", "total_impressions")),
+        sorted(CubeCell.objects.values_list("year", "month", "advertiser", "records_count", "total_impressions")),
+        sorted(ProratedDay.objects.values_list("day", "impressions")),
+    )
+
+
+@pytest.fixture
+def admin_user(django_user_model):
+    return django_user_model.objects.create_superuser(username="admin", password="x", email="admin@example.com")
+
+
+@pytest.mark.django_db
+class TestDeleteDataFile:
+
+    def test_deletes_records_in_chunks(self, user):
+        data_file = _upload(user, "a.csv", _csv(7))
+        with CaptureQueriesContext(connection) as queries:
+            assert delete_file_records(data_file, chunk_size=3) == 7
+        assert len([q for q in queries if q["sql"].startswith("DELETE")]) == 3
+        assert not DataRecord.objects.exists()
+
+    def test_rollups_adjusted_like_full_rebuild(self, user):
+        kept = _upload(user, "a.csv", _csv(5))
+        deleted = _upload(user, "b.csv", _csv(9, advertiser=b"C"))
+
+        assert delete_data_file(deleted, chunk_size=4) == 9
+        assert list(DataFile.objects.all()) == [kept]
+        assert DataRecord.objects.count() == 5
+        adjusted = _derived_state()
+
+        rebuild_yearly_rollup()
+        rebuild_cube()
+        rebuild_prorated_days()
+        assert _derived_state() == adjusted
+
+    def test_query_count_does_not_grow_with_records(self, user):
+        small = _upload(user, "a.csv", _csv(3))
+        large = _upload(user, "b.csv", _csv(60, advertiser=b"C"))
+        with CaptureQueriesContext(connection) as small_queries:
+            delete_data_file(small, chunk_size=1000)
+        with CaptureQueriesContext(connection) as large_queries:
+            delete_data_file(large, chunk_size=1000)
+        assert len(large_queries) == len(small_queries)
+        assert not ProratedDay.objects.exists() and not CubeCell.objects.exists()
+
+    def test_stored_upload_removed_after_commit(self, user, media_root, django_capture_on_commit_callbacks):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+
+        data_file = _upload(user, "a.csv", _csv(3))
+        data_file.stored_file = default_storage.save("uploads/a.csv", ContentFile(_csv(3)))
+        data_file.save()
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            delete_data_file(data_file)
+        assert default_storage.exists("uploads/a.csv")
+        for callback in callbacks:
+            callback()
+        assert list(media_root.rglob("*.csv")) == []
+
+
+@pytest.mark.django_db
+class TestDataFileAdminDeletion:
+
+    def test_confirmation_is_summarized(self, client, user, admin_user):
+        data_file = _upload(user, "a.csv", _csv(30))
+        client.force_login(admin_user)
+        response = client.get(reverse("admin:data_processing_datafile_delete", args=[data_file.pk]))
+        assert response.status_code == 200
+        assert "записів: 30" in response.content.decode()
+        assert "Data record " not in response.content.decode()  # no per-record lines
+        assert dict(response.context["model_count"])["Data records"] == 30
+
+    def test_delete_view(self, client, user, admin_user):
+        data_file = _upload(user, "a.csv", _csv(30))
+        client.force_login(admin_user)
+        client.post(reverse("admin:data_processing_datafile_delete", args=[data_file.pk]), {"post": "yes"})
+        assert not DataFile.objects.exists() and not DataRecord.objects.exists()
+        assert not YearlyRollup.objects.exists()
+
+    def test_delete_selected_action(self, client, user, admin_user):
+        files = [_upload(user, "a.csv", _csv(4)), _upload(user, "b.csv", _csv(6, advertiser=b"C"))]
+        kept = _upload(user, "c.csv", _csv(2, advertiser=b"E"))
+        client.force_login(admin_user)
+        url = reverse("admin:data_processing_datafile_changelist")
+        data = {"action": "delete_selected", "_selected_action": [f.pk for f in files]}
+
+        response = client.post(url, data)
+        assert dict(response.context["model_count"])["Data records"] == 10
+
+        client.post(url, {**data, "post": "yes"})
+        assert list(DataFile.objects.all()) == [kept]
+        assert YearlyRollup.objects.get().records_count == 2
+
+    def test_file_being_processed_is_protected(self, client, user, admin_user):
+        data_file = _upload(user, "a.csv", _csv(3))
+        IngestJob.objects.create(data_file=data_file, status="running")
+        client.force_login(admin_user)
+        url = reverse("admin:data_processing_datafile_delete", args=[data_file.pk])
+        assert client.get(url).context["protected"]
+        client.post(url, {"post": "yes"})
+        assert DataRecord.objects.count() == 3
@@ -0,0 +1,146 @@
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from apps.data_processing.forms import DataFileUploadForm
+from apps.data_processing.models import CubeCell, DataFile, DataRecord, FileYearTotal, IngestJob, ProratedDay, YearlyRollup
+from apps.data_processing.services.cube import rebuild_cube
+from apps.data_processing.services.jobs import enqueue_file_upload, run_job
+from apps.data_processing.services.proration import rebuild_prorated_days
+from apps.data_processing.services.rollup import rebuild_yearly_rollup
+from apps.data_processing.services.upload import process_file_upload
+
+HEADER = b"Advertis,Brand,Start,End,Format,Platforr,Impr\n"
+V1 = HEADER + b"""A,B,04.01.21,10.01.21,banner,DV360,100
+A,B,04.01.21,10.01.21,banner,DV360,100
+C,D,14.02.21,20.02.21,video,Meta,50
+E,F,29.12.21,07.01.22,banner,DV360,1000
+G,H,14.03.22,16.03.22,banner,DV360,7"""
+# unchanged, changed repeat, unchanged, changed, G removed, I added
+V2 = HEADER + b"""A,B,04.01.21,10.01.21,banner,DV360,100
+A,B,04.01.21,10.01.21,banner,DV360,150
+C,D,14.02.21,20.02.21,video,Meta,50
+E,F,29.12.21,07.01.22,banner,DV360,999
+I,J,01.06.22,30.06.22,video,Meta,30"""
+
+
+def _upload(user, content, **kwargs):
+    return process_file_upload(user, SimpleUploadedFile("campaign.csv", content), **kwargs)
+
+
+def _derived_state():
+    return (
+        sorted(YearlyRollup.objects.values_list("year", "records_count", "total_impressions")),
+        sorted(FileYearTotal.objects.values_list("file_id", "year", "records_count", "total_impressions")),
+        sorted(CubeCell.objects.values_list(
+            "year", "month", "advertiser", "brand", "platform", "format_type", "records_count", "total_impressions",
+        )),
+        sorted(ProratedDay.objects.values_list("day", "impressions")),
+    )
+
+
+def _records():
+    return sorted(DataRecord.objects.values_list("advertiser__name", "impressions"))
+
+
+@pytest.mark.django_db
+class TestDeltaIngest:
+
+    def test_rows_get_stable_keys(self, user):
+        _upload(user, V1)
+        keys = list(DataRecord.objects.order_by("id").values_list("row_key", flat=True))
+        assert all(len(key) == 32 for key in keys)
+        assert len(set(keys)) == 5  # repeated rows get distinct keys
+
+    @pytest.mark.parametrize("chunk_size", [0, 2])
+    def test_applies_only_changes(self, user, settings, chunk_size):
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = chunk_size
+        _upload(user, V1)
+        unchanged_ids = set(DataRecord.objects.filter(advertiser__name__in=["A", "C"], impressions__lt=150)
+                            .values_list("id", flat=True))
+
+        success, msg, _ = _upload(user, V2, delta=True)
+
+        assert success
+        assert "додано 1, змінено 2, видалено 1, без змін 2" in msg
+        new_file = DataFile.objects.get()
+        assert new_file.rows_processed == 5
+        assert set(new_file.records.values_list("id", flat=True)) >= unchanged_ids
+        assert _records() == [("A", 100), ("A", 150), ("C", 50), ("E", 999), ("I", 30)]
+
+    @pytest.mark.parametrize("chunk_size", [0, 2])
+    def test_rollups_adjusted_like_full_rebuild(self, user, settings, chunk_size):
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = chunk_size
+        _upload(user, V1)
+        _upload(user, V2, delta=True)
+        adjusted = _derived_state()
+
+        rebuild_yearly_rollup()
+        rebuild_cube()
+        rebuild_prorated_days()
+        assert _derived_state() == adjusted
+
+    def test_matches_fresh_ingest(self, user):
+        _upload(user, V1)
+        _upload(user, V2, delta=True)
+        delta_records, delta_state = _records(), _derived_state()[0]
+
+        DataFile.objects.all().delete()
+        _upload(user, V2)
+        assert (_records(), _derived_state()[0]) == (delta_records, delta_state)
+
+    def test_without_previous_version_ingests_normally(self, user):
+        success, msg, _ = _upload(user, V1, delta=True)
+        assert success and "Порівняно" not in msg
+        assert DataRecord.objects.count() == 5
+
+    def test_other_users_file_is_not_a_base(self, user, django_user_model):
+        other = django_user_model.objects.create_user(username="other", password="x")
+        _upload(other, V1)
+        _upload(user, V2, delta=True)
+        assert DataFile.objects.count() == 2
+        assert DataRecord.objects.count() == 10
+
+    def test_failed_delta_keeps_previous_version(self, user, settings):
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = 2
+        _upload(user, V1)
+        state = _records(), _derived_state()
+        success, _, is_error = _upload(user, V2 + b"\nK,L,,01.07.22,video,Meta,1", delta=True)
+        assert (success, is_error) == (False, True)
+        assert DataFile.objects.filter(status="success").count() == 1
+        assert (_records(), _derived_state()) == state
+
+    def test_legacy_records_without_keys(self, user):
+        _upload(user, V1)
+        DataRecord.objects.update(row_key="")
+        _upload(user, V2, delta=True)
+        assert _records() == [("A", 100), ("A", 150), ("C", 50), ("E", 999), ("I", 30)]
+
+    def test_queued_delta(self, user):
+        _upload(user, V1)
+        enqueue_file_upload(user, SimpleUploadedFile("campaign.csv", V2), delta=True)
+        job = IngestJob.objects.get()
+        assert job.delta
+        job.attempts = 1
+        job.save()
+        assert run_job(job.id)
+        assert DataFile.objects.get().pk == job.data_file_id
+        assert _records() == [("A", 100), ("A", 150), ("C", 50), ("E", 999), ("I", 30)]
+
+    def test_stored_copy_of_previous_version_removed(self, user, media_root, django_capture_on_commit_callbacks):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+
+        _upload(user, V1)
+        DataFile.objects.update(stored_file=default_storage.save("uploads/campaign.csv", ContentFile(V1)))
+        with django_capture_on_commit_callbacks(execute=True):
+            _upload(user, V2, delta=True)
+        assert DataFile.objects.count() == 1
+        assert list(media_root.rglob("*.csv")) == []
+
+    def test_form_rejects_replace_with_delta(self):
+        form = DataFileUploadForm(
+            {"replace": "on", "delta": "on"}, {"file": SimpleUploadedFile("a.csv", V1)}
+        )
+        assert not form.is_valid()
+        assert form.non_field_errors()
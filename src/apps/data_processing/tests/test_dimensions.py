@@ -0,0 +1,59 @@
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+
+from apps.data_processing.models import Advertiser, DataRecord, Platform
+from apps.data_processing.services.dimensions import DimensionEncoder, cache, decode_dimensions, dimension_ids
+from apps.data_processing.services.upload import process_file_upload
+
+CSV = b"""Advertis,Brand,Start,End,Format,Platforr,Impr
+Nike,Air Max,04.01.21,10.01.21,banner,DV360,100
+Nike,Jordan,14.02.21,20.02.21,video,DV360,50
+Puma,,29.12.21,07.01.22,banner,Meta,1000"""
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDimensionIds:
+
+    def test_values_are_created_once_and_cached_after_commit(self):
+        with transaction.atomic():
+            ids = dimension_ids("advertiser", ["Nike", "Puma", "", None])
+            assert cache.ids["advertiser"] == {}
+        assert set(ids) == {"Nike", "Puma"}
+        assert cache.ids["advertiser"] == ids
+        assert dimension_ids("advertiser", ["Nike", "Adidas"])["Nike"] == ids["Nike"]
+        assert Advertiser.objects.count() == 3
+
+    def test_rolled_back_values_stay_out_of_cache(self):
+        with pytest.raises(RuntimeError), transaction.atomic():
+            dimension_ids("platform", ["Meta"])
+            raise RuntimeError
+        assert cache.ids["platform"] == {}
+        assert not Platform.objects.exists()
+
+    def test_lookup_without_create(self):
+        Advertiser.objects.create(name="Nike")
+        assert list(dimension_ids("advertiser", ["Nike", "Puma"], create=False)) == ["Nike"]
+        assert not Advertiser.objects.filter(name="Puma").exists()
+
+
+@pytest.mark.django_db
+class TestEncoding:
+
+    def test_encoder_and_decode(self):
+        encoder = DimensionEncoder()
+        rows = [{"advertiser": "Nike", "brand": "", "format_type": "banner", "platform": "Meta"}]
+        ids = encoder.encode(rows)
+        assert set(ids["advertiser"]) == {"Nike"} and ids["brand"] == {}
+        decoded = decode_dimensions([{"advertiser": ids["advertiser"]["Nike"], "brand": None}], ["advertiser", "brand"])
+        assert decoded == [{"advertiser": "Nike", "brand": ""}]
+
+    def test_records_store_integer_ids(self, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV))
+        assert Advertiser.objects.count() == 2
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT DISTINCT advertiser_id FROM {DataRecord._meta.db_table} ORDER BY 1")
+            stored = [row[0] for row in cursor.fetchall()]
+        assert stored == sorted(Advertiser.objects.values_list("id", flat=True))
+        assert DataRecord.objects.filter(brand__isnull=True).count() == 1
@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError
+from django.utils import timezone
+
+from apps.data_processing.models import DataFile, DataRecord, IngestJob
+from apps.data_processing.services import jobs
+from apps.data_processing.services.jobs import claim_next_job, enqueue_file_upload, recover_stale_jobs, run_job
+
+
+@pytest.mark.django_db
+class TestIngestJobs:
+
+    def test_enqueue_stores_file_and_queues_job(self, user, csv_valid_content):
+        success, msg, is_error = enqueue_file_upload(user, SimpleUploadedFile("queued.csv", csv_valid_content))
+        assert success is True
+        assert is_error is False
+
+        data_file = DataFile.objects.get(filename="queued.csv")
+        assert data_file.status == "processing"
+        assert data_file.stored_file.read() == csv_valid_content
+        assert data_file.ingest_job.status == "queued"
+        assert data_file.records.count() == 0
+
+    def test_enqueue_when_database_locked(self, user, csv_valid_content, monkeypatch, media_root):
+        def locked(**kwargs):
+            raise OperationalError("database is locked")
+
+        monkeypatch.setattr(IngestJob.objects, "create", locked)
+        success, msg, is_error = enqueue_file_upload(user, SimpleUploadedFile("queued.csv", csv_valid_content))
+        assert (success, is_error) == (False, True)
+        assert "ще раз" in msg
+        assert not DataFile.objects.exists()
+        assert list(media_root.rglob("*.csv")) == []
+
+    def test_claim_and_run(self, user, csv_valid_content, media_root, django_capture_on_commit_callbacks):
+        enqueue_file_upload(user, SimpleUploadedFile("queued.csv", csv_valid_content))
+        job = claim_next_job("test-worker")
+        assert job.status == "running"
+        assert job.attempts == 1
+        assert claim_next_job("other-worker") is None
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert run_job(job.id) is True
+        job.refresh_from_db()
+        assert job.status == "done"
+        data_file = job.data_file
+        data_file.refresh_from_db()
+        assert data_file.status == "success"
+        assert data_file.rows_processed == 2
+        assert not data_file.stored_file
+        assert list(media_root.rglob("*.csv")) == []
+
+    def test_validation_error_is_not_retried(self, user, csv_empty_dates):
+        enqueue_file_upload(user, SimpleUploadedFile("bad.csv", csv_empty_dates))
+        job = claim_next_job("test-worker")
+        assert run_job(job.id) is False
+        job.refresh_from_db()
+        assert job.status == "done"
+        assert DataFile.objects.get(filename="bad.csv").error_type == "empty_dates"
+
+    def test_exception_retried_then_failed(
+        self, user, csv_valid_content, monkeypatch, settings, media_root, django_capture_on_commit_callbacks
+    ):
+        settings.DATA_PROCESSING_JOB_RETRY_DELAY = 0
+
+        def boom(data_file, fileobj, **kwargs):
+            DataRecord.objects.create(file=data_file, year=2021)
+            raise RuntimeError("disk on fire")
+
+        monkeypatch.setattr(jobs, "ingest_data_file", boom)
+        enqueue_file_upload(user, SimpleUploadedFile("flaky.csv", csv_valid_content))
+        job = IngestJob.objects.get()
+        job.max_attempts = 2
+        job.save()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            run_job(claim_next_job("w").id)
+        job.refresh_from_db()
+        assert job.status == "queued"
+        assert "disk on fire" in job.last_error
+        assert len(list(media_root.rglob("*.csv"))) == 1  # kept for the retry
+
+        with django_capture_on_commit_callbacks(execute=True):
+            run_job(claim_next_job("w").id)
+        job.refresh_from_db()
+        assert job.status == "failed"
+        data_file = DataFile.objects.get(filename="flaky.csv")
+        assert data_file.status == "error"
+        assert data_file.error_type == "other"
+        assert data_file.records.count() == 1  # only the second attempt's leftovers
+        assert not data_file.stored_file
+        assert list(media_root.rglob("*.csv")) == []
+
+    def test_stale_running_job_requeued(self, user, csv_valid_content):
+        enqueue_file_upload(user, SimpleUploadedFile("stuck.csv", csv_valid_content))
+        job = claim_next_job("dead-worker")
+        IngestJob.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        assert recover_stale_jobs(stale_after=60) == 1
+        job.refresh_from_db()
+        assert job.status == "queued"
+        assert "dead-worker" in job.last_error
+
+    def test_inline_worker_sends_heartbeat_while_job_runs(self, user, csv_valid_content, monkeypatch):
+        import threading
+
+        from apps.data_processing.management.commands import process_ingest_jobs
+
+        enqueue_file_upload(user, SimpleUploadedFile("long.csv", csv_valid_content))
+        job_id = IngestJob.objects.get().id
+        beats = []
+        beaten = threading.Event()
+
+        def heartbeat(job_ids):
+            beats.append(list(job_ids))
+            if job_ids:
+                beaten.set()
+
+        def run_job(job_id):
+            assert beaten.wait(5)
+            return True
+
+        monkeypatch.setattr(process_ingest_jobs, "heartbeat", heartbeat)
+        monkeypatch.setattr(process_ingest_jobs, "run_job", run_job)
+        call_command("process_ingest_jobs", "--once", "--concurrency", "0", "--poll-interval", "0.01")
+        assert [job_id] in beats
+
+    def test_worker_command_drains_queue_inline(self, user, csv_valid_content, csv_start_gt_end):
+        enqueue_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        enqueue_file_upload(user, SimpleUploadedFile("b.csv", csv_start_gt_end))
+        call_command("process_ingest_jobs", "--once", "--concurrency", "0")
+
+        assert set(IngestJob.objects.values_list("status", flat=True)) == {"done"}
+        assert DataRecord.objects.count() == 3
@@ -0,0 +1,103 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+
+from apps.data_processing.models import Advertiser, DataFile, DataRecord
+from apps.data_processing.services import loader as loader_module
+from apps.data_processing.services.loader import RecordLoader, resolve_strategy
+from apps.data_processing.services.upload import process_file_upload
+
+
+def _row(year=2021, impressions=Decimal("10"), advertiser="A"):
+    return {
+        "year": year,
+        "advertiser": advertiser,
+        "brand": None,
+        "start_date": date(year if year > 0 else 2021, 1, 4),
+        "end_date": date(year if year > 0 else 2021, 1, 10),
+        "format_type": "banner",
+        "platform": "",
+        "impressions": impressions,
+    }
+
+
+RECORD_VALUES = (
+    "year", "advertiser__name", "brand__name", "start_date", "end_date", "format_type__name", "platform__name",
+    "impressions",
+)
+
+
+@pytest.mark.django_db
+class TestRecordLoader:
+
+    @pytest.mark.parametrize("strategy", ["orm", "executemany"])
+    def test_strategies_store_same_values(self, user, strategy):
+        data_file = DataFile.objects.create(user=user, filename="a.csv")
+        rows = [_row(), _row(2022, None, ""), _row(2023, Decimal("1234567.5"))]
+        loader = RecordLoader(data_file, batch_size=2, strategy=strategy)
+        with transaction.atomic():
+            assert loader.load(rows) == 3
+
+        stored = list(DataRecord.objects.filter(file=data_file).order_by("year").values_list(*RECORD_VALUES))
+        assert stored == [
+            (2021, "A", None, date(2021, 1, 4), date(2021, 1, 10), "banner", None, Decimal("10")),
+            (2022, None, None, date(2022, 1, 4), date(2022, 1, 10), "banner", None, None),
+            (2023, "A", None, date(2023, 1, 4), date(2023, 1, 10), "banner", None, Decimal("1234567.5")),
+        ]
+        assert list(Advertiser.objects.values_list("name", flat=True)) == ["A"]
+        assert loader.rows_loaded == 3
+        assert loader.rows_per_second > 0
+
+    @pytest.mark.parametrize("strategy", ["orm", "executemany"])
+    def test_failed_batch_rolled_back_to_savepoint(self, user, strategy):
+        data_file = DataFile.objects.create(user=user, filename="a.csv")
+        loader = RecordLoader(data_file, batch_size=2, strategy=strategy)
+        with transaction.atomic():
+            with pytest.raises(IntegrityError):
+                loader.load([_row(), _row(), _row(), _row(year=-1)])
+            assert DataRecord.objects.filter(file=data_file).count() == 2
+        assert loader.rows_loaded == 2
+
+    def test_auto_strategy_on_sqlite(self, settings):
+        settings.DATA_PROCESSING_BULK_LOAD_STRATEGY = "auto"
+        assert resolve_strategy() == "executemany"
+        with pytest.raises(ValueError):
+            resolve_strategy("copy")
+
+
+@pytest.mark.django_db
+class TestIngestTransaction:
+
+    @pytest.mark.parametrize("chunk_size", [0, 1])
+    def test_database_error_fails_file_without_partial_records(
+        self, user, csv_valid_content, monkeypatch, settings, chunk_size
+    ):
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = chunk_size
+        settings.DATA_PROCESSING_BULK_BATCH_SIZE = 1
+        original_load = RecordLoader.load
+
+        def load_then_fail(self, rows):
+            original_load(self, rows)
+            original_load(self, [_row(year=-1)])
+
+        monkeypatch.setattr(loader_module.RecordLoader, "load", load_then_fail)
+        success, msg, is_error = process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        assert is_error is True
+        data_file = DataFile.objects.get()
+        assert data_file.status == "error"
+        assert data_file.error_type == "other"
+        assert DataRecord.objects.count() == 0
+
+    def test_unexpected_error_does_not_leave_processing(self, user, csv_valid_content, monkeypatch):
+        def boom(self, rows):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(loader_module.RecordLoader, "load", boom)
+        with pytest.raises(RuntimeError):
+            process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        assert DataFile.objects.get().status == "error"
+        assert DataRecord.objects.count() == 0
@@ -0,0 +1,130 @@
+import json
+import os
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from apps.data_processing import metrics
+from apps.data_processing.services.upload import process_file_upload
+
+URL = reverse("metrics")
+
+
+def _samples(text):
+    """{'name{labels}': value} of the exposition text."""
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if line and not line.startswith("#"))
+
+
+class TestRegistry:
+
+    def test_counter_and_histogram_exposition(self):
+        metrics.rows_skipped_total.inc(3, reason="start_gt_end")
+        metrics.rows_skipped_total.inc(reason="start_gt_end")
+        metrics.parse_seconds.observe(0.3)
+        metrics.parse_seconds.observe(700)
+        samples = _samples(metrics.render_metrics())
+        assert samples['data_processing_rows_skipped_total{reason="start_gt_end"}'] == "4"
+        assert samples['data_processing_parse_seconds_bucket{le="0.25"}'] == "0"
+        assert samples['data_processing_parse_seconds_bucket{le="0.5"}'] == "1"
+        assert samples['data_processing_parse_seconds_bucket{le="600"}'] == "1"
+        assert samples['data_processing_parse_seconds_bucket{le="+Inf"}'] == "2"
+        assert samples["data_processing_parse_seconds_count"] == "2"
+        assert samples["data_processing_parse_seconds_sum"] == "700.3"
+
+    def test_wrong_labels(self):
+        with pytest.raises(ValueError):
+            metrics.rows_skipped_total.inc(platform="x")
+
+    def test_sums_files_of_other_processes(self, settings):
+        metrics.uploads_total.inc(status="success", error_type="")
+        other = {
+            "data_processing_uploads_total": [[["success", ""], 2], [["error", "empty_dates"], 1]],
+            "data_processing_insert_seconds": [[[], [1] + [0] * 12 + [0.1]]],
+            "removed_metric": [[[], 5]],
+            "data_processing_stats_cache_requests_total": [[["hit"], 7]],  # before the cache label
+        }
+        os.makedirs(settings.DATA_PROCESSING_METRICS_DIR)
+        with open(os.path.join(settings.DATA_PROCESSING_METRICS_DIR, "1-1.json"), "w") as f:
+            json.dump(other, f)
+        samples = _samples(metrics.render_metrics())
+        assert samples['data_processing_uploads_total{status="success",error_type=""}'] == "3"
+        assert samples['data_processing_uploads_total{status="error",error_type="empty_dates"}'] == "1"
+        assert samples["data_processing_insert_seconds_count"] == "1"
+        assert not any(name.startswith("data_processing_stats_cache_requests_total") for name in samples)
+
+    def test_files_of_exited_processes_archived(self, settings, monkeypatch):
+        directory = metrics.Path(settings.DATA_PROCESSING_METRICS_DIR)
+        directory.mkdir()
+        monkeypatch.setattr(metrics, "_HOST", "web-1")
+        files = (("web-1-11-1.json", 1), ("web-1-11-2.json", 2), ("web-1-12-1.json", 4), ("worker-1-13-1.json", 8))
+        for name, count in files:
+            (directory / name).write_text(json.dumps({"data_processing_rows_ingested_total": [[[], count]]}))
+        monkeypatch.setattr(metrics, "_is_running", lambda pid: pid == 11)
+        metrics.rows_ingested_total.inc(16)
+
+        for _ in range(2):
+            samples = _samples(metrics.render_metrics())
+            assert samples["data_processing_rows_ingested_total"] == "31"
+        # web-1-11-1.json: an earlier process with the pid that web-1-11-2.json reuses;
+        # worker-1-13-1.json: a process of another host, its pid is not checked here
+        assert {path.name for path in directory.glob("*.json")} == {
+            "web-1-11-2.json", "worker-1-13-1.json", metrics.ARCHIVE_NAME, metrics.REGISTRY.path.name,
+        }
+        assert metrics.REGISTRY.path.name.startswith("web-1-")
+        assert json.loads((directory / metrics.ARCHIVE_NAME).read_text()) == {
+            "data_processing_rows_ingested_total": [[[], 5]],
+        }
+
+    def test_flush_is_throttled(self, settings):
+        settings.DATA_PROCESSING_METRICS_FLUSH_INTERVAL = 60
+        metrics.rows_ingested_total.inc()
+        metrics.flush_metrics()
+        metrics.rows_ingested_total.inc()
+        metrics.flush_metrics()
+        assert json.loads(metrics.REGISTRY.path.read_text())["data_processing_rows_ingested_total"] == [[[], 1]]
+        metrics.flush_metrics(force=True)
+        assert json.loads(metrics.REGISTRY.path.read_text())["data_processing_rows_ingested_total"] == [[[], 2]]
+
+
+@pytest.mark.django_db
+class TestMetricsView:
+
+    def test_ingest_and_request_metrics(self, client, user, csv_start_gt_end, csv_empty_dates):
+        process_file_upload(user, SimpleUploadedFile("a.csv", csv_start_gt_end))
+        process_file_upload(user, SimpleUploadedFile("b.csv", csv_empty_dates))
+        client.force_login(user)
+        client.get(reverse("data_processing:stats"))
+        client.get(reverse("data_processing:stats"))
+
+        response = client.get(URL)
+        assert response["Content-Type"] == metrics.CONTENT_TYPE
+        samples = _samples(response.content.decode())
+        assert samples['data_processing_uploads_total{status="success",error_type=""}'] == "1"
+        assert samples['data_processing_uploads_total{status="error",error_type="empty_dates"}'] == "1"
+        assert samples["data_processing_rows_ingested_total"] == "1"
+        assert samples['data_processing_rows_skipped_total{reason="start_gt_end"}'] == "1"
+        assert samples["data_processing_parse_seconds_count"] == "2"
+        assert samples["data_processing_insert_seconds_count"] == "1"
+        assert samples['http_request_duration_seconds_count{view="data_processing:stats"}'] == "2"
+        assert int(samples['http_request_db_queries_sum{view="data_processing:stats"}']) > 0
+        assert int(samples['data_processing_stats_cache_requests_total{cache="stats",result="hit"}']) > 0
+        assert int(samples['data_processing_stats_cache_requests_total{cache="cube",result="miss"}']) > 0
+
+    def test_request_queries_counted_by_query_log_recorder(self, client, monkeypatch):
+        from django.db import connection
+
+        from apps.data_processing import views
+
+        wrappers = []
+        monkeypatch.setattr(views, "render_metrics", lambda: wrappers.append(len(connection.execute_wrappers)) or "")
+        client.get(URL)
+        assert wrappers == [1]
+        samples = _samples(metrics.render_metrics())
+        assert samples['http_request_db_queries_count{view="metrics"}'] == "1"
+
+    def test_token(self, client, settings):
+        settings.DATA_PROCESSING_METRICS_TOKEN = "secret"
+        assert client.get(URL).status_code == 401
+        assert client.get(URL, HTTP_AUTHORIZATION="Bearer secret").status_code == 200
@@ -1,4 +1,6 @@
-from apps.data_processing.services.parsing import validate_and_parse
+from io import BytesIO
+
+from apps.data_processing.services.parsing import iter_csv_chunks, validate_and_parse
 
 
 class TestValidateAndParse:
@@ -67,3 +69,19 @@ class TestValidateAndParse:
         ok, data, _, _ = validate_and_parse(csv_valid_content, "file.csv")
         assert ok is True
         assert len(data) >= 1
+
+
+class TestIterCsvChunks:
+
+    def test_row_numbers_continue_across_chunks(self, csv_start_gt_end):
+        content = csv_start_gt_end + b"\nE,F,30.01.21,14.01.21,banner,DV360,300"
+        chunks = list(iter_csv_chunks(BytesIO(content), "data.csv", chunk_size=1))
+        assert len(chunks) == 3
+        assert all(ok for ok, _, _, _ in chunks)
+        assert [s["row_num"] for _, _, _, skipped in chunks for s in skipped] == [2, 4]
+
+    def test_stops_on_failed_chunk(self, csv_empty_dates):
+        chunks = list(iter_csv_chunks(BytesIO(csv_empty_dates), "bad.csv", chunk_size=1))
+        assert len(chunks) == 1
+        assert chunks[0][0] is False
+        assert chunks[0][2] == "empty_dates"
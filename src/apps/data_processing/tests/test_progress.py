@@ -0,0 +1,61 @@
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from apps.data_processing.models import DataFile
+from apps.data_processing.services import process_file_upload
+from apps.data_processing.services.jobs import enqueue_file_upload
+from apps.data_processing.services.progress import UploadProgress, get_upload_progress
+
+
+@pytest.mark.django_db
+class TestUploadProgress:
+
+    def test_writes_are_throttled(self, user, settings):
+        settings.DATA_PROCESSING_PROGRESS_INTERVAL = 3600
+        data_file = DataFile.objects.create(user=user, filename="a.csv", file_size=1000)
+        progress = UploadProgress(data_file)
+        progress.update(rows_read=10, bytes_read=100)
+        progress.update(rows_read=10, bytes_read=200)
+        assert get_upload_progress(data_file)["rows_read"] == 10
+
+        progress.update(stage="inserting", bytes_read=500)
+        result = get_upload_progress(data_file)
+        assert result["stage"] == "inserting"
+        assert result["rows_read"] == 20
+        assert result["percent"] == 50.0
+        assert result["eta"] is not None
+
+    def test_queued_upload(self, user, csv_valid_content):
+        enqueue_file_upload(user, SimpleUploadedFile("queued.csv", csv_valid_content))
+        result = get_upload_progress(DataFile.objects.get())
+        assert result["stage"] == "queued"
+        assert result["elapsed"] is None
+
+    def test_finished_upload(self, user, csv_start_gt_end):
+        process_file_upload(user, SimpleUploadedFile("data.csv", csv_start_gt_end))
+        result = get_upload_progress(DataFile.objects.get())
+        assert result["stage"] == "done"
+        assert result["percent"] == 100.0
+        assert (result["rows_read"], result["rows_inserted"], result["rows_skipped"]) == (2, 1, 1)
+        assert result["eta"] is None
+
+    def test_failed_upload(self, user, csv_empty_dates):
+        process_file_upload(user, SimpleUploadedFile("bad.csv", csv_empty_dates))
+        result = get_upload_progress(DataFile.objects.get())
+        assert result["stage"] == "error"
+        assert result["error_message"]
+
+    def test_without_cache_entry_uses_data_file(self, user):
+        data_file = DataFile.objects.create(
+            user=user, filename="old.csv", status="success", rows_processed=5, rows_skipped=1
+        )
+        result = get_upload_progress(data_file)
+        assert result["stage"] == "done"
+        assert (result["rows_read"], result["rows_inserted"], result["rows_skipped"]) == (6, 5, 1)
+
+    def test_stale_stage_follows_file_status(self, user):
+        data_file = DataFile.objects.create(user=user, filename="a.csv", status="processing")
+        UploadProgress(data_file).save()
+        data_file.status = "error"
+        assert get_upload_progress(data_file)["stage"] == "error"
@@ -0,0 +1,106 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+
+from apps.data_processing.models import DataFile, DataRecord, ProratedDay
+from apps.data_processing.services.aggregation import get_aggregated_stats
+from apps.data_processing.services.proration import prorate_spans
+from apps.data_processing.services.upload import process_file_upload
+
+# 10 days over New Year: 3 in 2021, 7 in 2022
+CSV_NEW_YEAR = b"""Advertis,Brand,Start,End,Format,Platforr,Impr
+A,B,29.12.21,07.01.22,banner,DV360,1000
+A,B,15.03.22,15.03.22,banner,DV360,
+C,D,14.03.22,16.03.22,video,Meta,1"""
+
+
+def _days():
+    return {d.day: d.impressions for d in ProratedDay.objects.all()}
+
+
+def _daily(spans):
+    first, daily = prorate_spans({(date(*a).toordinal(), date(*b).toordinal()): c for (a, b), c in spans.items()})
+    return {date.fromordinal(first + i): int(c) for i, c in enumerate(daily)}
+
+
+class TestProrateSpans:
+
+    def test_spreads_evenly_with_remainder_on_first_days(self):
+        assert _daily({((2022, 1, 1), (2022, 1, 3)): 100}) == {
+            date(2022, 1, 1): 34, date(2022, 1, 2): 33, date(2022, 1, 3): 33,
+        }
+
+    def test_overlapping_spans_add_up(self):
+        daily = _daily({((2022, 1, 1), (2022, 1, 2)): 10, ((2022, 1, 2), (2022, 1, 4)): 9, ((2022, 1, 4), (2022, 1, 4)): 1})
+        assert daily == {date(2022, 1, 1): 5, date(2022, 1, 2): 8, date(2022, 1, 3): 3, date(2022, 1, 4): 4}
+
+    def test_sum_is_exact(self):
+        spans = {(738000 + i, 738000 + i * 7): 10_000_019 * i + 3 for i in range(1, 200)}
+        first, daily = prorate_spans(spans)
+        assert int(daily.sum()) == sum(spans.values())
+
+    def test_end_before_start_books_to_start(self):
+        assert _daily({((2022, 1, 5), (2022, 1, 1)): 7}) == {date(2022, 1, 5): 7}
+
+    def test_no_spans(self):
+        first, daily = prorate_spans({})
+        assert first is None and len(daily) == 0
+
+
+@pytest.mark.django_db
+class TestProratedDays:
+
+    @pytest.mark.parametrize("chunk_size", [0, 1])
+    def test_upload_spreads_impressions_over_days(self, user, settings, chunk_size):
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = chunk_size
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_NEW_YEAR))
+        days = _days()
+        assert len(days) == 13
+        assert days[date(2021, 12, 29)] == Decimal("100")
+        assert days[date(2022, 3, 14)] == Decimal("0.34")
+        assert days[date(2022, 3, 16)] == Decimal("0.33")
+        assert sum(days.values()) == Decimal("1001")
+
+    def test_deleting_file_subtracts_days(self, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_NEW_YEAR))
+        process_file_upload(user, SimpleUploadedFile("b.csv", CSV_NEW_YEAR + b"\n"))
+        assert _days()[date(2022, 1, 1)] == Decimal("200")
+        DataFile.objects.filter(filename="a.csv").delete()
+        assert _days()[date(2022, 1, 1)] == Decimal("100")
+        DataFile.objects.all().delete()
+        assert _days() == {}
+
+    def test_rebuild_command(self, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_NEW_YEAR))
+        expected = _days()
+        ProratedDay.objects.update(impressions=5)
+        DataRecord.objects.create(
+            file=DataFile.objects.get(), year=2023, start_date=date(2023, 5, 1), end_date=date(2023, 5, 2),
+            impressions=7,
+        )
+        call_command("rebuild_prorated_days")
+        assert _days() == {**expected, date(2023, 5, 1): Decimal("3.5"), date(2023, 5, 2): Decimal("3.5")}
+
+    def test_stats_modes(self, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_NEW_YEAR))
+        assert get_aggregated_stats()["year_stats"] == [{"year": 2021, "totals": [Decimal("1000")]},
+                                                        {"year": 2022, "totals": [Decimal("1")]}]
+        prorated = get_aggregated_stats("prorated")
+        assert prorated["mode"] == "prorated"
+        assert prorated["year_stats"] == [{"year": 2021, "totals": [Decimal("300")]},
+                                          {"year": 2022, "totals": [Decimal("701")]}]
+        with pytest.raises(ValueError):
+            get_aggregated_stats("weekly")
+
+    def test_stats_page_mode(self, client, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_NEW_YEAR))
+        client.force_login(user)
+        response = client.get(reverse("data_processing:stats"), {"mode": "prorated"})
+        assert response.context["mode"] == "prorated"
+        assert response.context["year_stats"][0]["totals"] == [Decimal("300")]
+        assert client.get(reverse("data_processing:stats"), {"mode": "bogus"}).context["mode"] == "start"
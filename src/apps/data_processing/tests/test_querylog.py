@@ -0,0 +1,169 @@
+import logging
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import ResolverMatch, reverse
+
+from apps.data_processing import middleware
+from apps.data_processing.admin import DataFileAdmin
+from apps.data_processing.models import DataFile, DataRecord, IngestJob, SkippedRow
+from apps.data_processing.querylog import (
+    QueryBudgetExceeded, QueryRecorder, explain_query_plan, query_budget, record_queries, view_query_budget,
+)
+from apps.data_processing.services.jobs import enqueue_file_upload
+from apps.data_processing.services.upload import process_file_upload
+from apps.data_processing.views import AggregatedStatsView, FileUploadView
+
+CSV = b"""Advertis,Brand,Start,End,Format,Platforr,Impr
+Nike,Air,04.01.21,10.01.21,banner,DV360,100
+Adidas,Boost,30.01.21,13.01.21,banner,DV360,200
+Puma,Speed,14.01.21,15.02.22,video,Meta,400
+"""
+
+
+@pytest.fixture
+def admin_client(client, django_user_model):
+    client.force_login(django_user_model.objects.create_superuser(username="admin", password="x", email="a@b.c"))
+    return client
+
+
+def _log_messages(caplog):
+    return [r.getMessage() for r in caplog.records if r.name == middleware.__name__]
+
+
+@pytest.mark.django_db
+class TestRecorder:
+
+    def test_records_queries_with_timings(self):
+        with record_queries() as recorded:
+            for _ in range(3):
+                list(DataFile.objects.filter(pk=1))
+            DataRecord.objects.count()
+        assert recorded.count == 4
+        assert all(q["duration"] >= 0 for q in recorded.queries)
+        report = recorded.report()
+        assert report.startswith("4 queries in")
+        assert report.splitlines()[1].startswith("  3 x SELECT")
+
+    def test_executemany_and_queries_past_limit_are_not_kept(self):
+        from django.db import connection
+
+        recorder = QueryRecorder(limit=2)
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TEMPORARY TABLE querylog_batch (n integer)")
+        with connection.execute_wrapper(recorder), connection.cursor() as cursor:
+            cursor.executemany("INSERT INTO querylog_batch (n) VALUES (%s)", [(i,) for i in range(50)])
+            for _ in range(3):
+                cursor.execute("SELECT 1")
+        assert recorder.count == 4
+        assert [(q["params"], q["many"]) for q in recorder.queries] == [(50, True), (None, False)]
+        assert recorder.report().startswith("4 queries in")
+        assert "(statements of the first 2)" in recorder.report().splitlines()[0]
+
+    def test_explain_select_only(self):
+        plan = explain_query_plan(*DataRecord.objects.filter(file_id=1).query.sql_with_params())
+        assert "data_processing_data_record" in plan
+        assert explain_query_plan("UPDATE data_processing_data_file SET status = %s", ("x",)) is None
+
+    def test_str_of_record_does_not_query(self, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV))
+        record = DataRecord.objects.first()
+        with record_queries() as recorded:
+            str(record)
+        assert recorded.count == 0
+
+
+class TestBudgetDeclaration:
+
+    def _match(self, func, url_name="view"):
+        return ResolverMatch(func, (), {}, url_name=url_name)
+
+    def test_function_view(self):
+        @query_budget(3)
+        def view(request):
+            pass
+
+        assert view_query_budget(self._match(view)) == 3
+
+    def test_class_based_view(self):
+        assert view_query_budget(self._match(AggregatedStatsView.as_view())) == AggregatedStatsView.query_budget
+
+    def test_model_admin(self):
+        def view(request):
+            pass
+
+        view.model_admin = DataFileAdmin
+        assert view_query_budget(self._match(view, "data_processing_datafile_changelist")) == 9
+        assert view_query_budget(self._match(view, "data_processing_datafile_delete")) is None
+
+
+@pytest.mark.django_db
+class TestMiddleware:
+
+    def test_over_budget_fails_in_strict_mode(self, admin_client, monkeypatch):
+        monkeypatch.setattr(AggregatedStatsView, "query_budget", 1)
+        with pytest.raises(QueryBudgetExceeded, match="data_processing:stats ran .* queries, budget 1"):
+            admin_client.get(reverse("data_processing:stats"))
+
+    def test_over_budget_warns(self, admin_client, monkeypatch, settings, caplog):
+        settings.DATA_PROCESSING_QUERY_BUDGET_STRICT = False
+        monkeypatch.setattr(DataFileAdmin, "query_budgets", {"changelist": 1})
+        with caplog.at_level(logging.WARNING, logger=middleware.__name__):
+            response = admin_client.get(reverse("admin:data_processing_datafile_changelist"))
+        assert response.status_code == 200
+        assert "budget 1" in _log_messages(caplog)[0]
+
+    def test_writes_are_not_budgeted(self, admin_client, monkeypatch, settings):
+        settings.DATA_PROCESSING_BACKGROUND_UPLOADS = False
+        monkeypatch.setattr(FileUploadView, "query_budget", 0, raising=False)
+        response = admin_client.post(reverse("data_processing:upload"), {"file": SimpleUploadedFile("a.csv", CSV)})
+        assert response.status_code == 302
+
+    def test_slow_queries_logged_with_plan(self, admin_client, settings, caplog):
+        settings.DATA_PROCESSING_SLOW_QUERY_SECONDS = 0
+        settings.DATA_PROCESSING_SLOW_QUERY_EXPLAIN_LIMIT = 2
+        with caplog.at_level(logging.WARNING, logger=middleware.__name__):
+            admin_client.get(reverse("data_processing:progress_list"))
+        messages = _log_messages(caplog)
+        assert len(messages) == 3
+        assert messages[0].startswith("Повільний запит у data_processing:progress_list")
+        assert "QUERY PLAN:" in messages[0]
+        assert messages[-1].startswith("Ще 1 повільних запитів")
+
+    def test_fast_queries_not_logged(self, admin_client, caplog):
+        with caplog.at_level(logging.WARNING, logger=middleware.__name__):
+            admin_client.get(reverse("data_processing:progress_list"))
+        assert _log_messages(caplog) == []
+
+
+@pytest.mark.django_db
+def test_pages_within_budget(admin_client, django_user_model):
+    """Budgeted pages with several files of data: an N+1 query would exceed the budget and raise."""
+    admin = django_user_model.objects.get(username="admin")
+    for i in range(3):
+        process_file_upload(admin, SimpleUploadedFile(f"f{i}.csv", CSV + b"Brand%d,X,14.01.21,15.01.21,audio,TikTok,5" % i))
+        enqueue_file_upload(admin, SimpleUploadedFile(f"q{i}.csv", CSV + b"Q%d,X,14.01.21,15.01.21,audio,X,5" % i))
+    data_file = DataFile.objects.filter(status="success").first()
+    all_dimensions = "year,month,advertiser,brand,platform,format_type"
+    all_filters = "advertiser=Nike&brand=Air&platform=DV360&format_type=banner"
+    urls = [
+        reverse("users:dashboard"),
+        reverse("data_processing:stats") + "?group_by=year,platform",
+        reverse("data_processing:cube") + "?group_by=platform",
+        reverse("data_processing:cube") + f"?group_by={all_dimensions}&{all_filters}",
+        reverse("data_processing:stats") + f"?group_by={all_dimensions}&{all_filters}",
+        reverse("data_processing:record_search") + "?q=nike",
+        reverse("data_processing:progress_list"),
+        reverse("data_processing:progress", args=[data_file.pk]),
+        reverse("metrics"),
+        reverse("admin:data_processing_datafile_change", args=[data_file.pk]),
+        reverse("admin:data_processing_datarecord_change", args=[DataRecord.objects.first().pk]),
+        reverse("admin:data_processing_skippedrow_change", args=[SkippedRow.objects.first().pk]),
+        reverse("admin:data_processing_ingestjob_change", args=[IngestJob.objects.first().pk]),
+    ] + [
+        reverse(f"admin:data_processing_{model}_changelist")
+        for model in ("datafile", "datarecord", "skippedrow", "ingeststagetiming", "ingestjob", "yearlyrollup")
+    ]
+    for url in urls:
+        assert admin_client.get(url).status_code == 200, url
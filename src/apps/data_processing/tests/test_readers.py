@@ -0,0 +1,100 @@
+from io import BytesIO
+
+import pandas as pd
+
+from apps.data_processing.services.parsing import iter_xlsx_chunks, validate_and_parse
+from apps.data_processing.services.readers import (
+    CsvDialect,
+    iter_xlsx_frames,
+    resolve_csv_engine,
+    sniff_csv_dialect,
+)
+
+
+class TestSniffCsvDialect:
+
+    def test_comma(self, csv_valid_content):
+        assert sniff_csv_dialect(csv_valid_content) == CsvDialect()
+
+    def test_semicolon_and_quotes(self):
+        head = b'Advertis;Brand;Start;End\n"A; Ltd";B;04.01.21;10.01.21\n'
+        dialect = sniff_csv_dialect(head)
+        assert dialect.delimiter == ";"
+        assert dialect.quotechar == '"'
+
+    def test_utf8_bom(self):
+        dialect = sniff_csv_dialect(b"\xef\xbb\xbfStart,End\n04.01.21,10.01.21\n")
+        assert dialect.encoding == "utf-8-sig"
+
+    def test_cp1251_fallback(self):
+        head = "Advertis,Brand,Start,End\nКомпанія,Бренд,04.01.21,10.01.21\n".encode("cp1251")
+        assert sniff_csv_dialect(head).encoding == "cp1251"
+
+    def test_single_column_defaults_to_comma(self):
+        assert sniff_csv_dialect(b"Start\n04.01.21\n").delimiter == ","
+
+
+class TestCsvEngine:
+
+    def test_chunked_reads_use_c_engine(self):
+        assert resolve_csv_engine("pyarrow", CsvDialect(), chunked=True) == "c"
+
+    def test_default_is_c(self):
+        assert resolve_csv_engine("c", CsvDialect()) == "c"
+
+
+class TestValidateAndParseDialect:
+
+    def test_semicolon_with_bom_parsed(self):
+        content = b"\xef\xbb\xbfStart;End;Advertis;Impr\n14.01.21;15.01.21;A;10\n"
+        info = {}
+        ok, data, _, _ = validate_and_parse(content, "data.csv", info)
+        assert ok is True
+        assert data[0]["advertiser"] == "A"
+        assert info["csv_dialect"] == CsvDialect(delimiter=";", encoding="utf-8-sig")
+
+    def test_explicit_dialect_skips_sniffing(self):
+        content = b"Start|End|Impr\n14.01.21|15.01.21|10\n"
+        ok, data, _, _ = validate_and_parse(content, "data.csv", dialect=CsvDialect(delimiter="|"))
+        assert ok is True
+        assert data[0]["impressions"] == 10
+
+
+class TestIterXlsxFrames:
+
+    def test_batches_and_header(self, xlsx_valid_content):
+        frames = list(iter_xlsx_frames(BytesIO(xlsx_valid_content), chunk_size=2))
+        assert [len(df) for df in frames] == [2, 1]
+        assert list(frames[1].index) == [2]
+        assert list(frames[0].columns) == ["Advertis", "Brand", "Start", "End", "Format", "Platforr", "Impr"]
+        assert frames[0].loc[1, "Impr"] == 2000
+        assert pd.isna(frames[1].loc[2, "Brand"])
+
+    def test_streamed_rows_match_read_excel(self, xlsx_valid_content):
+        ok, expected, _, expected_skipped = validate_and_parse(xlsx_valid_content, "data.xlsx")
+        rows, skipped = [], []
+        for chunk_ok, data, _, chunk_skipped in iter_xlsx_chunks(BytesIO(xlsx_valid_content), "data.xlsx", 1):
+            assert chunk_ok is True
+            rows += data
+            skipped += chunk_skipped
+        assert ok is True
+        assert rows == expected
+        assert skipped == expected_skipped
+
+    def test_not_a_workbook_is_format_error(self, csv_valid_content):
+        chunks = list(iter_xlsx_chunks(BytesIO(csv_valid_content), "data.xlsx", 10))
+        assert chunks == [(False, chunks[0][1], "format", [])]
+
+    def test_inner_empty_row_kept(self):
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        wb.active.append(["Start", "End"])
+        wb.active.append(["14.01.21", "15.01.21"])
+        wb.active.append([None, None])
+        wb.active.append(["16.01.21", "17.01.21"])
+        buf = BytesIO()
+        wb.save(buf)
+        frames = list(iter_xlsx_frames(BytesIO(buf.getvalue()), chunk_size=10))
+        assert len(frames[0]) == 3
+        assert pd.isna(frames[0].loc[1, "Start"])
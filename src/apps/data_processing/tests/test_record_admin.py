@@ -0,0 +1,164 @@
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.urls import reverse
+
+from apps.data_processing.models import Advertiser, Brand, DataFile, DataRecord, Platform
+from apps.data_processing.pagination import EstimatedCountPaginator, estimate_record_count
+from apps.data_processing.services.search import (
+    SEARCH_TABLE, match_expression, matching_ids, rebuild_search_index,
+)
+from apps.data_processing.services.upload import process_file_upload
+
+CSV = b"""Advertis,Brand,Start,End,Format,Platforr,Impr
+Nike,Air Max,04.01.21,10.01.21,banner,DV360,100
+Adidas,Originals,14.02.21,20.02.21,video,Meta,50
+\xd0\x9a\xd0\xb8\xd1\x97\xd0\xb2\xd1\x81\xd1\x82\xd0\xb0\xd1\x80,4G,29.12.21,07.01.22,banner,DV360,1000
+Nike,Jordan,14.03.22,16.03.22,video,TikTok,7"""
+
+
+def _upload(user, content=CSV, name="a.csv"):
+    process_file_upload(user, SimpleUploadedFile(name, content))
+    return DataFile.objects.get(filename=name)
+
+
+def _search(text):
+    return sorted(DataRecord.objects.filter(pk__in=matching_ids(text)).values_list("advertiser__name", "brand__name"))
+
+
+def _integrity_check():
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('integrity-check', 1)")
+
+
+@pytest.fixture
+def admin_client(client, django_user_model):
+    client.force_login(django_user_model.objects.create_superuser(username="admin", password="x", email="a@b.c"))
+    return client
+
+
+class TestMatchExpression:
+
+    def test_words_become_prefix_terms(self):
+        assert match_expression("nik  air-m") == '"nik"* "air"* "m"*'
+
+    def test_no_words(self):
+        assert match_expression(' "*- ') is None
+
+
+@pytest.mark.django_db
+class TestSearchIndex:
+
+    def test_ingested_records_are_indexed(self, user):
+        _upload(user)
+        assert _search("nike") == [("Nike", "Air Max"), ("Nike", "Jordan")]
+        assert _search("ori") == [("Adidas", "Originals")]
+        assert _search("київ") == [("Київстар", "4G")]
+        assert _search("nike tiktok") == [("Nike", "Jordan")]
+        _integrity_check()
+
+    def test_deleted_and_updated_records_leave_the_index(self, user):
+        data_file = _upload(user)
+        _upload(user, CSV.replace(b"Nike", b"Puma"), name="b.csv")
+        record = DataRecord.objects.get(advertiser__name="Adidas", file=data_file)
+        record.advertiser = Advertiser.objects.create(name="Reebok")
+        record.save()
+        assert _search("adidas") == [("Adidas", "Originals")]
+        assert _search("reebok") == [("Reebok", "Originals")]
+
+        data_file.delete()
+        assert _search("nike") == []
+        assert len(_search("puma")) == 2
+        _integrity_check()
+
+    def test_single_created_record_is_indexed(self, user):
+        data_file = _upload(user)
+        DataRecord.objects.create(
+            file=data_file, year=2023, advertiser=Advertiser.objects.create(name="Lego"),
+            brand=Brand.objects.create(name="Duplo"), platform=Platform.objects.get(name="Meta"),
+        )
+        assert _search("duplo") == [("Lego", "Duplo")]
+        _integrity_check()
+
+    def test_rebuild(self, user):
+        _upload(user)
+        rebuild_search_index()
+        assert len(_search("nike")) == 2
+        _integrity_check()
+
+
+@pytest.mark.django_db
+class TestEstimatedCountPaginator:
+
+    def test_exact_below_limit(self, user):
+        _upload(user)
+        paginator = EstimatedCountPaginator(DataRecord.objects.all(), 2, exact_count_limit=10)
+        assert (paginator.count, paginator.estimated, paginator.limit_exceeded) == (4, False, False)
+
+    def test_estimate_beyond_limit(self, user):
+        _upload(user)
+        paginator = EstimatedCountPaginator(DataRecord.objects.all(), 2, exact_count_limit=2,
+                                            estimate=estimate_record_count)
+        assert (paginator.count, paginator.estimated) == (4, True)
+
+    def test_filtered_queryset_stops_at_limit(self, user):
+        _upload(user)
+        paginator = EstimatedCountPaginator(DataRecord.objects.filter(year__gte=2021), 2, exact_count_limit=2,
+                                            estimate=estimate_record_count)
+        assert (paginator.count, paginator.limit_exceeded) == (3, True)
+
+
+@pytest.mark.django_db
+class TestDataRecordAdmin:
+    url = reverse("admin:data_processing_datarecord_changelist")
+
+    def test_changelist_counts_without_full_scan(self, admin_client, user, settings, django_assert_max_num_queries):
+        settings.DATA_PROCESSING_ADMIN_EXACT_COUNT_LIMIT = 2
+        _upload(user)
+        with django_assert_max_num_queries(10):
+            response = admin_client.get(self.url)
+        assert response.status_code == 200
+        assert "≈ 4 Data records" in response.content.decode()
+
+    def test_search_uses_index_and_file_names(self, admin_client, user):
+        _upload(user)
+        _upload(user, CSV.replace(b"Nike", b"Puma"), name="nike_export.csv")
+        response = admin_client.get(self.url, {"q": "nik"})
+        advertisers = sorted(r.advertiser.name for r in response.context["cl"].result_list)
+        assert advertisers == ["Adidas", "Nike", "Nike", "Puma", "Puma", "Київстар"]
+        response = admin_client.get(self.url, {"q": "jordan"})
+        assert len(response.context["cl"].result_list) == 2
+
+    def test_keyset_navigation(self, admin_client, user, monkeypatch):
+        from apps.data_processing.admin import DataRecordAdmin
+
+        monkeypatch.setattr(DataRecordAdmin, "list_per_page", 3)
+        _upload(user)
+        ids = sorted(DataRecord.objects.values_list("id", flat=True), reverse=True)
+
+        cl = admin_client.get(self.url).context["cl"]
+        assert [r.pk for r in cl.result_list] == ids[:3]
+        assert cl.next_keyset_url == f"?after={ids[2]}"
+
+        cl = admin_client.get(self.url + cl.next_keyset_url).context["cl"]
+        assert [r.pk for r in cl.result_list] == ids[3:]
+        assert cl.next_keyset_url is None
+
+    def test_filters_come_from_cube(self, admin_client, user):
+        _upload(user)
+        response = admin_client.get(self.url, {"platform": "TikTok"})
+        assert [r.brand.name for r in response.context["cl"].result_list] == ["Jordan"]
+        assert "?format_type=video" in response.content.decode()
+
+    def test_records_are_read_only(self, admin_client, user):
+        _upload(user)
+        record = DataRecord.objects.first()
+        response = admin_client.get(self.url)
+        assert "delete_selected" not in response.content.decode()
+        assert admin_client.get(reverse("admin:data_processing_datarecord_add")).status_code == 403
+        change_url = reverse("admin:data_processing_datarecord_change", args=[record.pk])
+        assert admin_client.post(change_url, {"impressions": 1}).status_code == 403
+        delete_url = reverse("admin:data_processing_datarecord_delete", args=[record.pk])
+        assert admin_client.post(delete_url, {"post": "yes"}).status_code == 403
+        assert DataRecord.objects.get(pk=record.pk).impressions == record.impressions
@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from apps.data_processing.models import DataFile, DataRecord, FileYearTotal, YearlyRollup
+from apps.data_processing.services.aggregation import get_aggregated_stats
+from apps.data_processing.services.upload import process_file_upload
+
+CSV_2021_2022 = b"""Advertis,Brand,Start,End,Format,Platforr,Impr
+A,B,04.01.21,10.01.21,banner,DV360,100
+A,B,14.02.21,20.02.21,banner,DV360,
+C,D,14.03.22,20.03.22,banner,DV360,1.5"""
+
+
+def _rollup():
+    return {r.year: (r.records_count, r.total_impressions) for r in YearlyRollup.objects.all()}
+
+
+@pytest.mark.django_db
+class TestYearlyRollup:
+
+    @pytest.mark.parametrize("chunk_size", [0, 1])
+    def test_upload_adds_its_deltas(self, user, csv_valid_content, settings, chunk_size):
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = chunk_size
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_2021_2022))
+        process_file_upload(user, SimpleUploadedFile("b.csv", csv_valid_content))
+        assert _rollup() == {2021: (4, Decimal("3100")), 2022: (1, Decimal("1.5"))}
+        assert FileYearTotal.objects.count() == 3
+
+    def test_failed_upload_leaves_rollup_untouched(self, user, csv_empty_dates):
+        process_file_upload(user, SimpleUploadedFile("bad.csv", csv_empty_dates))
+        assert _rollup() == {}
+
+    def test_deleting_file_subtracts_deltas(self, user, csv_valid_content):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_2021_2022))
+        process_file_upload(user, SimpleUploadedFile("b.csv", csv_valid_content))
+        DataFile.objects.get(filename="a.csv").delete()
+        assert _rollup() == {2021: (2, Decimal("3000"))}
+
+        DataFile.objects.all().delete()
+        assert _rollup() == {}
+        assert FileYearTotal.objects.count() == 0
+
+    def test_stats_read_rollup_with_same_shape(self, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_2021_2022))
+        assert get_aggregated_stats()["year_stats"] == [
+            {"year": 2021, "totals": [Decimal("100")]},
+            {"year": 2022, "totals": [Decimal("1.5")]},
+        ]
+
+    def test_rebuild_command(self, user):
+        process_file_upload(user, SimpleUploadedFile("a.csv", CSV_2021_2022))
+        expected = _rollup()
+        data_file = DataFile.objects.get()
+        DataRecord.objects.create(file=data_file, year=2023, impressions=7)
+        YearlyRollup.objects.filter(year=2021).update(records_count=99)
+
+        call_command("rebuild_yearly_rollup")
+        assert _rollup() == {**expected, 2023: (1, Decimal("7"))}
+        assert FileYearTotal.objects.filter(file=data_file).count() == 3
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from apps.data_processing.models import DataFile
+from apps.data_processing.services import search
+from apps.data_processing.services.search import match_expression, search_records
+from apps.data_processing.services.upload import process_file_upload
+
+CSV = b"""Advertis,Brand,Start,End,Format,Platforr,Impr
+Nike,Air Max,04.01.21,10.01.21,banner,DV360,100
+Adidas,Nike Collab,14.02.21,20.02.21,video,Meta,50.5
+Puma,Suede,29.12.21,07.01.22,banner,DV360,1000
+Nike,Jordan,14.03.22,16.03.22,video,TikTok,7"""
+
+
+@pytest.fixture
+def uploaded(user):
+    process_file_upload(user, SimpleUploadedFile("a.csv", CSV))
+    return DataFile.objects.get()
+
+
+def test_match_expression_with_fields():
+    assert match_expression("nik air", ["brand"]) == '{brand} : ("nik"* "air"*)'
+
+
+@pytest.mark.django_db
+class TestSearchRecords:
+
+    def test_records_and_year_totals(self, uploaded):
+        result = search_records("nike")
+        assert [r["brand"] for r in result["records"]] == ["Jordan", "Nike Collab", "Air Max"]
+        assert result["records"][0]["filename"] == "a.csv"
+        assert [(r["year"], r["records_count"], r["total_impressions"]) for r in result["year_totals"]] == [
+            (2021, 2, Decimal("150.5")), (2022, 1, Decimal("7")),
+        ]
+        assert result["total"] == 3
+
+    def test_field_restriction(self, uploaded):
+        assert [r["brand"] for r in search_records("nike", ["advertiser"])["records"]] == ["Jordan", "Air Max"]
+        assert [r["brand"] for r in search_records("vid", ["format_type"])["records"]] == ["Jordan", "Nike Collab"]
+
+    def test_limit_keeps_totals_over_all_matches(self, uploaded):
+        result = search_records("nike", limit=1)
+        assert [r["brand"] for r in result["records"]] == ["Jordan"]
+        assert result["total"] == 3
+
+    def test_invalid_queries(self, uploaded):
+        with pytest.raises(ValueError):
+            search_records("  ")
+        with pytest.raises(ValueError):
+            search_records("nike", ["impressions"])
+
+    def test_fallback_without_index(self, uploaded, monkeypatch):
+        monkeypatch.setattr(search, "search_index_supported", lambda connection=None: False)
+        result = search_records("nik jor")
+        assert [r["brand"] for r in result["records"]] == ["Jordan"]
+        assert result["total"] == 1
+
+
+@pytest.mark.django_db
+class TestRecordSearchView:
+    url = reverse("data_processing:record_search")
+
+    def test_json(self, client, user, uploaded):
+        client.force_login(user)
+        data = client.get(self.url, {"q": "nike", "field": "brand,advertiser", "limit": 2}).json()
+        assert [r["brand"] for r in data["records"]] == ["Jordan", "Nike Collab"]
+        assert data["records"][1]["impressions"] == "50.5"
+        assert data["year_totals"] == [
+            {"year": 2021, "records_count": 2, "total_impressions": "150.5"},
+            {"year": 2022, "records_count": 1, "total_impressions": "7"},
+        ]
+
+    def test_bad_request(self, client, user):
+        client.force_login(user)
+        assert client.get(self.url, {"q": ""}).status_code == 400
+        assert client.get(self.url, {"q": "x", "limit": "many"}).status_code == 400
+
+    def test_requires_login(self, client):
+        assert client.get(self.url, {"q": "nike"}).status_code == 403
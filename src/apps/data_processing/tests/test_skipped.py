@@ -0,0 +1,123 @@
+import logging
+
+from io import BytesIO
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from apps.data_processing import metrics
+from apps.data_processing.models import DataFile, SkippedRow
+from apps.data_processing.services import skipped as skipped_module
+from apps.data_processing.services.parsing import iter_csv_chunks, validate_and_parse
+from apps.data_processing.services.skipped import SkipLogger, SkippedRowWriter, remove_skipped_rows
+from apps.data_processing.services.upload import process_file_upload
+
+CSV = b"""Advertis,Brand,Start,End,Format,Platforr,Impr
+A,B,04.01.21,10.01.21,banner,DV360,100
+C,D,30.01.21,13.01.21,banner,DV360,200
+E,F,xx,13.01.21,banner,DV360,300
+G,H,14.01.21,yy,banner,Meta,400
+I,J,28.01.21,14.01.21,video,Meta,500"""
+
+
+@pytest.fixture
+def uploaded(user):
+    process_file_upload(user, SimpleUploadedFile("skip.csv", CSV))
+    return DataFile.objects.get()
+
+
+@pytest.fixture
+def admin_client(client, django_user_model):
+    client.force_login(django_user_model.objects.create_superuser(username="admin", password="x", email="a@b.c"))
+    return client
+
+
+@pytest.mark.django_db
+class TestSkippedRows:
+
+    def test_rows_and_counts_per_reason(self, uploaded):
+        assert uploaded.rows_skipped == 4
+        assert uploaded.skipped_counts == {"invalid_end": 1, "invalid_start": 1, "start_gt_end": 2}
+        assert list(uploaded.skipped_rows.values_list("row_num", "reason")) == [
+            (3, "start_gt_end"), (4, "invalid_start"), (5, "invalid_end"), (6, "start_gt_end"),
+        ]
+        assert uploaded.skipped_rows.get(row_num=5).raw_values == {
+            "advertiser": "G", "brand": "H", "start": "14.01.21", "end": "yy",
+            "format": "banner", "platform": "Meta", "impressions": "400",
+        }
+
+    def test_writer_inserts_in_batches(self, uploaded):
+        writer = SkippedRowWriter(uploaded, batch_size=2)
+        writer.add([{"row_num": n, "reason": "start_gt_end", "detail": ""} for n in range(10, 15)])
+        writer.store_counts()
+        assert (uploaded.rows_skipped, uploaded.skipped_counts) == (5, {"start_gt_end": 5})
+        assert SkippedRow.objects.filter(file=uploaded, row_num__gte=10).count() == 5
+
+    def test_remove(self, uploaded):
+        remove_skipped_rows(uploaded)
+        assert not SkippedRow.objects.exists()
+
+    def test_deleted_with_file(self, uploaded):
+        uploaded.delete()
+        assert not SkippedRow.objects.exists()
+
+
+def _many_skipped(rows):
+    return b"Advertis,Brand,Start,End,Format,Platforr,Impr\n" + b"\n".join(
+        b"A,B,20.01.21,13.01.21,banner,DV360,%d" % i for i in range(rows)
+    ) + b"\nA,B,xx,13.01.21,banner,DV360,1"
+
+
+def _skip_records(caplog):
+    return [r for r in caplog.records if r.name == skipped_module.__name__]
+
+
+class TestSkipLogger:
+
+    def test_examples_then_one_summary(self, caplog, settings):
+        settings.DATA_PROCESSING_SKIPPED_LOG_EXAMPLES = 2
+        with caplog.at_level(logging.WARNING):
+            ok, _, _, skipped = validate_and_parse(_many_skipped(50), "many.csv")
+        assert ok and len(skipped) == 51
+        records = _skip_records(caplog)
+        assert [r.getMessage().split(":")[0] for r in records] == [
+            "Пропущено рядок 2", "Пропущено рядок 3", "Пропущено рядок 52", "Пропущено рядків",
+        ]
+        assert records[-1].skipped_counts == {"invalid_start": 1, "start_gt_end": 50}
+        assert metrics.REGISTRY.values["data_processing_rows_skipped_total"] == {
+            ("invalid_start",): 1, ("start_gt_end",): 50,
+        }
+
+    def test_streamed_file_is_summarized_once(self, caplog, settings):
+        settings.DATA_PROCESSING_SKIPPED_LOG_EXAMPLES = 0
+        with caplog.at_level(logging.WARNING):
+            chunks = list(iter_csv_chunks(BytesIO(_many_skipped(30)), "many.csv", 7))
+        assert len(chunks) == 5
+        records = _skip_records(caplog)
+        assert len(records) == 1
+        assert records[0].skipped_counts == {"invalid_start": 1, "start_gt_end": 30}
+
+    def test_no_summary_without_skips(self, caplog):
+        skip_logger = SkipLogger("a.csv", examples=1)
+        with caplog.at_level(logging.WARNING):
+            skip_logger.summary()
+        assert _skip_records(caplog) == []
+
+
+@pytest.mark.django_db
+class TestSkippedRowsAdmin:
+
+    def test_file_page_links_reasons(self, admin_client, uploaded):
+        response = admin_client.get(reverse("admin:data_processing_datafile_change", args=[uploaded.pk]))
+        content = response.content.decode()
+        assert f"?file__id__exact={uploaded.pk}&amp;reason=start_gt_end" in content
+        assert "Start &gt; End</a>: 2" in content
+
+    def test_changelist_filtered_by_file_and_reason(self, admin_client, uploaded, user):
+        process_file_upload(user, SimpleUploadedFile("other.csv", CSV.replace(b"A,B", b"K,L")))
+        url = reverse("admin:data_processing_skippedrow_changelist")
+        response = admin_client.get(url, {"file__id__exact": uploaded.pk, "reason": "start_gt_end"})
+        assert [r.row_num for r in response.context["cl"].result_list] == [3, 6]
+        assert response.context["cl"].result_count == 2
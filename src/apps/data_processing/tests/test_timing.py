@@ -0,0 +1,77 @@
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from apps.data_processing.models import DataFile, IngestStageTiming
+from apps.data_processing.services.timing import StageTimer
+from apps.data_processing.services.upload import process_file_upload
+
+
+@pytest.fixture
+def admin_client(client, django_user_model):
+    client.force_login(django_user_model.objects.create_superuser(username="admin", password="x", email="a@b.c"))
+    return client
+
+
+class TestStageTimer:
+
+    def test_sums_calls_per_stage(self):
+        timer = StageTimer(trace_memory=False)
+        for _ in range(3):
+            with timer.stage("read"):
+                pass
+        with timer.stage("dates"):
+            pass
+        assert list(timer.stages) == ["read", "dates"]
+        assert timer.stages["read"]["calls"] == 3
+        assert timer.stages["read"]["peak_memory"] is None
+
+    def test_traces_peak_memory(self):
+        timer = StageTimer(trace_memory=True)
+        timer.start()
+        try:
+            with timer.stage("rows"):
+                data = bytearray(2_000_000)
+                del data
+        finally:
+            timer.stop()
+        assert timer.stages["rows"]["peak_memory"] >= 2_000_000
+
+    def test_stage_recorded_on_error(self):
+        timer = StageTimer(trace_memory=False)
+        with pytest.raises(ValueError), timer.stage("insert"):
+            raise ValueError
+        assert timer.stages["insert"]["calls"] == 1
+
+
+@pytest.mark.django_db
+class TestIngestTimings:
+
+    @pytest.mark.parametrize("chunk_size", [0, 1])
+    def test_stages_stored_in_order(self, user, settings, csv_valid_content, chunk_size):
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = chunk_size
+        process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        timings = list(DataFile.objects.get().stage_timings.all())
+        assert [t.stage for t in timings] == ["read", "normalize", "dates", "rows", "insert", "aggregate", "save"]
+        assert all(t.wall_time >= 0 and t.cpu_time >= 0 and t.peak_memory is None for t in timings)
+        assert timings[0].calls == (1 if chunk_size == 0 else 4)
+
+    def test_failed_file_keeps_parse_stages(self, user, csv_empty_dates):
+        process_file_upload(user, SimpleUploadedFile("bad.csv", csv_empty_dates))
+        stages = set(IngestStageTiming.objects.values_list("stage", flat=True))
+        assert stages == {"read", "normalize", "dates"}
+
+    def test_memory_traced_when_enabled(self, user, settings, csv_valid_content):
+        settings.DATA_PROCESSING_TRACE_MEMORY = True
+        process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        assert IngestStageTiming.objects.get(stage="read").peak_memory > 0
+
+    def test_admin(self, admin_client, user, csv_valid_content):
+        process_file_upload(user, SimpleUploadedFile("a.csv", csv_valid_content))
+        data_file = DataFile.objects.get()
+        response = admin_client.get(reverse("admin:data_processing_datafile_change", args=[data_file.pk]))
+        assert "Parse dates" in response.content.decode()
+        response = admin_client.get(reverse("admin:data_processing_ingeststagetiming_changelist"), {"o": "-3"})
+        walls = [t.wall_time for t in response.context["cl"].result_list]
+        assert len(walls) == 7 and walls == sorted(walls, reverse=True)
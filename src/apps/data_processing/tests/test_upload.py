@@ -20,6 +20,7 @@ class TestProcessFileUpload:
         data_file = DataFile.objects.get(user=user, filename="test.csv")
         assert data_file.status == "success"
         assert data_file.rows_processed == 2
+        assert data_file.date_format == "%d.%m.%y"
         assert DataRecord.objects.filter(file=data_file).count() == 2
 
     def test_error_saves_datafile_with_error_status(self, user, csv_empty_dates):
@@ -45,6 +46,83 @@ class TestProcessFileUpload:
         assert "Пропущено" in msg and "1" in msg
 
         data_file = DataFile.objects.get(user=user, filename="skip.csv")
-        assert data_file.skipped_rows_log
-        assert "Start" in data_file.skipped_rows_log and "End" in data_file.skipped_rows_log
+        assert (data_file.rows_skipped, data_file.skipped_counts) == (1, {"start_gt_end": 1})
+        skipped = data_file.skipped_rows.get()
+        assert (skipped.row_num, skipped.reason) == (2, "start_gt_end")
+        assert skipped.raw_values["start"] == "30.01.21" and skipped.raw_values["advertiser"] == "A"
         assert DataRecord.objects.filter(file=data_file).count() == 1
+
+    def test_streamed_csv_matches_whole_file(self, user, settings):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        content = b"Advertis,Brand,Start,End,Format,Platforr,Impr\n" + b"\n".join(
+            b"A,B,%02d.01.21,%s,banner,DV360,%d" % (d, b"13.01.21" if d == 20 else b"28.01.21", d)
+            for d in range(13, 28)
+        )
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = 0
+        whole = process_file_upload(user, SimpleUploadedFile("whole.csv", content))
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = 4
+        # trailing newline: same rows, different content hash (not skipped as a duplicate)
+        streamed = process_file_upload(user, SimpleUploadedFile("streamed.csv", content + b"\n"))
+
+        assert streamed == whole
+        whole_file = DataFile.objects.get(filename="whole.csv")
+        streamed_file = DataFile.objects.get(filename="streamed.csv")
+        assert streamed_file.rows_processed == whole_file.rows_processed == 14
+        skipped_fields = ("row_num", "reason", "detail")
+        assert list(streamed_file.skipped_rows.values_list(*skipped_fields)) == list(
+            whole_file.skipped_rows.values_list(*skipped_fields)
+        ) == [(9, "start_gt_end", "Start (2021-01-20) > End (2021-01-13)")]
+        assert streamed_file.records.count() == 14
+
+    def test_streamed_csv_error_in_later_chunk_rolls_back(self, user, settings):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = 2
+        content = b"Advertis,Brand,Start,End,Format,Platforr,Impr\n" + b"\n".join(
+            [b"A,B,14.01.21,15.01.21,banner,DV360,1"] * 4 + [b"A,B,,15.01.21,banner,DV360,1"]
+        )
+        success, msg, is_error = process_file_upload(user, SimpleUploadedFile("late.csv", content))
+        assert success is False
+        assert is_error is True
+
+        data_file = DataFile.objects.get(filename="late.csv")
+        assert data_file.status == "error"
+        assert data_file.error_type == "empty_dates"
+        assert DataRecord.objects.filter(file=data_file).count() == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_streamed_csv_parsed_before_write_transaction(self, user, settings, monkeypatch):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.db import connection
+
+        from apps.data_processing.services import parsing
+
+        settings.DATA_PROCESSING_CSV_CHUNK_SIZE = 2
+        in_transaction = []
+
+        def iter_csv_chunks(*args, **kwargs):
+            for chunk in parsing_iter_csv_chunks(*args, **kwargs):
+                in_transaction.append(connection.in_atomic_block)
+                yield chunk
+
+        parsing_iter_csv_chunks = parsing.iter_csv_chunks
+        monkeypatch.setattr(parsing, "iter_csv_chunks", iter_csv_chunks)
+        content = b"Advertis,Brand,Start,End,Format,Platforr,Impr\n" + b"\n".join(
+            b"A,B,%02d.01.21,28.01.21,banner,DV360,%d" % (d, d) for d in range(13, 18)
+        )
+        assert process_file_upload(user, SimpleUploadedFile("a.csv", content))[0] is True
+        assert in_transaction == [False, False, False]
+        assert DataRecord.objects.count() == 5
+
+    def test_streamed_xlsx(self, user, settings, xlsx_valid_content):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        settings.DATA_PROCESSING_XLSX_CHUNK_SIZE = 2
+        success, msg, is_error = process_file_upload(user, SimpleUploadedFile("data.xlsx", xlsx_valid_content))
+        assert success is True
+        assert "Оброблено рядків: 3" in msg
+
+        data_file = DataFile.objects.get(filename="data.xlsx")
+        assert data_file.status == "success"
+        assert sorted(data_file.records.values_list("impressions", flat=True)) == [1000, 2000, 3000]
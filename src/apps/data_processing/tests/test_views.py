@@ -24,6 +24,73 @@ class TestFileUploadView:
         from apps.data_processing.models import DataFile
         assert DataFile.objects.filter(user=user, filename="valid.csv").exists()
 
+    def test_upload_queued_in_background(self, client, user, csv_valid_content, settings):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        settings.DATA_PROCESSING_BACKGROUND_UPLOADS = True
+        client.force_login(user)
+        f = SimpleUploadedFile("valid.csv", csv_valid_content, content_type="text/csv")
+        client.post(reverse("data_processing:upload"), {"file": f})
+        from apps.data_processing.models import DataFile
+        data_file = DataFile.objects.get(user=user, filename="valid.csv")
+        assert data_file.status == "processing"
+        assert data_file.ingest_job.status == "queued"
+
+    def test_upload_processed_inline(self, client, user, csv_valid_content, settings):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        settings.DATA_PROCESSING_BACKGROUND_UPLOADS = False
+        client.force_login(user)
+        f = SimpleUploadedFile("valid.csv", csv_valid_content, content_type="text/csv")
+        client.post(reverse("data_processing:upload"), {"file": f})
+        from apps.data_processing.models import DataFile
+        assert DataFile.objects.get(user=user, filename="valid.csv").status == "success"
+
+    def test_ajax_upload_returns_json(self, client, user, csv_valid_content, settings):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        settings.DATA_PROCESSING_BACKGROUND_UPLOADS = False
+        client.force_login(user)
+        f = SimpleUploadedFile("valid.csv", csv_valid_content, content_type="text/csv")
+        response = client.post(reverse("data_processing:upload"), {"file": f}, headers={"x-requested-with": "XMLHttpRequest"})
+        assert response.status_code == 200
+        assert response.json()["success"] is True
+
+        response = client.post(reverse("data_processing:upload"), {}, headers={"x-requested-with": "XMLHttpRequest"})
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestUploadProgressViews:
+
+    def test_progress_requires_login(self, client):
+        assert client.get(reverse("data_processing:progress_list")).status_code == 403
+
+    def test_progress_of_own_file(self, client, user, csv_valid_content, settings):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        settings.DATA_PROCESSING_BACKGROUND_UPLOADS = False
+        client.force_login(user)
+        client.post(reverse("data_processing:upload"), {"file": SimpleUploadedFile("valid.csv", csv_valid_content)})
+        from apps.data_processing.models import DataFile
+        data_file = DataFile.objects.get()
+
+        data = client.get(reverse("data_processing:progress", args=[data_file.pk])).json()
+        assert data["stage"] == "done"
+        assert data["rows_inserted"] == 2
+
+        files = client.get(reverse("data_processing:progress_list")).json()["files"]
+        assert [f["id"] for f in files] == [data_file.pk]
+
+    def test_progress_of_other_users_file_hidden(self, client, user, django_user_model):
+        from apps.data_processing.models import DataFile
+
+        other = django_user_model.objects.create_user(username="other", password="x")
+        data_file = DataFile.objects.create(user=other, filename="secret.csv")
+        client.force_login(user)
+        assert client.get(reverse("data_processing:progress", args=[data_file.pk])).status_code == 404
+        assert client.get(reverse("data_processing:progress_list")).json() == {"files": []}
+
 
 @pytest.mark.django_db
 class TestAggregatedStatsView:
@@ -5,5 +5,9 @@ app_name = "data_processing"
 
 urlpatterns = [
     path("upload/", views.FileUploadView.as_view(), name="upload"),
+    path("uploads/progress/", views.UploadProgressListView.as_view(), name="progress_list"),
+    path("uploads/<int:pk>/progress/", views.UploadProgressView.as_view(), name="progress"),
     path("stats/", views.AggregatedStatsView.as_view(), name="stats"),
+    path("stats/cube/", views.CubeQueryView.as_view(), name="cube"),
+    path("records/search/", views.RecordSearchView.as_view(), name="record_search"),
 ]
@@ -1,11 +1,32 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.shortcuts import redirect
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
+from django.utils.crypto import constant_time_compare
 from django.views.generic import TemplateView, View
 
 from .forms import DataFileUploadForm
-from .services import process_file_upload, get_aggregated_stats
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
+from .models import DataFile
+from .services import enqueue_file_upload, process_file_upload, get_aggregated_stats, get_upload_progress
+from .services.aggregation import STATS_MODE_START, STATS_MODES, plain_total
+from .services.cube import CUBE_DIMENSIONS, DIMENSION_NAMES, dimension_values, query_cube
+from .services.search import SEARCH_RESULTS_LIMIT, search_records
+
+RECENT_UPLOADS_LIMIT = 10
+
+
+def _is_ajax(request):
+    return request.headers.get("x-requested-with") == "XMLHttpRequest"
+
+
+def _cube_params(request):
+    """group_by (repeated or comma-separated) and {dimension: [values]} filters from the query string."""
+    group_by = [name for value in request.GET.getlist("group_by") for name in value.split(",") if name]
+    filters = {name: request.GET.getlist(name) for name in DIMENSION_NAMES if request.GET.getlist(name)}
+    return group_by, filters
 
 
 class FileUploadView(LoginRequiredMixin, View):
@@ -14,10 +35,20 @@ class FileUploadView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         form = DataFileUploadForm(request.POST, request.FILES)
         if not form.is_valid():
-            messages.error(request, "Оберіть файл xls або csv.")
+            message = " ".join(form.non_field_errors()) or "Оберіть файл xls або csv."
+            if _is_ajax(request):
+                return JsonResponse({"success": False, "message": message}, status=400)
+            messages.error(request, message)
             return redirect("users:dashboard")
 
-        success, msg, is_error = process_file_upload(request.user, form.cleaned_data["file"])
+        options = {"replace": form.cleaned_data["replace"], "delta": form.cleaned_data["delta"]}
+        if settings.DATA_PROCESSING_BACKGROUND_UPLOADS:
+            success, msg, is_error = enqueue_file_upload(request.user, form.cleaned_data["file"], **options)
+        else:
+            success, msg, is_error = process_file_upload(request.user, form.cleaned_data["file"], **options)
+        if _is_ajax(request):
+            # The dashboard widget polls UploadProgressListView instead of showing a flash message.
+            return JsonResponse({"success": success, "message": msg}, status=400 if is_error else 200)
         if is_error:
             messages.error(request, msg)
         else:
@@ -27,9 +58,107 @@ class FileUploadView(LoginRequiredMixin, View):
 
 class AggregatedStatsView(LoginRequiredMixin, TemplateView):
     template_name = "data_processing/aggregated_stats.html"
+    # cold process: includes a name<->id lookup per filtered and per grouped text dimension of the cube
+    query_budget = 20
     login_url = reverse_lazy("users:login")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context.update(get_aggregated_stats())
+        mode = self.request.GET.get("mode")
+        context.update(get_aggregated_stats(mode if mode in STATS_MODES else STATS_MODE_START))
+        group_by, filters = _cube_params(self.request)
+        group_by = group_by or ["year"]
+        try:
+            rows = query_cube(group_by, filters)
+        except ValueError:
+            group_by, filters = ["year"], {}
+            rows = query_cube(group_by, filters)
+        columns = [(name, label) for name, label in CUBE_DIMENSIONS if name in group_by]
+        context["cube"] = {
+            "dimensions": [
+                {
+                    "name": name,
+                    "label": label,
+                    "grouped": name in group_by,
+                    "values": [str(v) for v in dimension_values(name)],
+                    "selected": filters.get(name, []),
+                }
+                for name, label in CUBE_DIMENSIONS
+            ],
+            "columns": columns,
+            "rows": [
+                {"values": [r[name] for name, _ in columns], "records_count": r["records_count"],
+                 "total_impressions": plain_total(r["total_impressions"])}
+                for r in rows
+            ],
+        }
         return context
+
+
+class CubeQueryView(LoginRequiredMixin, View):
+    """JSON roll-up / drill-down over the aggregation cube (?group_by=year,platform&platform=DV360)."""
+    # session, user, the cube and up to 8 name<->id lookups of text dimensions (cached in the process afterwards)
+    query_budget = 11
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        group_by, filters = _cube_params(request)
+        try:
+            rows = query_cube(group_by, filters)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        rows = [{**r, "total_impressions": plain_total(r["total_impressions"])} for r in rows]
+        return JsonResponse({"group_by": [name for name in DIMENSION_NAMES if name in group_by], "rows": rows})
+
+
+class RecordSearchView(LoginRequiredMixin, View):
+    """
+    JSON full-text search over records (?q=nike&field=brand&limit=50):
+    the newest matches and impressions per year over all matches.
+    """
+    query_budget = 12
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        fields = [name for value in request.GET.getlist("field") for name in value.split(",") if name]
+        try:
+            limit = int(request.GET.get("limit", SEARCH_RESULTS_LIMIT))
+            result = search_records(request.GET.get("q", ""), fields, limit)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        for rows, key in ((result["records"], "impressions"), (result["year_totals"], "total_impressions")):
+            for row in rows:
+                if row[key] is not None:
+                    row[key] = plain_total(row[key])
+        return JsonResponse(result)
+
+
+class UploadProgressView(LoginRequiredMixin, View):
+    """JSON progress of one upload (own files only; staff can see all)."""
+    query_budget = 5
+    raise_exception = True
+
+    def get(self, request, pk, *args, **kwargs):
+        files = DataFile.objects.all() if request.user.is_staff else DataFile.objects.filter(user=request.user)
+        return JsonResponse(get_upload_progress(get_object_or_404(files, pk=pk)))
+
+
+class UploadProgressListView(LoginRequiredMixin, View):
+    """JSON progress of the current user's latest uploads, polled by the dashboard widget."""
+    query_budget = 5
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        files = DataFile.objects.filter(user=request.user).order_by("-uploaded_at")[:RECENT_UPLOADS_LIMIT]
+        return JsonResponse({"files": [get_upload_progress(f) for f in files]})
+
+
+class MetricsView(View):
+    """Prometheus scrape endpoint; requires `Authorization: Bearer <DATA_PROCESSING_METRICS_TOKEN>` when set."""
+    query_budget = 0
+
+    def get(self, request):
+        token = settings.DATA_PROCESSING_METRICS_TOKEN
+        if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return HttpResponse(status=401)
+        return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
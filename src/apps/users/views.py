@@ -16,3 +16,4 @@ class UserLogoutView(LogoutView):
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = "users/dashboard.html"
     login_url = reverse_lazy("users:login")
+    query_budget = 4
@@ -4,6 +4,57 @@ Pytest configuration and shared fixtures for Django project.
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Keep stored uploads out of the project's MEDIA_ROOT."""
+    settings.MEDIA_ROOT = tmp_path / "media"
+    return settings.MEDIA_ROOT
+
+
+@pytest.fixture(autouse=True)
+def shared_caches(settings):
+    """Per-test in-memory progress/stats caches instead of the shared file-based ones."""
+    settings.CACHES = {
+        **settings.CACHES,
+        "progress": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "test-progress"},
+        "stats": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "test-stats"},
+    }
+    from django.core.cache import caches
+
+    caches["progress"].clear()
+    caches["stats"].clear()
+
+
+@pytest.fixture(autouse=True)
+def metrics_registry(settings, tmp_path):
+    """Metrics files in a per-test directory and no values left over from other tests."""
+    from apps.data_processing.metrics import REGISTRY
+
+    settings.DATA_PROCESSING_METRICS_DIR = str(tmp_path / "metrics")
+    REGISTRY.reset()
+    yield REGISTRY
+    REGISTRY.reset()
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budgets(settings):
+    """A view running more queries than its query budget fails the test instead of logging a warning."""
+    settings.DATA_PROCESSING_QUERY_BUDGET_STRICT = True
+
+
+@pytest.fixture(autouse=True)
+def dimension_cache():
+    """
+    Empty value->id cache of the dimension tables: executed on_commit callbacks
+    of a rolled-back test would otherwise leave ids of rows that do not exist.
+    """
+    from apps.data_processing.services.dimensions import cache
+
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
 @pytest.fixture
 def user(db, django_user_model):
     """Create and return a regular user."""
@@ -35,3 +86,24 @@ def csv_start_gt_end():
     return b"""Advertis,Brand,Start,End,Format,Platforr,Impr
 A,B,30.01.21,13.01.21,banner,DV360,100
 C,D,04.02.21,11.02.21,banner,DV360,200"""
+
+
+@pytest.fixture
+def xlsx_valid_content():
+    """Valid xlsx: real dates, an Excel serial, a text date, an NA string and trailing empty rows."""
+    from datetime import datetime
+    from io import BytesIO
+
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Advertis", "Brand", "Start", "End", "Format", "Platforr", "Impr"])
+    ws.append(["Company A", "Brand X", datetime(2021, 1, 4), datetime(2021, 1, 10), "banner", "DV360", 1000])
+    ws.append(["Company B", "Brand Y", 44211, 44216, "banner", "Facebook", 2000.0])
+    ws.append(["Company C", "#N/A", "20.01.21", "25.01.21", "video", "YouTube", 3000])
+    ws.append([None, None, None, None, None, None, None])
+    ws.append([None, None, None, None, None, None, None])
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
@@ -56,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.data_processing.middleware.RequestMetricsMiddleware',
+    'apps.data_processing.middleware.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,6 +99,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': _db_path,
+        # web and ingest worker processes write concurrently: wait for the lock instead of failing
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -139,6 +143,31 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Cache
+# The 'progress' and 'stats' caches are written by ingest workers and read by the web process,
+# so they have to be shared between processes: file-based by default. A local-memory 'stats'
+# cache (DATA_PROCESSING_STATS_CACHE_BACKEND=locmem) only suits uploads processed in the web process.
+
+_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS['locmem'],
+    },
+    'progress': {
+        'BACKEND': _CACHE_BACKENDS['filebased'],
+        'LOCATION': os.environ.get('DATA_PROCESSING_PROGRESS_CACHE_DIR', str(BASE_DIR / 'db_data' / 'progress')),
+    },
+    'stats': {
+        'BACKEND': _CACHE_BACKENDS[os.environ.get('DATA_PROCESSING_STATS_CACHE_BACKEND', 'filebased')],
+        'LOCATION': os.environ.get('DATA_PROCESSING_STATS_CACHE_DIR', str(BASE_DIR / 'db_data' / 'stats_cache')),
+    },
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
@@ -149,6 +178,53 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Data processing: CSV uploads are read, validated and inserted in chunks
+# of this many rows (0 reads the whole file at once)
+DATA_PROCESSING_CSV_CHUNK_SIZE = int(os.environ.get('DATA_PROCESSING_CSV_CHUNK_SIZE', 50000))
+# xlsx uploads are streamed with openpyxl read-only mode in chunks of this many rows (0 uses pd.read_excel)
+DATA_PROCESSING_XLSX_CHUNK_SIZE = int(os.environ.get('DATA_PROCESSING_XLSX_CHUNK_SIZE', 50000))
+# Uploads are stored and parsed by `manage.py process_ingest_jobs` instead of inside the request
+DATA_PROCESSING_BACKGROUND_UPLOADS = os.environ.get('DATA_PROCESSING_BACKGROUND_UPLOADS', 'True').lower() == 'true'
+# SQLite has one writer at a time: a second worker would only wait for the lock (or time out), so run one
+DATA_PROCESSING_WORKER_CONCURRENCY = int(os.environ.get(
+    'DATA_PROCESSING_WORKER_CONCURRENCY', 1 if DATABASES['default']['ENGINE'].endswith('sqlite3') else 2
+))
+DATA_PROCESSING_WORKER_POLL_INTERVAL = float(os.environ.get('DATA_PROCESSING_WORKER_POLL_INTERVAL', 2))
+DATA_PROCESSING_JOB_MAX_ATTEMPTS = 3
+DATA_PROCESSING_JOB_RETRY_DELAY = 30  # seconds, doubled on every retry
+DATA_PROCESSING_JOB_STALE_AFTER = 300  # seconds without a worker heartbeat before a running job is requeued
+# Cache alias and timeout (seconds) of aggregated stats; entries are also invalidated by a data version bump
+DATA_PROCESSING_STATS_CACHE_ALIAS = 'stats'
+DATA_PROCESSING_STATS_CACHE_TIMEOUT = int(os.environ.get('DATA_PROCESSING_STATS_CACHE_TIMEOUT', 24 * 60 * 60))
+# Minimum seconds between progress writes while a file is ingested (stage changes are always written)
+DATA_PROCESSING_PROGRESS_INTERVAL = float(os.environ.get('DATA_PROCESSING_PROGRESS_INTERVAL', 1))
+# Parsed rows are inserted in batches of this size, each batch in its own savepoint
+DATA_PROCESSING_BULK_BATCH_SIZE = int(os.environ.get('DATA_PROCESSING_BULK_BATCH_SIZE', 5000))
+# Admin changelists of records count exactly up to this many rows, beyond that the count is estimated
+DATA_PROCESSING_ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get('DATA_PROCESSING_ADMIN_EXACT_COUNT_LIMIT', 10000))
+# Records of a deleted file are removed by file_id in raw DELETEs of at most this many rows
+DATA_PROCESSING_DELETE_CHUNK_SIZE = int(os.environ.get('DATA_PROCESSING_DELETE_CHUNK_SIZE', 20000))
+# 'executemany' (raw INSERT, no model instances), 'orm' (bulk_create) or 'auto' (executemany on SQLite)
+DATA_PROCESSING_BULK_LOAD_STRATEGY = os.environ.get('DATA_PROCESSING_BULK_LOAD_STRATEGY', 'auto')
+# pd.read_csv engine for whole-file reads: 'c' or 'pyarrow' (used only if pyarrow is installed)
+DATA_PROCESSING_CSV_ENGINE = os.environ.get('DATA_PROCESSING_CSV_ENGINE', 'c')
+# Skipped rows logged one by one per reason and file; the rest only go into the per-file summary
+DATA_PROCESSING_SKIPPED_LOG_EXAMPLES = int(os.environ.get('DATA_PROCESSING_SKIPPED_LOG_EXAMPLES', 5))
+# Trace peak memory of each ingest stage with tracemalloc (about 3x slower ingest; timings are always kept)
+DATA_PROCESSING_TRACE_MEMORY = os.environ.get('DATA_PROCESSING_TRACE_MEMORY', 'False').lower() == 'true'
+# Every process writes its metrics here and /metrics sums the files, archiving those of exited processes
+# of its host; shared by the web and worker containers ('' keeps metrics per process)
+DATA_PROCESSING_METRICS_DIR = os.environ.get('DATA_PROCESSING_METRICS_DIR', str(BASE_DIR / 'db_data' / 'metrics'))
+DATA_PROCESSING_METRICS_FLUSH_INTERVAL = float(os.environ.get('DATA_PROCESSING_METRICS_FLUSH_INTERVAL', 1))
+# Bearer token /metrics requires (open when empty)
+DATA_PROCESSING_METRICS_TOKEN = os.environ.get('DATA_PROCESSING_METRICS_TOKEN', '')
+# Queries of a request at least this slow (seconds) are logged with EXPLAIN QUERY PLAN, at most
+# DATA_PROCESSING_SLOW_QUERY_EXPLAIN_LIMIT per request
+DATA_PROCESSING_SLOW_QUERY_SECONDS = float(os.environ.get('DATA_PROCESSING_SLOW_QUERY_SECONDS', 0.2))
+DATA_PROCESSING_SLOW_QUERY_EXPLAIN_LIMIT = int(os.environ.get('DATA_PROCESSING_SLOW_QUERY_EXPLAIN_LIMIT', 3))
+# A view over its query budget raises QueryBudgetExceeded instead of logging a warning (set in tests)
+DATA_PROCESSING_QUERY_BUDGET_STRICT = os.environ.get('DATA_PROCESSING_QUERY_BUDGET_STRICT', 'False').lower() == 'true'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
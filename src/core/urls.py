@@ -21,12 +21,15 @@ from django.conf.urls.static import static
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
+from apps.data_processing.views import MetricsView
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
 
     path("", include("apps.users.urls")),
     path("data/", include("apps.data_processing.urls")),
+    path("metrics", MetricsView.as_view(), name="metrics"),
 
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),